@@ -24,7 +24,7 @@ except ImportError:
 
 from config import (
     SERVER_URL, DEVICE_ID, FRAME_WIDTH, FRAME_HEIGHT,
-    CAPTURE_INTERVAL, REQUEST_TIMEOUT,
+    CAPTURE_INTERVAL, REQUEST_TIMEOUT, FRAME_UPLOAD_MODE,
     LED_GREEN_PIN, LED_RED_PIN, LED_DURATION,
     ENABLE_WEB_STREAM, WEB_STREAM_PORT,
     ENABLE_WS_STREAMING, WS_STREAM_FPS, WS_URL, WS_RECONNECT_DELAY
@@ -77,10 +77,15 @@ class PiCliente:
         self.camera.start_recording(self.encoder, FileOutput(self.output))
         time.sleep(1)
 
-        self.server_url = f"{SERVER_URL}/api/procesar-frame"
+        if FRAME_UPLOAD_MODE == "binario":
+            self.server_url = f"{SERVER_URL}/api/procesar-frame/binario"
+        else:
+            self.server_url = f"{SERVER_URL}/api/procesar-frame"
         self.device_id = DEVICE_ID
         self.frame_count = 0
         self.last_send_time = 0
+        # El servidor pidió esperar (status "busy"): no enviar antes de este instante
+        self.pausa_hasta = 0
 
         logger.info(f"✅ Cámara inicializada: {FRAME_WIDTH}x{FRAME_HEIGHT} @ 30fps")
         logger.info(f"🌐 Servidor: {SERVER_URL}")
@@ -107,16 +112,26 @@ class PiCliente:
         """Envía frame al servidor de forma asíncrona"""
         def _send():
             try:
-                img_base64 = base64.b64encode(jpeg_bytes).decode('utf-8')
-                payload = {"image": img_base64, "device_id": self.device_id}
-                headers = {"Content-Type": "application/json", "X-Device-ID": self.device_id}
-
-                response = requests.post(
-                    self.server_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=REQUEST_TIMEOUT
-                )
+                if FRAME_UPLOAD_MODE == "binario":
+                    # JPEG crudo: sin base64 ni JSON
+                    headers = {"Content-Type": "application/octet-stream", "X-Device-ID": self.device_id}
+                    response = requests.post(
+                        self.server_url,
+                        data=jpeg_bytes,
+                        headers=headers,
+                        timeout=REQUEST_TIMEOUT
+                    )
+                else:
+                    img_base64 = base64.b64encode(jpeg_bytes).decode('utf-8')
+                    payload = {"image": img_base64, "device_id": self.device_id}
+                    headers = {"Content-Type": "application/json", "X-Device-ID": self.device_id}
+
+                    response = requests.post(
+                        self.server_url,
+                        json=payload,
+                        headers=headers,
+                        timeout=REQUEST_TIMEOUT
+                    )
 
                 if response.status_code == 200:
                     respuesta = response.json()
@@ -148,6 +163,11 @@ class PiCliente:
             logger.info("👤 DESCONOCIDO")
             self.control_led("red", 1)
 
+        elif status == 'busy':
+            # Servidor atrasado: el frame se descartó, reintentar tras retry_after
+            self.pausa_hasta = time.time() + float(respuesta.get('retry_after', CAPTURE_INTERVAL))
+            logger.debug(f"Servidor ocupado, reintento en {respuesta.get('retry_after')} s")
+
         elif status == 'error':
             self.control_led("red", LED_DURATION)
 
@@ -260,7 +280,7 @@ class PiCliente:
 
                 # Enviar al servidor cada 1 segundo (no cada frame)
                 current_time = time.time()
-                if current_time - self.last_send_time >= CAPTURE_INTERVAL:
+                if current_time - self.last_send_time >= CAPTURE_INTERVAL and current_time >= self.pausa_hasta:
                     frame = self.get_frame()
                     if frame:
                         self.enviar_frame_async(frame)
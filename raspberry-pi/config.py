@@ -44,6 +44,11 @@ LED_DURATION = int(os.getenv("LED_DURATION", 2))
 # ====================================
 
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 5))
+
+# Formato de envío de frames al servidor
+# "json"    = base64 dentro de JSON (/api/procesar-frame, compatible con servidores antiguos)
+# "binario" = bytes JPEG crudos (/api/procesar-frame/binario, ~33% menos datos)
+FRAME_UPLOAD_MODE = os.getenv("FRAME_UPLOAD_MODE", "json").lower()
 WS_RECONNECT_DELAY = int(os.getenv("WS_RECONNECT_DELAY", 5))
 
 # ====================================
@@ -71,6 +76,9 @@ def validate_config():
     if not DEVICE_ID:
         errors.append("DEVICE_ID no configurado")
 
+    if FRAME_UPLOAD_MODE not in ["json", "binario"]:
+        errors.append("FRAME_UPLOAD_MODE debe ser 'json' o 'binario'")
+
     if FRAME_WIDTH <= 0 or FRAME_HEIGHT <= 0:
         errors.append("FRAME_WIDTH y FRAME_HEIGHT deben ser mayores a 0")
 
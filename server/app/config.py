@@ -3,6 +3,7 @@ config.py - Configuración centralizada del servidor
 Carga variables de entorno y define constantes del sistema
 """
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -64,9 +65,77 @@ FACE_TOLERANCE = float(os.getenv("FACE_TOLERANCE", 0.6))
 # "cnn" = Más preciso, requiere GPU
 FACE_DETECTION_MODEL = os.getenv("FACE_DETECTION_MODEL", "hog")
 
-# Archivo de encodings (cache)
+# Galería de encodings en formato binario (np.memmap, compartido entre procesos)
+GALLERY_FILE = DATA_DIR / "photos" / "gallery.fgal"
+
+# Archivo de encodings anterior (pickle); si existe y falta GALLERY_FILE se migra al iniciar
 ENCODINGS_FILE = DATA_DIR / "photos" / "encodings.pkl"
 
+# Cache de encodings por hash de contenido de cada foto
+# Permite regenerar la galería sin volver a codificar fotos que no cambiaron
+ENCODINGS_CACHE_FILE = DATA_DIR / "photos" / "encodings_cache.pkl"
+
+# Prototipos por estudiante (varias fotos de referencia por estudiante)
+# 0 = la galería tiene una fila por foto
+# N = los encodings de cada estudiante se comprimen con k-means a N prototipos,
+#     así la galería crece con los estudiantes y no con las fotos
+PROTOTYPES_PER_STUDENT = int(os.getenv("PROTOTYPES_PER_STUDENT", 0))
+
+# Encodings de todas las fotos (sin comprimir); fuente para recalcular los prototipos
+GALLERY_RAW_FILE = DATA_DIR / "photos" / "gallery_fotos.fgal"
+
+# Índice aproximado (ANN) para galerías grandes
+# "none" = búsqueda exacta sobre toda la galería (recomendado hasta ~5.000 rostros)
+# "ivf"  = listas invertidas (k-means) + re-rank exacto de los candidatos
+ANN_INDEX = os.getenv("ANN_INDEX", "none").lower()
+
+# Tamaño mínimo de galería para usar el índice (por debajo, búsqueda exacta)
+ANN_MIN_GALLERY_SIZE = int(os.getenv("ANN_MIN_GALLERY_SIZE", 5000))
+
+# Número de listas del índice IVF (0 = automático, ~raíz cuadrada de la galería)
+ANN_NLIST = int(os.getenv("ANN_NLIST", 0))
+
+# Listas recorridas por consulta (más = mejor recall, más lento)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 8))
+
+# Archivo del índice (se guarda junto a la galería)
+ANN_INDEX_FILE = GALLERY_FILE.with_suffix(".ivf.npz")
+
+# Precisión de la matriz usada para el filtrado grueso
+# "float32" = búsqueda directa sobre la galería
+# "float16" / "int8" = copia compacta en RAM (1/2 o 1/4 de memoria); los
+#   RERANK_CANDIDATES mejores candidatos se re-rankean en float32
+GALLERY_PRECISION = os.getenv("GALLERY_PRECISION", "float32").lower()
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 8))
+
+# Auditoría de estudiantes enrolados más de una vez
+# Dos estudiantes distintos con rostros a menos de esta distancia se reportan
+# como posible duplicado (más estricto que FACE_TOLERANCE)
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.4))
+
+# Galerías por colegio (varios colegios en un mismo servidor)
+# Cada colegio guarda su galería en TENANTS_DIR/<id_colegio>/ y se carga en
+# memoria solo cuando llega un frame de uno de sus dispositivos; si las
+# galerías cargadas superan TENANT_CACHE_MB se descarga la usada hace más tiempo
+# (se cuenta la memoria propia del proceso, no las páginas de np.memmap)
+TENANTS_DIR = DATA_DIR / "photos" / "colegios"
+TENANT_CACHE_MB = int(os.getenv("TENANT_CACHE_MB", 512))
+
+# Rosters por sala: si un dispositivo tiene curso asignado (tabla dispositivos)
+# sus frames se comparan solo contra los estudiantes de ese curso.
+# true = si un rostro no coincide con el roster, buscarlo en la galería global
+ROSTER_FALLBACK_GLOBAL = os.getenv("ROSTER_FALLBACK_GLOBAL", "false").lower() == "true"
+
+# Codificación paralela de fotos al regenerar la galería
+# Procesos para HOG + encoder (0 = todos los núcleos)
+ENROLLMENT_WORKERS = int(os.getenv("ENROLLMENT_WORKERS", 0))
+
+# Máximo de fotos en vuelo en el pool (acota la memoria; 0 = 2 x workers)
+ENROLLMENT_MAX_PENDING = int(os.getenv("ENROLLMENT_MAX_PENDING", 0))
+
+# Mínimo de fotos pendientes para usar el pool (con menos se codifica en el proceso)
+ENROLLMENT_MIN_PARALLEL = int(os.getenv("ENROLLMENT_MIN_PARALLEL", 8))
+
 # Retención de fotos después de generar encodings
 # IMPORTANTE: Consideraciones legales (Ley 19.628 Chile):
 # - Fotos = datos biométricos sensibles que requieren consentimiento explícito
@@ -97,8 +166,84 @@ ALLOWED_IMAGE_FORMATS = ["image/jpeg", "image/png"]
 # PROCESAMIENTO DE IMÁGENES
 # ====================================
 
-# Redimensionar frames para procesamiento más rápido
-FRAME_RESIZE_WIDTH = 480
+# Ancho de la copia reducida donde se ejecuta la detección (HOG)
+# Las cajas se escalan de vuelta al frame original y los encodings se
+# calculan en resolución completa. 0 = detectar en el frame completo.
+# Rostros de menos de ~80 px en la copia reducida no se detectan: con cámaras
+# lejanas a la entrada conviene un ancho mayor.
+FRAME_RESIZE_WIDTH = int(os.getenv("FRAME_RESIZE_WIDTH", 480))
+
+# Perfiles de reconocimiento por dispositivo (columna dispositivos.perfil)
+# Cada perfil fija detector, upsampling, ancho de detección y tolerancia:
+# una cámara de torniquete (rostros grandes) no necesita el upsampling que sí
+# necesita una cámara de auditorio. Además de los perfiles incluidos
+# (default, cercano, amplio) se pueden agregar o redefinir en JSON:
+# {"nombre": {"modelo": "hog", "upsample": 0, "ancho": 320, "tolerancia": 0.55}}
+RECOGNITION_PROFILES = json.loads(os.getenv("RECOGNITION_PROFILES") or "{}")
+
+# Perfil de los dispositivos sin perfil asignado
+DEFAULT_RECOGNITION_PROFILE = os.getenv("DEFAULT_RECOGNITION_PROFILE", "default")
+
+# Seguimiento de rostros entre frames del mismo dispositivo
+# Un rostro cuya caja se superpone (IoU >= TRACK_IOU_THRESHOLD) con una pista
+# identificada a distancia <= TRACK_CONFIDENT_DISTANCE reutiliza la identidad
+# sin calcular el encoding ni consultar el cooldown en la BD. La identidad se
+# re-verifica cada TRACK_REVERIFY_SECONDS y la pista se descarta si el rostro
+# no aparece por TRACK_LOST_SECONDS (mayor que CAPTURE_INTERVAL de las Pi)
+TRACKING_ENABLED = os.getenv("TRACKING_ENABLED", "true").lower() == "true"
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", 0.3))
+TRACK_CONFIDENT_DISTANCE = float(os.getenv("TRACK_CONFIDENT_DISTANCE", 0.5))
+TRACK_REVERIFY_SECONDS = float(os.getenv("TRACK_REVERIFY_SECONDS", 10))
+TRACK_LOST_SECONDS = float(os.getenv("TRACK_LOST_SECONDS", 5))
+
+# Descarte de frames sin movimiento por dispositivo
+# Cada frame se reduce a una miniatura gris de MOTION_THUMB_WIDTH px; si el
+# último frame procesado no tenía rostros y menos de MOTION_MIN_CHANGED_FRACTION
+# de los píxeles cambió más de MOTION_PIXEL_THRESHOLD (0-255), se responde
+# "no_face" sin detectar. Igual se procesa un frame cada MOTION_MAX_SKIP_SECONDS
+MOTION_GATING = os.getenv("MOTION_GATING", "true").lower() == "true"
+MOTION_THUMB_WIDTH = int(os.getenv("MOTION_THUMB_WIDTH", 32))
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", 12))
+MOTION_MIN_CHANGED_FRACTION = float(os.getenv("MOTION_MIN_CHANGED_FRACTION", 0.01))
+MOTION_MAX_SKIP_SECONDS = float(os.getenv("MOTION_MAX_SKIP_SECONDS", 30))
+
+# Cache de resultados para frames casi idénticos (persona quieta, pasillo vacío)
+# La huella es un dHash de FRAME_CACHE_HASH_SIZE² bits calculado sobre el JPEG
+# decodificado a 1/8; dos frames del mismo dispositivo con huellas a distancia
+# de Hamming <= FRAME_CACHE_MAX_DISTANCE comparten resultado por
+# FRAME_CACHE_TTL_SECONDS, si además sus miniaturas no difieren según los
+# umbrales MOTION_PIXEL_THRESHOLD / MOTION_MIN_CHANGED_FRACTION
+FRAME_CACHE_ENABLED = os.getenv("FRAME_CACHE_ENABLED", "true").lower() == "true"
+FRAME_CACHE_HASH_SIZE = int(os.getenv("FRAME_CACHE_HASH_SIZE", 16))
+FRAME_CACHE_MAX_DISTANCE = int(os.getenv("FRAME_CACHE_MAX_DISTANCE", 6))
+FRAME_CACHE_TTL_SECONDS = float(os.getenv("FRAME_CACHE_TTL_SECONDS", 10))
+FRAME_CACHE_MAX_MB = int(os.getenv("FRAME_CACHE_MAX_MB", 16))
+
+# Filtro de calidad antes del encoder: los rostros que no lo pasan se cuentan
+# y el frame se informa como "low_quality" en lugar de codificarlos
+# - QUALITY_MIN_FACE_PX: lado mínimo de la caja en el frame original
+# - QUALITY_MIN_SHARPNESS: varianza del Laplaciano mínima (rostro llevado a 96 px)
+# - QUALITY_MAX_YAW: desplazamiento de la nariz respecto del centro de los ojos,
+#   relativo a la distancia entre ojos (0 = de frente)
+# - QUALITY_MAX_ROLL_DEG: inclinación máxima de la línea de los ojos
+# Desactivado por defecto: al activarlo, rostros pequeños o lejanos que antes
+# se reconocían pasan a informarse como "low_quality"
+QUALITY_GATE = os.getenv("QUALITY_GATE", "false").lower() == "true"
+QUALITY_MIN_FACE_PX = int(os.getenv("QUALITY_MIN_FACE_PX", 60))
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", 25))
+QUALITY_MAX_YAW = float(os.getenv("QUALITY_MAX_YAW", 0.4))
+QUALITY_MAX_ROLL_DEG = float(os.getenv("QUALITY_MAX_ROLL_DEG", 30))
+
+# Decodificación JPEG reducida para detectar (modo draft de PIL, escalado DCT)
+# Los JPEG más anchos se decodifican directo a 1/2, 1/4 u 1/8 de su tamaño sin
+# bajar de este ancho ni del ancho de detección del perfil del dispositivo (un
+# perfil con ancho 0, frame completo, no usa draft); la detección usa esa copia
+# y la resolución completa se decodifica solo si hay rostros que codificar.
+# Solo con INFERENCE_BACKEND=threads. 0 = desactivado.
+JPEG_DRAFT_WIDTH = int(os.getenv("JPEG_DRAFT_WIDTH", 0))
+
+# Muestras recientes por métrica de tiempo (GET /api/metricas)
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", 1000))
 
 # ====================================
 # WEBSOCKETS
@@ -137,6 +282,9 @@ RATE_LIMIT_READ = "60/minute"
 # Límite de requests por minuto para endpoints de escritura
 RATE_LIMIT_WRITE = "30/minute"
 
+# Límite para la auditoría de duplicados (lectura, pero compara todos los pares de la galería)
+RATE_LIMIT_AUDIT = "5/minute"
+
 # ====================================
 # VALIDACIÓN
 # ====================================
@@ -153,7 +301,44 @@ MAX_NAME_LENGTH = 100
 # ====================================
 
 # Número de workers para procesamiento asíncrono
-ASYNC_WORKERS = 4
+ASYNC_WORKERS = int(os.getenv("ASYNC_WORKERS", "4"))
+
+# Threads de cada etapa del pipeline de frames (también es el máximo de frames
+# en curso por etapa; el resto espera en el event loop sin ocupar threads)
+PIPELINE_DECODE_WORKERS = int(os.getenv("PIPELINE_DECODE_WORKERS", "2"))
+PIPELINE_RECOGNITION_WORKERS = int(os.getenv("PIPELINE_RECOGNITION_WORKERS", str(ASYNC_WORKERS)))
+PIPELINE_DB_WORKERS = int(os.getenv("PIPELINE_DB_WORKERS", "4"))
+
+# Micro-lotes del encoder: frames de cualquier dispositivo que llegan dentro de
+# BATCH_MAX_WAIT_MS se codifican y comparan juntos (BATCH_MAX_SIZE=1 = desactivado)
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Control de admisión: un frame en curso por dispositivo; un frame nuevo reemplaza
+# al que esperaba y los que superan ADMISSION_DEADLINE_MS desde que llegaron se
+# descartan. El dispositivo recibe status "busy" con retry_after (>= ADMISSION_MIN_RETRY_MS)
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+ADMISSION_DEADLINE_MS = float(os.getenv("ADMISSION_DEADLINE_MS", "2000"))
+ADMISSION_MIN_RETRY_MS = float(os.getenv("ADMISSION_MIN_RETRY_MS", "200"))
+
+# Reparto de la etapa reconocer entre dispositivos (deficit round robin): con
+# sobrecarga, cada dispositivo recibe tiempo de worker proporcional a su peso
+# (columna dispositivos.peso, por defecto 1); el control de admisión le deja
+# ceil(peso) frames en curso. SCHEDULER_QUANTUM_MS = crédito por vuelta de un
+# dispositivo de peso 1
+FAIR_SCHEDULING = os.getenv("FAIR_SCHEDULING", "true").lower() == "true"
+SCHEDULER_QUANTUM_MS = float(os.getenv("SCHEDULER_QUANTUM_MS", "100"))
+
+# Dónde corre la etapa reconocer: "threads" (threads del servidor, con micro-lotes)
+# o "processes" (procesos worker propios: detección y encoder sin compartir el GIL)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "threads").lower()
+INFERENCE_PROCESSES = int(os.getenv("INFERENCE_PROCESSES", str(PIPELINE_RECOGNITION_WORKERS)))
+# Threads nativos (BLAS / OpenMP) de cada proceso worker
+INFERENCE_THREADS_PER_PROCESS = int(os.getenv("INFERENCE_THREADS_PER_PROCESS", "1"))
+# Memoria compartida inicial por worker para el frame decodificado (crece si hace falta)
+INFERENCE_SHM_MB = int(os.getenv("INFERENCE_SHM_MB", "8"))
+# Segundos sin respuesta tras los cuales un worker se da por colgado y se reinicia
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
 
 # ====================================
 # INFORMACIÓN DEL SISTEMA
@@ -194,6 +379,100 @@ def validate_config():
     if FACE_DETECTION_MODEL not in ["hog", "cnn"]:
         raise ValueError("FACE_DETECTION_MODEL debe ser 'hog' o 'cnn'")
 
+    # Validar índice ANN
+    if ANN_INDEX not in ["none", "ivf"]:
+        raise ValueError("ANN_INDEX debe ser 'none' o 'ivf'")
+
+    if GALLERY_PRECISION not in ["float32", "float16", "int8"]:
+        raise ValueError("GALLERY_PRECISION debe ser 'float32', 'float16' o 'int8'")
+
+    if RERANK_CANDIDATES < 1:
+        raise ValueError("RERANK_CANDIDATES debe ser mayor o igual a 1")
+
+    if FRAME_RESIZE_WIDTH < 0:
+        raise ValueError("FRAME_RESIZE_WIDTH debe ser mayor o igual a 0")
+
+    if not isinstance(RECOGNITION_PROFILES, dict):
+        raise ValueError("RECOGNITION_PROFILES debe ser un objeto JSON {nombre: {...}}")
+
+    if not 0.0 < TRACK_IOU_THRESHOLD <= 1.0:
+        raise ValueError("TRACK_IOU_THRESHOLD debe estar entre 0.0 y 1.0")
+
+    if not 0.0 <= TRACK_CONFIDENT_DISTANCE <= 1.0:
+        raise ValueError("TRACK_CONFIDENT_DISTANCE debe estar entre 0.0 y 1.0")
+
+    if TRACK_REVERIFY_SECONDS <= 0 or TRACK_LOST_SECONDS <= 0:
+        raise ValueError("TRACK_REVERIFY_SECONDS y TRACK_LOST_SECONDS deben ser mayores que 0")
+
+    if MOTION_THUMB_WIDTH < 8:
+        raise ValueError("MOTION_THUMB_WIDTH debe ser mayor o igual a 8")
+
+    if not 0 <= MOTION_PIXEL_THRESHOLD <= 255:
+        raise ValueError("MOTION_PIXEL_THRESHOLD debe estar entre 0 y 255")
+
+    if not 0.0 <= MOTION_MIN_CHANGED_FRACTION < 1.0:
+        raise ValueError("MOTION_MIN_CHANGED_FRACTION debe estar entre 0.0 y 1.0")
+
+    if MOTION_MAX_SKIP_SECONDS <= 0:
+        raise ValueError("MOTION_MAX_SKIP_SECONDS debe ser mayor que 0")
+
+    if FRAME_CACHE_HASH_SIZE < 4:
+        raise ValueError("FRAME_CACHE_HASH_SIZE debe ser mayor o igual a 4")
+
+    if not 0 <= FRAME_CACHE_MAX_DISTANCE < FRAME_CACHE_HASH_SIZE ** 2:
+        raise ValueError("FRAME_CACHE_MAX_DISTANCE debe estar entre 0 y FRAME_CACHE_HASH_SIZE²")
+
+    if FRAME_CACHE_TTL_SECONDS <= 0:
+        raise ValueError("FRAME_CACHE_TTL_SECONDS debe ser mayor que 0")
+
+    if FRAME_CACHE_MAX_MB < 1:
+        raise ValueError("FRAME_CACHE_MAX_MB debe ser mayor o igual a 1")
+
+    if QUALITY_MIN_FACE_PX < 0 or QUALITY_MIN_SHARPNESS < 0:
+        raise ValueError("QUALITY_MIN_FACE_PX y QUALITY_MIN_SHARPNESS deben ser mayores o iguales a 0")
+
+    if QUALITY_MAX_YAW <= 0 or not 0 < QUALITY_MAX_ROLL_DEG <= 90:
+        raise ValueError("QUALITY_MAX_YAW debe ser mayor que 0 y QUALITY_MAX_ROLL_DEG estar entre 0 y 90")
+
+    if JPEG_DRAFT_WIDTH < 0:
+        raise ValueError("JPEG_DRAFT_WIDTH debe ser mayor o igual a 0")
+
+    if METRICS_WINDOW < 1:
+        raise ValueError("METRICS_WINDOW debe ser mayor o igual a 1")
+
+    if min(PIPELINE_DECODE_WORKERS, PIPELINE_RECOGNITION_WORKERS, PIPELINE_DB_WORKERS) < 1:
+        raise ValueError("Los workers de cada etapa del pipeline (PIPELINE_*_WORKERS) deben ser al menos 1")
+
+    if BATCH_MAX_SIZE < 1 or BATCH_MAX_WAIT_MS < 0:
+        raise ValueError("BATCH_MAX_SIZE debe ser al menos 1 y BATCH_MAX_WAIT_MS mayor o igual a 0")
+
+    if ADMISSION_DEADLINE_MS <= 0 or ADMISSION_MIN_RETRY_MS < 0:
+        raise ValueError("ADMISSION_DEADLINE_MS debe ser mayor que 0 y ADMISSION_MIN_RETRY_MS mayor o igual a 0")
+
+    if SCHEDULER_QUANTUM_MS <= 0:
+        raise ValueError("SCHEDULER_QUANTUM_MS debe ser mayor que 0")
+
+    if INFERENCE_BACKEND not in ("threads", "processes"):
+        raise ValueError("INFERENCE_BACKEND debe ser 'threads' o 'processes'")
+
+    if min(INFERENCE_PROCESSES, INFERENCE_THREADS_PER_PROCESS, INFERENCE_SHM_MB) < 1:
+        raise ValueError("INFERENCE_PROCESSES, INFERENCE_THREADS_PER_PROCESS e INFERENCE_SHM_MB deben ser al menos 1")
+
+    if INFERENCE_TIMEOUT_SECONDS <= 0:
+        raise ValueError("INFERENCE_TIMEOUT_SECONDS debe ser mayor que 0")
+
+    if not 0.0 < DUPLICATE_THRESHOLD <= 1.0:
+        raise ValueError("DUPLICATE_THRESHOLD debe estar entre 0.0 y 1.0")
+
+    if TENANT_CACHE_MB < 1:
+        raise ValueError("TENANT_CACHE_MB debe ser mayor o igual a 1")
+
+    if PROTOTYPES_PER_STUDENT < 0:
+        raise ValueError("PROTOTYPES_PER_STUDENT debe ser mayor o igual a 0")
+
+    if ANN_NPROBE < 1:
+        raise ValueError("ANN_NPROBE debe ser mayor o igual a 1")
+
     print("✅ Configuración validada correctamente")
 
 # Ejecutar validación al importar
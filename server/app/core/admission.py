@@ -0,0 +1,167 @@
+"""
+admission.py - Control de admisión por dispositivo (gana el frame más reciente)
+Si el servidor se atrasa, los frames de cada cámara se acumulaban en las colas
+y se reconocían frames de hace varios segundos. Aquí cada dispositivo tiene a
+lo sumo su cupo de frames en curso (1, o más según su peso en el reparto del
+reconocimiento) y uno en espera: un frame nuevo reemplaza al que esperaba, y
+un frame que supera ADMISSION_DEADLINE_MS desde que llegó se descarta. En
+ambos casos el dispositivo recibe "busy" con un tiempo sugerido para reintentar
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional
+
+# Peso de la última muestra en el promedio móvil del tiempo de servicio
+_ALFA_SERVICIO = 0.2
+
+
+class DispositivoOcupado(Exception):
+    """El frame no se procesa: el dispositivo ya llenó su cupo en curso o el frame venció"""
+
+    def __init__(self, motivo: str, reintentar_s: float) -> None:
+        """
+        Args:
+            motivo: "reemplazado" (llegó un frame más nuevo) o "vencido" (superó el plazo)
+            reintentar_s: Segundos sugeridos antes de enviar otro frame
+        """
+        super().__init__(f"Frame {motivo}")
+        self.motivo = motivo
+        self.reintentar_s = reintentar_s
+
+
+@dataclass
+class EstadoAdmision:
+    """Frames en curso, frame en espera y contadores de un dispositivo"""
+
+    # Inicio de cada frame en curso, del más antiguo al más nuevo
+    inicios: Deque[float] = field(default_factory=deque)
+    en_espera: Optional["asyncio.Future[None]"] = field(default=None, repr=False)
+    # Promedio móvil de lo que tarda un frame admitido (s)
+    servicio_s: float = 0.0
+    admitidos: int = 0
+    reemplazados: int = 0
+    vencidos: int = 0
+
+
+class ControlAdmision:
+    """Cupo de frames en curso por dispositivo, el más reciente en espera (vive en el event loop)"""
+
+    def __init__(
+        self,
+        plazo_s: float,
+        reintento_minimo_s: float,
+        cupo: Callable[[str], int] = lambda device_id: 1
+    ) -> None:
+        """
+        Args:
+            plazo_s: Antigüedad máxima de un frame para empezar a reconocerlo
+            reintento_minimo_s: Menor tiempo de reintento sugerido al dispositivo
+            cupo: Función device_id -> frames que puede tener en curso a la vez
+        """
+        self.plazo_s = plazo_s
+        self.reintento_minimo_s = reintento_minimo_s
+        self.cupo = cupo
+        self._estados: Dict[str, EstadoAdmision] = {}
+
+    async def admitir(self, device_id: str, llegada: float) -> None:
+        """
+        Espera el turno del frame; al volver, el frame queda en curso
+
+        Cada llamada que retorna debe cerrarse con liberar(device_id).
+
+        Args:
+            device_id: Dispositivo que envió el frame
+            llegada: time.monotonic() al recibir el frame
+
+        Raises:
+            DispositivoOcupado: Si un frame más nuevo lo reemplazó mientras
+                esperaba o si venció el plazo
+        """
+        estado = self._estados.setdefault(device_id, EstadoAdmision())
+
+        if len(estado.inicios) < self.cupo(device_id):
+            self._iniciar(estado)
+            return
+
+        # Solo espera el más reciente: el anterior en espera se descarta
+        if estado.en_espera is not None and not estado.en_espera.done():
+            estado.reemplazados += 1
+            estado.en_espera.set_exception(DispositivoOcupado("reemplazado", self._reintento(estado)))
+
+        futuro: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        estado.en_espera = futuro
+        restante = self.plazo_s - (time.monotonic() - llegada)
+
+        try:
+            await asyncio.wait_for(futuro, max(0.0, restante))
+        except asyncio.TimeoutError:
+            if estado.en_espera is futuro:
+                estado.en_espera = None
+            estado.vencidos += 1
+            raise DispositivoOcupado("vencido", self._reintento(estado)) from None
+        except asyncio.CancelledError:
+            # Cliente desconectado: si ya había recibido el turno, se pasa al siguiente
+            if estado.en_espera is futuro:
+                estado.en_espera = None
+            elif futuro.done() and not futuro.cancelled() and futuro.exception() is None:
+                self.liberar(device_id)
+            raise
+
+    def verificar_plazo(self, device_id: str, llegada: float) -> None:
+        """
+        Descarta un frame ya admitido que se atrasó en las colas antes de reconocerlo
+
+        Raises:
+            DispositivoOcupado: Si el frame supera el plazo
+        """
+        if time.monotonic() - llegada > self.plazo_s:
+            estado = self._estados[device_id]
+            estado.vencidos += 1
+            raise DispositivoOcupado("vencido", self._reintento(estado))
+
+    def liberar(self, device_id: str) -> None:
+        """
+        Termina un frame en curso y da el turno al frame en espera, si hay uno
+
+        Los frames de un dispositivo pueden terminar en otro orden: se
+        descuenta siempre el inicio más antiguo, lo que no cambia la suma de
+        los tiempos de servicio medidos (ni su promedio).
+        """
+        estado = self._estados[device_id]
+        servicio = time.monotonic() - estado.inicios.popleft()
+        estado.servicio_s = (
+            servicio if estado.servicio_s == 0.0
+            else (1 - _ALFA_SERVICIO) * estado.servicio_s + _ALFA_SERVICIO * servicio
+        )
+
+        espera, estado.en_espera = estado.en_espera, None
+        if espera is not None and not espera.done():
+            self._iniciar(estado)
+            espera.set_result(None)
+
+    @staticmethod
+    def _iniciar(estado: EstadoAdmision) -> None:
+        estado.inicios.append(time.monotonic())
+        estado.admitidos += 1
+
+    def _reintento(self, estado: EstadoAdmision) -> float:
+        """Lo que le falta al frame en curso más antiguo según el tiempo de servicio habitual (mínimo reintento_minimo_s)"""
+        restante = estado.servicio_s - (time.monotonic() - estado.inicios[0]) if estado.inicios else 0.0
+        return round(max(self.reintento_minimo_s, restante), 2)
+
+    def estado(self) -> Dict[str, Any]:
+        """Frames admitidos, reemplazados y vencidos por dispositivo (para /api/metricas)"""
+        return {
+            device_id: {
+                "en_curso": len(estado.inicios),
+                "en_espera": estado.en_espera is not None and not estado.en_espera.done(),
+                "admitidos": estado.admitidos,
+                "reemplazados": estado.reemplazados,
+                "vencidos": estado.vencidos,
+                "servicio_ms": round(estado.servicio_s * 1000, 1)
+            }
+            for device_id, estado in self._estados.items()
+        }
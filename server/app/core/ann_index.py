@@ -0,0 +1,293 @@
+"""
+ann_index.py - Índice aproximado (IVF) sobre los encodings de la galería
+Particiona la galería con k-means en listas invertidas y solo recorre las
+listas más cercanas a cada rostro; los candidatos se re-rankean con la
+distancia exacta en float32
+"""
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato persistido (cambiarla invalida los índices guardados)
+IVF_FORMAT_VERSION = 1
+
+
+def huella_galeria(gallery: Gallery) -> str:
+    """
+    Calcula una huella del contenido de la galería
+
+    Se guarda junto al índice para detectar que quedó desactualizado
+    respecto a los encodings cargados.
+    """
+    h = hashlib.sha1()
+    h.update(gallery.encodings.tobytes())
+    h.update(gallery.ids.tobytes())
+    return h.hexdigest()
+
+
+def _asignar(datos: np.ndarray, centroides: np.ndarray, bloque: int = 8192) -> np.ndarray:
+    """Asigna cada fila al centroide más cercano, en bloques de memoria acotada"""
+    normas_c = np.einsum('ij,ij->i', centroides, centroides)
+    asignacion = np.empty(len(datos), dtype=np.int32)
+    for inicio in range(0, len(datos), bloque):
+        parte = datos[inicio:inicio + bloque]
+        asignacion[inicio:inicio + bloque] = np.argmin(
+            normas_c[np.newaxis, :] - 2.0 * (parte @ centroides.T), axis=1
+        )
+    return asignacion
+
+
+def kmeans(
+    datos: np.ndarray,
+    k: int,
+    iteraciones: int = 10,
+    semilla: int = 0
+) -> np.ndarray:
+    """
+    K-means (Lloyd) en NumPy puro
+
+    Args:
+        datos: Matriz (N, D) float32
+        k: Número de centroides
+        iteraciones: Iteraciones de Lloyd
+        semilla: Semilla para la inicialización
+
+    Returns:
+        Matriz (k, D) float32 de centroides
+    """
+    rng = np.random.default_rng(semilla)
+    k = max(1, min(k, len(datos)))
+    centroides = datos[rng.choice(len(datos), size=k, replace=False)].copy()
+
+    for _ in range(iteraciones):
+        asignacion = _asignar(datos, centroides)
+        orden = np.argsort(asignacion, kind='stable')
+        etiquetas, inicios, conteos = np.unique(
+            asignacion[orden], return_index=True, return_counts=True
+        )
+        sumas = np.add.reduceat(datos[orden], inicios, axis=0)
+        # Los centroides sin puntos conservan su posición anterior
+        centroides[etiquetas] = sumas / conteos[:, np.newaxis]
+
+    return centroides
+
+
+class IVFIndex:
+    """Índice de listas invertidas (IVF-Flat) sobre las filas de una Gallery"""
+
+    def __init__(
+        self,
+        centroides: np.ndarray,
+        orden: np.ndarray,
+        offsets: np.ndarray,
+        huella: str
+    ) -> None:
+        self.centroides: np.ndarray = np.ascontiguousarray(centroides, dtype=np.float32)
+        self.normas_centroides: np.ndarray = np.einsum(
+            'ij,ij->i', self.centroides, self.centroides
+        )
+        # Filas de la galería agrupadas por lista: orden[offsets[l]:offsets[l+1]]
+        self.orden: np.ndarray = np.asarray(orden, dtype=np.int32)
+        self.offsets: np.ndarray = np.asarray(offsets, dtype=np.int64)
+        self.huella: str = huella
+        self.recall: Optional[float] = None
+
+    @property
+    def n_listas(self) -> int:
+        return len(self.centroides)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de centroides y listas invertidas"""
+        return int(
+            self.centroides.nbytes + self.normas_centroides.nbytes
+            + self.orden.nbytes + self.offsets.nbytes
+        )
+
+    @classmethod
+    def construir(
+        cls,
+        gallery: Gallery,
+        n_listas: int = 0,
+        iteraciones: int = 10,
+        muestra_por_lista: int = 64
+    ) -> "IVFIndex":
+        """
+        Entrena los centroides y reparte las filas de la galería en listas
+
+        Args:
+            gallery: Galería a indexar
+            n_listas: Número de listas (0 = automático, ~sqrt(N))
+            iteraciones: Iteraciones de k-means
+            muestra_por_lista: Filas de entrenamiento por lista (acota el costo)
+        """
+        n = len(gallery)
+        if n == 0:
+            raise ValueError("No se puede construir un índice sobre una galería vacía")
+
+        if n_listas <= 0:
+            n_listas = int(np.sqrt(n))
+        n_listas = max(1, min(n_listas, n))
+
+        rng = np.random.default_rng(0)
+        n_muestra = min(n, n_listas * muestra_por_lista)
+        muestra = gallery.encodings[np.sort(rng.choice(n, size=n_muestra, replace=False))]
+
+        centroides = kmeans(muestra, n_listas, iteraciones=iteraciones)
+        asignacion = _asignar(gallery.encodings, centroides)
+
+        orden = np.argsort(asignacion, kind='stable').astype(np.int32)
+        conteos = np.bincount(asignacion, minlength=len(centroides))
+        offsets = np.concatenate(([0], np.cumsum(conteos)))
+
+        return cls(centroides, orden, offsets, huella_galeria(gallery))
+
+    def reasignar(self, gallery: Gallery) -> "IVFIndex":
+        """
+        Crea un índice para una galería modificada reutilizando los centroides
+
+        Tras agregar o quitar estudiantes basta con repartir de nuevo las filas
+        en las listas existentes; no hace falta volver a entrenar k-means.
+        """
+        asignacion = _asignar(gallery.encodings, self.centroides)
+        orden = np.argsort(asignacion, kind='stable').astype(np.int32)
+        conteos = np.bincount(asignacion, minlength=self.n_listas)
+        offsets = np.concatenate(([0], np.cumsum(conteos)))
+
+        return IVFIndex(self.centroides, orden, offsets, huella_galeria(gallery))
+
+    def guardar(self, path: Path) -> None:
+        """Persiste el índice en formato .npz (escritura atómica)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.int32(IVF_FORMAT_VERSION),
+                centroides=self.centroides,
+                orden=self.orden,
+                offsets=self.offsets,
+                huella=np.array(self.huella),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def cargar(cls, path: Path, gallery: Gallery) -> Optional["IVFIndex"]:
+        """
+        Carga un índice persistido si corresponde a la galería actual
+
+        Returns:
+            IVFIndex o None si no existe, es de otra versión o está desactualizado
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != IVF_FORMAT_VERSION:
+                    return None
+                if str(data['huella']) != huella_galeria(gallery):
+                    return None
+                return cls(data['centroides'], data['orden'], data['offsets'], str(data['huella']))
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el índice ANN desde {path}: {e}")
+            return None
+
+    def buscar(
+        self,
+        gallery: Gallery,
+        queries: Sequence[np.ndarray],
+        n_probe: int,
+        tolerancia: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca el vecino más cercano recorriendo solo las `n_probe` listas más cercanas
+
+        Args:
+            gallery: Galería indexada (la misma usada en construir)
+            queries: Encodings consultados (M, 128)
+            n_probe: Listas a recorrer por consulta
+            tolerancia: Si se indica, las consultas cuyo mejor candidato supera
+                la tolerancia se resuelven con búsqueda exacta sobre toda la
+                galería, de modo que la decisión reconocido/desconocido es la
+                misma que la de la búsqueda exacta
+
+        Returns:
+            Tupla (indices, distancias), igual que Gallery.buscar
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        indices = np.full(len(q), -1, dtype=np.intp)
+        distancias = np.full(len(q), np.inf, dtype=np.float32)
+
+        if len(q) == 0 or len(gallery) == 0:
+            return indices, distancias
+
+        n_probe = max(1, min(n_probe, self.n_listas))
+        d_centroides = self.normas_centroides[np.newaxis, :] - 2.0 * (q @ self.centroides.T)
+        if n_probe < self.n_listas:
+            listas = np.argpartition(d_centroides, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            listas = np.broadcast_to(np.arange(self.n_listas), d_centroides.shape)
+        normas_q = np.einsum('ij,ij->i', q, q)
+
+        for i in range(len(q)):
+            candidatos = np.concatenate([
+                self.orden[self.offsets[l]:self.offsets[l + 1]] for l in listas[i]
+            ])
+            if len(candidatos) == 0:
+                continue
+
+            # Re-rank exacto de los candidatos en float32
+            parcial = gallery.norms_sq[candidatos] - 2.0 * (gallery.encodings[candidatos] @ q[i])
+            mejor = int(np.argmin(parcial))
+            indices[i] = candidatos[mejor]
+            distancias[i] = np.sqrt(max(parcial[mejor] + normas_q[i], 0.0))
+
+        if tolerancia is not None:
+            pendientes = np.flatnonzero(distancias > tolerancia)
+            if len(pendientes) > 0:
+                indices[pendientes], distancias[pendientes] = gallery.buscar(q[pendientes])
+
+        return indices, distancias
+
+    def medir_recall(
+        self,
+        gallery: Gallery,
+        n_probe: int,
+        n_consultas: int = 200,
+        ruido: float = 0.02
+    ) -> Dict[str, float]:
+        """
+        Mide el recall@1 del índice contra la búsqueda exacta
+
+        Usa como consultas filas de la galería con una pequeña perturbación
+        (simula un nuevo frame del mismo estudiante).
+
+        Returns:
+            Dict con 'recall', 'consultas' y 'n_probe'
+        """
+        rng = np.random.default_rng(1)
+        n_consultas = min(n_consultas, len(gallery))
+        filas = rng.choice(len(gallery), size=n_consultas, replace=False)
+        consultas = gallery.encodings[filas] + rng.normal(
+            0.0, ruido, size=(n_consultas, ENCODING_DIM)
+        ).astype(np.float32)
+
+        exactos, _ = gallery.buscar(consultas)
+        aproximados, _ = self.buscar(gallery, consultas, n_probe)
+
+        self.recall = float(np.mean(exactos == aproximados))
+        return {
+            'recall': self.recall,
+            'consultas': float(n_consultas),
+            'n_probe': float(n_probe),
+        }
@@ -0,0 +1,171 @@
+"""
+batching.py - Micro-lotes del encoder entre dispositivos
+Con muchas cámaras, varios frames llegan casi al mismo tiempo: cada uno se
+detecta por separado (en paralelo), pero sus rostros pendientes se juntan
+durante a lo sumo BATCH_MAX_WAIT_MS (o hasta BATCH_MAX_SIZE frames) y pasan
+por el encoder de 128-d en una sola llamada a dlib, y por la galería en una
+sola multiplicación de matrices por colegio. Cada frame recibe su propio
+resultado
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.face_recognition import FaceRecognitionProcessor, FrameDetectado, codificar_rostros
+from app.core.metrics import metricas
+
+logger = logging.getLogger(__name__)
+
+# Ejecuta una función bloqueante fuera del event loop (ej. Etapa.ejecutar)
+Ejecutor = Callable[..., Awaitable[Any]]
+
+# Frame a la espera de un lote: (procesador de su colegio, frame, futuro, llegada)
+Pendiente = Tuple[FaceRecognitionProcessor, FrameDetectado, "asyncio.Future[Dict[str, Any]]", float]
+
+
+def procesar_lote(trabajos: List[Tuple[FaceRecognitionProcessor, FrameDetectado]]) -> List[Dict[str, Any]]:
+    """
+    Codifica los rostros de todos los frames juntos y los identifica por colegio
+
+    Args:
+        trabajos: Pares (procesador, frame detectado), de uno o varios colegios
+
+    Returns:
+        Lista paralela a `trabajos` con el resultado de cada frame
+    """
+    frames = [frame for _, frame in trabajos]
+    inicio = time.perf_counter()
+
+    try:
+        with metricas.medir("encoding_lote"):
+            encodings = codificar_rostros(
+                [frame.imagen for frame in frames],
+                [frame.por_codificar for frame in frames]
+            )
+    except Exception as e:
+        logger.error(f"Error al codificar lote de {len(frames)} frames: {e}")
+        _repartir_costo(frames, time.perf_counter() - inicio)
+        return [{'faces_found': 0, 'matches': [], 'error': str(e)} for _ in frames]
+
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(trabajos)
+
+    # Cada colegio resuelve sus frames contra su propia galería
+    por_procesador: Dict[int, List[int]] = {}
+    for k, (procesador, _) in enumerate(trabajos):
+        por_procesador.setdefault(id(procesador), []).append(k)
+
+    for indices in por_procesador.values():
+        procesador = trabajos[indices[0]][0]
+        parciales = procesador.identificar_lote(
+            [frames[k] for k in indices],
+            [encodings[k] for k in indices]
+        )
+        for k, resultado in zip(indices, parciales):
+            resultados[k] = resultado
+
+    _repartir_costo(frames, time.perf_counter() - inicio)
+    return resultados
+
+
+def _repartir_costo(frames: List[FrameDetectado], segundos: float) -> None:
+    """Reparte el tiempo del lote entre sus frames según los rostros que codificó cada uno"""
+    rostros = sum(len(frame.pendientes) for frame in frames)
+    for frame in frames:
+        frame.costo_lote_s = segundos * len(frame.pendientes) / rostros if rostros else segundos / len(frames)
+
+
+class AgrupadorLotes:
+    """Junta frames de cualquier dispositivo en lotes para el encoder (vive en el event loop)"""
+
+    def __init__(self, ejecutar: Ejecutor, max_lote: int, espera_max_s: float) -> None:
+        """
+        Args:
+            ejecutar: Corrutina que corre procesar_lote fuera del event loop
+                (la etapa "reconocer" del pipeline)
+            max_lote: Frames que disparan el lote sin esperar más
+            espera_max_s: Tiempo máximo que el primer frame espera compañía
+        """
+        self.ejecutar = ejecutar
+        self.max_lote = max_lote
+        self.espera_max_s = espera_max_s
+
+        self._pendientes: List[Pendiente] = []
+        self._temporizador: Optional[asyncio.TimerHandle] = None
+        # Referencias a los lotes en curso (asyncio solo guarda referencias débiles)
+        self._en_curso: Set["asyncio.Task[None]"] = set()
+
+        self.lotes = 0
+        self.frames = 0
+
+    async def enviar(self, procesador: FaceRecognitionProcessor, frame: FrameDetectado) -> Dict[str, Any]:
+        """
+        Agrega un frame detectado al próximo lote y espera su resultado
+
+        Args:
+            procesador: Procesador del colegio del dispositivo
+            frame: Frame devuelto por detectar(), con rostros pendientes
+
+        Returns:
+            Resultado del frame (mismo formato que procesar_frame)
+        """
+        loop = asyncio.get_running_loop()
+        futuro: "asyncio.Future[Dict[str, Any]]" = loop.create_future()
+        self._pendientes.append((procesador, frame, futuro, time.perf_counter()))
+
+        if len(self._pendientes) >= self.max_lote:
+            self._despachar()
+        elif self._temporizador is None:
+            self._temporizador = loop.call_later(self.espera_max_s, self._despachar)
+
+        return await futuro
+
+    def _despachar(self) -> None:
+        """Cierra el lote actual y lo manda a ejecutar"""
+        if self._temporizador is not None:
+            self._temporizador.cancel()
+            self._temporizador = None
+
+        lote, self._pendientes = self._pendientes, []
+        if not lote:
+            return
+
+        tarea = asyncio.ensure_future(self._ejecutar_lote(lote))
+        self._en_curso.add(tarea)
+        tarea.add_done_callback(self._en_curso.discard)
+
+    async def _ejecutar_lote(self, lote: List[Pendiente]) -> None:
+        ahora = time.perf_counter()
+        for _, _, _, llegada in lote:
+            metricas.registrar_tiempo("espera_lote", (ahora - llegada) * 1000)
+
+        self.lotes += 1
+        self.frames += len(lote)
+
+        try:
+            resultados = await self.ejecutar(
+                procesar_lote, [(procesador, frame) for procesador, frame, _, _ in lote]
+            )
+        except Exception as e:
+            for _, _, futuro, _ in lote:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            return
+
+        # Un frame cuyo cliente se desconectó tiene su futuro cancelado
+        for (_, _, futuro, _), resultado in zip(lote, resultados):
+            if not futuro.done():
+                futuro.set_result(resultado)
+
+    def estado(self) -> Dict[str, Any]:
+        """Lotes ejecutados y tamaño medio (para /api/metricas)"""
+        return {
+            "max_lote": self.max_lote,
+            "espera_max_ms": round(self.espera_max_s * 1000, 2),
+            "lotes": self.lotes,
+            "frames": self.frames,
+            "tamano_medio": round(self.frames / self.lotes, 2) if self.lotes else 0.0,
+            "pendientes": len(self._pendientes)
+        }
+
@@ -7,7 +7,7 @@ import mysql.connector
 from mysql.connector import Error
 from contextlib import contextmanager
 from datetime import date, datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import logging
 
 from app.config import DB_CONFIG
@@ -50,7 +50,8 @@ class Database:
         self,
         nombre_completo: str,
         rut: str,
-        path_foto: str
+        path_foto: str,
+        id_colegio: Optional[int] = None
     ) -> Optional[Dict[str, Any]]:
         """
         Inserta un nuevo estudiante en la base de datos
@@ -59,6 +60,7 @@ class Database:
             nombre_completo: Nombre completo del estudiante
             rut: RUT del estudiante
             path_foto: Nombre del archivo de foto (ej. 'juan_perez.jpg')
+            id_colegio: Colegio del estudiante (None = galería global)
 
         Returns:
             Dict con información del estudiante creado o None si falla
@@ -71,10 +73,10 @@ class Database:
             with self.get_connection() as conn:
                 cursor = conn.cursor(dictionary=True)
                 query = """
-                INSERT INTO estudiantes (nombre_completo, rut, path_foto_referencia)
-                VALUES (%s, %s, %s)
+                INSERT INTO estudiantes (nombre_completo, rut, path_foto_referencia, id_colegio)
+                VALUES (%s, %s, %s, %s)
                 """
-                cursor.execute(query, (nombre_completo, rut, path_foto))
+                cursor.execute(query, (nombre_completo, rut, path_foto, id_colegio))
 
                 # Obtener el ID del estudiante que acabamos de crear
                 new_id = cursor.lastrowid
@@ -84,7 +86,8 @@ class Database:
                     "id_estudiante": new_id,
                     "nombre_completo": nombre_completo,
                     "rut": rut,
-                    "path_foto_referencia": path_foto
+                    "path_foto_referencia": path_foto,
+                    "id_colegio": id_colegio
                 }
 
         except mysql.connector.Error as e:
@@ -98,6 +101,159 @@ class Database:
             logger.error(f"Error al crear estudiante '{nombre_completo}': {e}")
             return None
 
+    def actualizar_estudiante(
+        self,
+        id_estudiante: int,
+        nombre_completo: str,
+        rut: Optional[str],
+        path_foto: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza los datos de un estudiante existente
+
+        Args:
+            id_estudiante: ID del estudiante a actualizar
+            nombre_completo: Nombre completo del estudiante
+            rut: RUT del estudiante
+            path_foto: Nombre del archivo de foto (ej. 'juan_perez.jpg')
+
+        Returns:
+            Dict con información actualizada del estudiante o None si falla o no existe
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                # MySQL informa en rowcount las filas modificadas, no las encontradas:
+                # un UPDATE sin cambios daría 0, así que la existencia se verifica antes
+                cursor.execute(
+                    "SELECT id_colegio FROM estudiantes WHERE id_estudiante = %s AND eliminado_en IS NULL",
+                    (id_estudiante,)
+                )
+                fila = cursor.fetchone()
+                if fila is None:
+                    cursor.close()
+                    logger.error(f"Error al actualizar estudiante ID {id_estudiante}: no existe")
+                    return None
+
+                query = """
+                UPDATE estudiantes
+                SET nombre_completo = %s, rut = %s, path_foto_referencia = %s
+                WHERE id_estudiante = %s
+                """
+                cursor.execute(query, (nombre_completo, rut, path_foto, id_estudiante))
+                cursor.close()
+
+                return {
+                    "id_estudiante": id_estudiante,
+                    "nombre_completo": nombre_completo,
+                    "rut": rut,
+                    "path_foto_referencia": path_foto,
+                    "id_colegio": fila['id_colegio']
+                }
+
+        except mysql.connector.Error as e:
+            if e.errno == 1062:  # Error 'Duplicate entry'
+                logger.error(
+                    f"Error al actualizar estudiante ID {id_estudiante}: RUT '{rut}' ya existe."
+                )
+                return None
+            logger.error(f"Error al actualizar estudiante ID {id_estudiante}: {e}")
+            return None
+
+    def eliminar_estudiante(self, id_estudiante: int) -> bool:
+        """
+        Da de baja un estudiante conservando su historial de asistencia
+
+        La fila queda con eliminado_en (deja de aparecer en listados, rosters y
+        enrolamiento) y su RUT se libera para poder volver a matricularlo. Se
+        quitan su inscripción en cursos y sus fotos adicionales.
+
+        Args:
+            id_estudiante: ID del estudiante a eliminar
+
+        Returns:
+            True si el estudiante existía y fue dado de baja
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                cursor.execute(
+                    """
+                    UPDATE estudiantes
+                    SET eliminado_en = NOW(), rut = NULL
+                    WHERE id_estudiante = %s AND eliminado_en IS NULL
+                    """,
+                    (id_estudiante,)
+                )
+                eliminado = cursor.rowcount > 0
+
+                if eliminado:
+                    cursor.execute("DELETE FROM curso_estudiantes WHERE id_estudiante = %s", (id_estudiante,))
+                    cursor.execute("DELETE FROM fotos_estudiante WHERE id_estudiante = %s", (id_estudiante,))
+                cursor.close()
+
+                return eliminado
+
+        except Error as e:
+            logger.error(f"Error al eliminar estudiante ID {id_estudiante}: {e}")
+            return False
+
+    def agregar_foto_estudiante(self, id_estudiante: int, path_foto: str) -> Optional[int]:
+        """
+        Registra una foto de referencia adicional de un estudiante
+
+        Args:
+            id_estudiante: ID del estudiante
+            path_foto: Nombre del archivo de foto (ej. 'juan_perez_2.jpg')
+
+        Returns:
+            ID de la foto creada o None si falla
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "INSERT INTO fotos_estudiante (id_estudiante, path_foto) VALUES (%s, %s)",
+                    (id_estudiante, path_foto)
+                )
+                id_foto = cursor.lastrowid
+                cursor.close()
+
+                return id_foto
+
+        except Error as e:
+            logger.error(f"Error al agregar foto del estudiante ID {id_estudiante}: {e}")
+            return None
+
+    def eliminar_fotos_estudiante(self, id_estudiante: int) -> List[str]:
+        """
+        Elimina las fotos de referencia adicionales de un estudiante
+
+        Args:
+            id_estudiante: ID del estudiante
+
+        Returns:
+            Nombres de archivo de las fotos eliminadas de la BD
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(
+                    "SELECT path_foto FROM fotos_estudiante WHERE id_estudiante = %s",
+                    (id_estudiante,)
+                )
+                fotos = [fila['path_foto'] for fila in cursor.fetchall()]
+                cursor.execute("DELETE FROM fotos_estudiante WHERE id_estudiante = %s", (id_estudiante,))
+                cursor.close()
+
+                return fotos
+
+        except Error as e:
+            logger.error(f"Error al eliminar fotos del estudiante ID {id_estudiante}: {e}")
+            return []
+
     def registrar_asistencia(
         self,
         id_estudiante: int,
@@ -175,15 +331,27 @@ class Database:
                 cursor = conn.cursor(dictionary=True)
 
                 query = """
-                SELECT id_estudiante, nombre_completo, rut, path_foto_referencia
+                SELECT id_estudiante, nombre_completo, rut, path_foto_referencia, id_colegio
                 FROM estudiantes
+                WHERE eliminado_en IS NULL
                 ORDER BY nombre_completo
                 """
 
                 cursor.execute(query)
                 estudiantes = cursor.fetchall()
+
+                # Fotos de referencia adicionales de cada estudiante
+                cursor.execute(
+                    "SELECT id_estudiante, path_foto FROM fotos_estudiante ORDER BY id_foto"
+                )
+                fotos: Dict[int, List[str]] = {}
+                for fila in cursor.fetchall():
+                    fotos.setdefault(fila['id_estudiante'], []).append(fila['path_foto'])
                 cursor.close()
 
+                for estudiante in estudiantes:
+                    estudiante['fotos_adicionales'] = fotos.get(estudiante['id_estudiante'], [])
+
                 return estudiantes
 
         except Error as e:
@@ -247,13 +415,20 @@ class Database:
                 cursor = conn.cursor(dictionary=True)
 
                 query = """
-                SELECT id_estudiante, nombre_completo, rut, path_foto_referencia
+                SELECT id_estudiante, nombre_completo, rut, path_foto_referencia, id_colegio
                 FROM estudiantes
-                WHERE id_estudiante = %s
+                WHERE id_estudiante = %s AND eliminado_en IS NULL
                 """
 
                 cursor.execute(query, (id_estudiante,))
                 estudiante = cursor.fetchone()
+
+                if estudiante:
+                    cursor.execute(
+                        "SELECT path_foto FROM fotos_estudiante WHERE id_estudiante = %s ORDER BY id_foto",
+                        (id_estudiante,)
+                    )
+                    estudiante['fotos_adicionales'] = [fila['path_foto'] for fila in cursor.fetchall()]
                 cursor.close()
 
                 return estudiante
@@ -300,6 +475,285 @@ class Database:
             logger.error(f"Error al verificar cooldown para estudiante ID {id_estudiante}: {e}")
             return False
 
+    def obtener_colegios_dispositivos(self) -> Dict[str, int]:
+        """
+        Obtiene el colegio dueño de cada dispositivo
+
+        Returns:
+            Dict {device_id: id_colegio} solo con los dispositivos que tienen colegio
+
+        Example:
+            >>> db.obtener_colegios_dispositivos()
+            {'pi-aula-101': 1, 'pi-entrada-sur': 2}
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                query = """
+                SELECT device_id, id_colegio
+                FROM dispositivos
+                WHERE id_colegio IS NOT NULL
+                """
+
+                cursor.execute(query)
+                filas = cursor.fetchall()
+                cursor.close()
+
+                return {fila['device_id']: fila['id_colegio'] for fila in filas}
+
+        except Error as e:
+            logger.error(f"Error al obtener colegios de dispositivos: {e}")
+            return {}
+
+    def obtener_roi_dispositivos(self) -> Dict[str, Tuple[float, float, float, float]]:
+        """
+        Obtiene la región de interés configurada para cada dispositivo
+
+        Returns:
+            Dict {device_id: (x, y, ancho, alto)} como fracción del frame,
+            solo con los dispositivos que tienen ROI
+
+        Example:
+            >>> db.obtener_roi_dispositivos()
+            {'pi-entrada-sur': (0.0, 0.3, 1.0, 0.4)}
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                query = """
+                SELECT device_id, roi_x, roi_y, roi_ancho, roi_alto
+                FROM dispositivos
+                WHERE roi_ancho IS NOT NULL
+                """
+
+                cursor.execute(query)
+                filas = cursor.fetchall()
+                cursor.close()
+
+                return {
+                    fila['device_id']: (
+                        float(fila['roi_x']),
+                        float(fila['roi_y']),
+                        float(fila['roi_ancho']),
+                        float(fila['roi_alto'])
+                    )
+                    for fila in filas
+                }
+
+        except Error as e:
+            logger.error(f"Error al obtener ROI de dispositivos: {e}")
+            return {}
+
+    def actualizar_roi_dispositivo(
+        self,
+        device_id: str,
+        roi: Optional[Tuple[float, float, float, float]]
+    ) -> bool:
+        """
+        Guarda (o borra) la región de interés de un dispositivo
+
+        Crea la fila del dispositivo si todavía no existe en la tabla.
+
+        Args:
+            device_id: ID del dispositivo
+            roi: (x, y, ancho, alto) como fracción del frame (None = frame completo)
+
+        Returns:
+            True si se guardó correctamente
+        """
+        valores = roi if roi is not None else (None, None, None, None)
+
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                query = """
+                INSERT INTO dispositivos (device_id, roi_x, roi_y, roi_ancho, roi_alto)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    roi_x = VALUES(roi_x),
+                    roi_y = VALUES(roi_y),
+                    roi_ancho = VALUES(roi_ancho),
+                    roi_alto = VALUES(roi_alto)
+                """
+
+                cursor.execute(query, (device_id, *valores))
+                cursor.close()
+
+                logger.info(f"ROI del dispositivo {device_id} actualizada: {roi}")
+                return True
+
+        except Error as e:
+            logger.error(f"Error al actualizar ROI del dispositivo {device_id}: {e}")
+            return False
+
+    def obtener_perfiles_dispositivos(self) -> Dict[str, str]:
+        """
+        Obtiene el perfil de reconocimiento asignado a cada dispositivo
+
+        Returns:
+            Dict {device_id: perfil} solo con los dispositivos que tienen perfil
+
+        Example:
+            >>> db.obtener_perfiles_dispositivos()
+            {'pi-torniquete-1': 'cercano', 'pi-auditorio': 'amplio'}
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                query = """
+                SELECT device_id, perfil
+                FROM dispositivos
+                WHERE perfil IS NOT NULL
+                """
+
+                cursor.execute(query)
+                filas = cursor.fetchall()
+                cursor.close()
+
+                return {fila['device_id']: fila['perfil'] for fila in filas}
+
+        except Error as e:
+            logger.error(f"Error al obtener perfiles de dispositivos: {e}")
+            return {}
+
+    def actualizar_perfil_dispositivo(self, device_id: str, perfil: Optional[str]) -> bool:
+        """
+        Asigna (o quita) el perfil de reconocimiento de un dispositivo
+
+        Crea la fila del dispositivo si todavía no existe en la tabla.
+
+        Args:
+            device_id: ID del dispositivo
+            perfil: Nombre del perfil (None = perfil por defecto)
+
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                query = """
+                INSERT INTO dispositivos (device_id, perfil)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE perfil = VALUES(perfil)
+                """
+
+                cursor.execute(query, (device_id, perfil))
+                cursor.close()
+
+                logger.info(f"Perfil del dispositivo {device_id} actualizado: {perfil}")
+                return True
+
+        except Error as e:
+            logger.error(f"Error al actualizar perfil del dispositivo {device_id}: {e}")
+            return False
+
+    def obtener_pesos_dispositivos(self) -> Dict[str, float]:
+        """
+        Obtiene el peso de cada dispositivo en el reparto del reconocimiento
+
+        Returns:
+            Dict {device_id: peso} solo con los dispositivos que tienen peso
+
+        Example:
+            >>> db.obtener_pesos_dispositivos()
+            {'pi-entrada-principal': 3.0}
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                query = """
+                SELECT device_id, peso
+                FROM dispositivos
+                WHERE peso IS NOT NULL
+                """
+
+                cursor.execute(query)
+                filas = cursor.fetchall()
+                cursor.close()
+
+                return {fila['device_id']: float(fila['peso']) for fila in filas}
+
+        except Error as e:
+            logger.error(f"Error al obtener pesos de dispositivos: {e}")
+            return {}
+
+    def actualizar_peso_dispositivo(self, device_id: str, peso: Optional[float]) -> bool:
+        """
+        Asigna (o quita) el peso de un dispositivo en el reparto del reconocimiento
+
+        Crea la fila del dispositivo si todavía no existe en la tabla.
+
+        Args:
+            device_id: ID del dispositivo
+            peso: Peso relativo (None = 1)
+
+        Returns:
+            True si se guardó correctamente
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+
+                query = """
+                INSERT INTO dispositivos (device_id, peso)
+                VALUES (%s, %s)
+                ON DUPLICATE KEY UPDATE peso = VALUES(peso)
+                """
+
+                cursor.execute(query, (device_id, peso))
+                cursor.close()
+
+                logger.info(f"Peso del dispositivo {device_id} actualizado: {peso}")
+                return True
+
+        except Error as e:
+            logger.error(f"Error al actualizar peso del dispositivo {device_id}: {e}")
+            return False
+
+    def obtener_rosters_dispositivos(self) -> Dict[str, List[int]]:
+        """
+        Obtiene los estudiantes del curso asignado a cada dispositivo
+
+        Returns:
+            Dict {device_id: [id_estudiante, ...]} solo con los dispositivos
+            que tienen un curso asignado
+
+        Example:
+            >>> db.obtener_rosters_dispositivos()
+            {'pi-aula-101': [1, 4, 7], 'pi-aula-102': [2, 3]}
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+
+                query = """
+                SELECT d.device_id, ce.id_estudiante
+                FROM dispositivos d
+                INNER JOIN curso_estudiantes ce ON d.id_curso = ce.id_curso
+                ORDER BY d.device_id
+                """
+
+                cursor.execute(query)
+                filas = cursor.fetchall()
+                cursor.close()
+
+                rosters: Dict[str, List[int]] = {}
+                for fila in filas:
+                    rosters.setdefault(fila['device_id'], []).append(fila['id_estudiante'])
+
+                return rosters
+
+        except Error as e:
+            logger.error(f"Error al obtener rosters de dispositivos: {e}")
+            return {}
+
 
 # Instancia global
 db = Database()
@@ -0,0 +1,147 @@
+"""
+detection.py - Detección de rostros sobre una copia reducida del frame
+HOG se ejecuta sobre una imagen de FRAME_RESIZE_WIDTH de ancho y las cajas se
+escalan de vuelta al frame original, donde face_encodings recorta los rostros
+en resolución completa. Si el dispositivo tiene una región de interés (ROI),
+solo se detecta dentro de ese rectángulo
+"""
+
+from typing import List, Optional, Tuple
+
+import face_recognition
+import numpy as np
+from PIL import Image
+
+# (top, right, bottom, left) en píxeles, igual que face_recognition
+Ubicacion = Tuple[int, int, int, int]
+
+# (x, y, ancho, alto) como fracción del frame (0-1): no depende de la resolución
+Roi = Tuple[float, float, float, float]
+
+
+def reducir(image_array: np.ndarray, ancho: int) -> Tuple[np.ndarray, float]:
+    """
+    Reduce un frame RGB a `ancho` píxeles manteniendo la proporción
+
+    Args:
+        image_array: Frame (alto, ancho, 3) uint8
+        ancho: Ancho destino (0 o mayor que el frame = sin reducir)
+
+    Returns:
+        Tupla (imagen reducida, escala) con escala = ancho original / ancho reducido
+    """
+    alto_original, ancho_original = image_array.shape[:2]
+
+    if ancho <= 0 or ancho_original <= ancho:
+        return image_array, 1.0
+
+    escala = ancho_original / ancho
+    alto = max(1, round(alto_original / escala))
+    reducida = Image.fromarray(image_array).resize((ancho, alto), Image.BILINEAR)
+
+    return np.array(reducida), escala
+
+
+def escalar_ubicaciones(
+    ubicaciones: List[Ubicacion],
+    escala: float,
+    forma: Tuple[int, ...]
+) -> List[Ubicacion]:
+    """Lleva cajas de la imagen reducida a coordenadas del frame original (recortadas al borde)"""
+    if escala == 1.0:
+        return list(ubicaciones)
+
+    alto, ancho = forma[:2]
+    return [
+        (
+            max(0, int(top * escala)),
+            min(ancho, int(round(right * escala))),
+            min(alto, int(round(bottom * escala))),
+            max(0, int(left * escala))
+        )
+        for top, right, bottom, left in ubicaciones
+    ]
+
+
+def recortar_roi(image_array: np.ndarray, roi: Roi) -> Tuple[np.ndarray, int, int]:
+    """
+    Recorta la región de interés de un frame
+
+    Args:
+        image_array: Frame (alto, ancho, 3)
+        roi: (x, y, ancho, alto) como fracción del frame
+
+    Returns:
+        Tupla (recorte contiguo, top, left) con el desplazamiento del recorte en píxeles
+    """
+    alto, ancho = image_array.shape[:2]
+    x, y, ancho_roi, alto_roi = roi
+
+    left = min(ancho - 1, max(0, int(x * ancho)))
+    top = min(alto - 1, max(0, int(y * alto)))
+    right = min(ancho, max(left + 1, round((x + ancho_roi) * ancho)))
+    bottom = min(alto, max(top + 1, round((y + alto_roi) * alto)))
+
+    # Copia contigua: dlib no acepta vistas con saltos entre filas
+    return np.ascontiguousarray(image_array[top:bottom, left:right]), top, left
+
+
+def desplazar_ubicaciones(ubicaciones: List[Ubicacion], top: int, left: int) -> List[Ubicacion]:
+    """Lleva cajas de un recorte a coordenadas del frame completo"""
+    return [(t + top, r + left, b + top, l + left) for t, r, b, l in ubicaciones]
+
+
+def detectar_rostros(
+    image_array: np.ndarray,
+    ancho_deteccion: int,
+    modelo: str = "hog",
+    roi: Optional[Roi] = None,
+    upsample: int = 1,
+    forma: Optional[Tuple[int, ...]] = None
+) -> List[Ubicacion]:
+    """
+    Detecta rostros en una copia reducida y devuelve las cajas del frame original
+
+    Con ROI se detecta solo dentro del recorte, reducido con la misma escala
+    que tendría el frame completo: el costo baja en proporción al área
+    descartada y el tamaño mínimo de rostro detectable no cambia.
+
+    Args:
+        image_array: Frame RGB en resolución completa
+        ancho_deteccion: Ancho de la copia donde se detecta (el del perfil del dispositivo)
+        modelo: "hog" o "cnn"
+        roi: Región de interés del dispositivo (None = frame completo)
+        upsample: Veces que HOG/CNN amplía la imagen para hallar rostros pequeños
+            (cada nivel cuadruplica el costo; 0 para cámaras cercanas)
+        forma: Forma del frame completo si image_array es una copia reducida
+            del mismo frame (decodificación draft). None = image_array es el frame
+
+    Returns:
+        Lista de (top, right, bottom, left) en coordenadas del frame completo
+
+    Example:
+        >>> ubicaciones = detectar_rostros(frame_1080p, 480, roi=(0.0, 0.25, 1.0, 0.5))
+        >>> face_recognition.face_encodings(frame_1080p, ubicaciones)
+    """
+    if roi is None:
+        reducida, escala = reducir(image_array, ancho_deteccion)
+        ubicaciones = face_recognition.face_locations(
+            reducida, number_of_times_to_upsample=upsample, model=modelo
+        )
+        ubicaciones = escalar_ubicaciones(ubicaciones, escala, image_array.shape)
+    else:
+        recorte, top, left = recortar_roi(image_array, roi)
+
+        ancho_recorte = 0
+        if 0 < ancho_deteccion < image_array.shape[1]:
+            ancho_recorte = max(1, round(recorte.shape[1] * ancho_deteccion / image_array.shape[1]))
+
+        reducida, escala = reducir(recorte, ancho_recorte)
+        ubicaciones = face_recognition.face_locations(
+            reducida, number_of_times_to_upsample=upsample, model=modelo
+        )
+        ubicaciones = desplazar_ubicaciones(escalar_ubicaciones(ubicaciones, escala, recorte.shape), top, left)
+
+    if forma is None:
+        return ubicaciones
+    return escalar_ubicaciones(ubicaciones, forma[1] / image_array.shape[1], forma)
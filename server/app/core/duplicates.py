@@ -0,0 +1,124 @@
+"""
+duplicates.py - Detección de estudiantes enrolados más de una vez
+Calcula las distancias de todos los pares de la galería por bloques, de modo
+que la memoria usada es O(bloque²) aunque la galería tenga decenas de miles
+de rostros; el mismo cálculo se usa para revisar una foto nueva al enrolar
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+# Pares de estudiantes distintos: {(id_a, id_b): distancia mínima} con id_a < id_b
+Pares = Dict[Tuple[int, int], float]
+
+
+def _pares_bajo_umbral(
+    encodings_a: np.ndarray,
+    norms_a: np.ndarray,
+    encodings_b: np.ndarray,
+    norms_b: np.ndarray,
+    umbral: float
+) -> Iterator[Tuple[int, int, float]]:
+    """Devuelve (fila_a, fila_b, distancia) de los pares de un bloque con distancia <= umbral"""
+    d2 = norms_a[:, np.newaxis] + norms_b[np.newaxis, :] - 2.0 * (encodings_a @ encodings_b.T)
+    filas, columnas = np.nonzero(d2 <= umbral * umbral)
+    distancias = np.sqrt(np.maximum(d2[filas, columnas], 0.0))
+    return zip(filas.tolist(), columnas.tolist(), distancias.tolist())
+
+
+def _registrar(pares: Pares, id_a: int, id_b: int, distancia: float) -> None:
+    """Guarda la menor distancia entre dos estudiantes distintos"""
+    if id_a == id_b:
+        return  # Varias fotos / prototipos del mismo estudiante
+    clave = (id_a, id_b) if id_a < id_b else (id_b, id_a)
+    if distancia < pares.get(clave, np.inf):
+        pares[clave] = distancia
+
+
+def auditar_galeria(gallery: Gallery, umbral: float, bloque: int = 2048) -> Pares:
+    """
+    Busca pares de estudiantes distintos con rostros sospechosamente parecidos
+
+    Recorre solo el triángulo superior de la matriz de distancias, de a
+    bloques de `bloque` x `bloque` filas (16 MB en float32 con 2048).
+
+    Args:
+        gallery: Galería a auditar
+        umbral: Distancia máxima para reportar un par (menor que FACE_TOLERANCE)
+        bloque: Filas por bloque (acota la memoria usada)
+
+    Returns:
+        Dict {(id_a, id_b): distancia mínima entre sus rostros}
+
+    Example:
+        >>> pares = auditar_galeria(gallery, 0.4)
+        >>> pares
+        {(12, 873): 0.31}
+    """
+    pares: Pares = {}
+    n = len(gallery)
+
+    for inicio_a in range(0, n, bloque):
+        fin_a = min(inicio_a + bloque, n)
+        encodings_a = np.asarray(gallery.encodings[inicio_a:fin_a])
+        norms_a = np.asarray(gallery.norms_sq[inicio_a:fin_a])
+
+        for inicio_b in range(inicio_a, n, bloque):
+            fin_b = min(inicio_b + bloque, n)
+            pares_bloque = _pares_bajo_umbral(
+                encodings_a, norms_a,
+                np.asarray(gallery.encodings[inicio_b:fin_b]),
+                np.asarray(gallery.norms_sq[inicio_b:fin_b]),
+                umbral
+            )
+
+            for fila, columna, distancia in pares_bloque:
+                fila_a, fila_b = inicio_a + fila, inicio_b + columna
+                if fila_a < fila_b:
+                    _registrar(pares, int(gallery.ids[fila_a]), int(gallery.ids[fila_b]), distancia)
+
+    return pares
+
+
+def buscar_similares(
+    gallery: Gallery,
+    encodings: np.ndarray,
+    umbral: float,
+    id_excluir: Optional[int] = None,
+    bloque: int = 2048
+) -> List[Tuple[int, float]]:
+    """
+    Busca estudiantes de la galería parecidos a los encodings de una foto nueva
+
+    Args:
+        gallery: Galería actual
+        encodings: Encodings del estudiante que se está enrolando
+        umbral: Distancia máxima para considerarlo posible duplicado
+        id_excluir: ID del propio estudiante (al actualizar su foto)
+        bloque: Filas de la galería por bloque
+
+    Returns:
+        Lista [(id_estudiante, distancia)] ordenada de menor a mayor distancia
+    """
+    q = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+    norms_q = np.einsum('ij,ij->i', q, q)
+    similares: Dict[int, float] = {}
+
+    for inicio in range(0, len(gallery), bloque):
+        fin = min(inicio + bloque, len(gallery))
+        pares_bloque = _pares_bajo_umbral(
+            q, norms_q,
+            np.asarray(gallery.encodings[inicio:fin]),
+            np.asarray(gallery.norms_sq[inicio:fin]),
+            umbral
+        )
+
+        for _, columna, distancia in pares_bloque:
+            id_estudiante = int(gallery.ids[inicio + columna])
+            if id_estudiante != id_excluir and distancia < similares.get(id_estudiante, np.inf):
+                similares[id_estudiante] = distancia
+
+    return sorted(similares.items(), key=lambda par: par[1])
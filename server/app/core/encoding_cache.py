@@ -0,0 +1,101 @@
+"""
+encoding_cache.py - Cache de encodings por hash de contenido de la foto
+Permite que una regeneración completa de la galería omita HOG + encoder
+para las fotos que no cambiaron desde la última vez
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EncodingCache:
+    """Mapa sha256(foto) -> encoding, persistido en disco"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Un array vacío indica que la foto no tiene rostro (también se cachea)
+        self._entradas: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._modificado = False
+
+        if os.path.exists(path):
+            self.cargar()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    @staticmethod
+    def hash_archivo(path: str) -> str:
+        """Calcula el sha256 del contenido de un archivo"""
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(bloque)
+        return h.hexdigest()
+
+    def cargar(self) -> None:
+        """Carga el cache desde disco (si falla, se parte con cache vacío)"""
+        try:
+            with open(self.path, 'rb') as f:
+                self._entradas = pickle.load(f)
+            logger.info(f"Cache de encodings cargado: {len(self._entradas)} fotos")
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el cache de encodings {self.path}: {e}")
+            self._entradas = {}
+
+    def obtener(self, hash_foto: str) -> Optional[np.ndarray]:
+        """
+        Busca el encoding de una foto ya procesada
+
+        Returns:
+            Encoding (128,), array vacío si la foto no tenía rostro,
+            o None si la foto no está en el cache
+        """
+        with self._lock:
+            return self._entradas.get(hash_foto)
+
+    def agregar(self, hash_foto: str, encoding: Optional[np.ndarray]) -> None:
+        """Registra el resultado de codificar una foto (None = sin rostro)"""
+        valor = (
+            np.empty(0, dtype=np.float32) if encoding is None
+            else np.asarray(encoding, dtype=np.float32)
+        )
+        with self._lock:
+            self._entradas[hash_foto] = valor
+            self._modificado = True
+
+    def podar(self, vigentes: Iterable[str]) -> None:
+        """Elimina las entradas de fotos que ya no existen"""
+        vigentes = set(vigentes)
+        with self._lock:
+            obsoletos = [h for h in self._entradas if h not in vigentes]
+            for h in obsoletos:
+                del self._entradas[h]
+            if obsoletos:
+                self._modificado = True
+
+    def persistir(self) -> None:
+        """Guarda el cache en disco si cambió (escritura atómica)"""
+        with self._lock:
+            if not self._modificado:
+                return
+            entradas = dict(self._entradas)
+            self._modificado = False
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(entradas, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error al guardar cache de encodings en {self.path}: {e}")
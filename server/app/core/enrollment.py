@@ -0,0 +1,136 @@
+"""
+enrollment.py - Pipeline paralelo de codificación de fotos de estudiantes
+Reparte load_image_file + face_encodings entre varios procesos con un número
+acotado de fotos en vuelo, y reporta el avance a medida que llegan resultados
+"""
+
+import logging
+import multiprocessing
+import os
+from multiprocessing import forkserver
+from multiprocessing.context import BaseContext
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterator, List, Optional, Set, Tuple
+
+import face_recognition
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (ruta, encoding o None si no hay rostro, mensaje de error o None)
+ResultadoFoto = Tuple[str, Optional[np.ndarray], Optional[str]]
+
+
+def codificar_foto(full_path: str) -> ResultadoFoto:
+    """
+    Carga una foto y genera el encoding de su primer rostro
+
+    Se ejecuta dentro de los procesos del pool: nunca lanza excepciones,
+    los errores se devuelven para que el proceso principal los registre.
+    """
+    try:
+        image = face_recognition.load_image_file(full_path)
+        face_encodings = face_recognition.face_encodings(image)
+        encoding = face_encodings[0] if len(face_encodings) > 0 else None
+        return full_path, encoding, None
+    except Exception as e:
+        return full_path, None, str(e)
+
+
+def contexto_multiproceso() -> BaseContext:
+    """
+    Contexto de los procesos worker (enrolamiento e inferencia)
+
+    Nunca fork directo: el servidor ya tiene threads (executors, uvicorn) y
+    un hijo copiado a mitad de un lock tomado por otro thread puede quedar
+    bloqueado para siempre. Con forkserver los hijos salen de un proceso
+    aparte, sin threads, que ya importó face_recognition y los modelos de
+    dlib (ver preparar_multiproceso); donde no existe se usa spawn.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+
+    contexto = multiprocessing.get_context("forkserver")
+    # Solo librerías: las galerías las abre cada worker desde disco, así un
+    # worker reiniciado nunca parte con una copia vieja
+    contexto.set_forkserver_preload(["numpy", "face_recognition"])
+    return contexto
+
+
+def preparar_multiproceso() -> None:
+    """Lanza el proceso forkserver al arrancar (y no con el primer frame o enrolamiento)"""
+    if contexto_multiproceso().get_start_method() == "forkserver":
+        forkserver.ensure_running()
+
+
+def codificar_fotos_paralelo(
+    fotos: List[str],
+    workers: int,
+    max_pendientes: int,
+    intervalo_progreso: float = 5.0
+) -> Iterator[ResultadoFoto]:
+    """
+    Codifica fotos en un pool de procesos, entregando resultados en orden de llegada
+
+    Args:
+        fotos: Rutas completas de las fotos a codificar
+        workers: Número de procesos
+        max_pendientes: Máximo de fotos en vuelo (acota la memoria usada)
+        intervalo_progreso: Segundos entre mensajes de avance en el log
+
+    Yields:
+        Tuplas (ruta, encoding o None, error o None)
+
+    Example:
+        >>> for path, encoding, error in codificar_fotos_paralelo(fotos, 16, 32):
+        ...     print(path, encoding is not None)
+    """
+    total = len(fotos)
+    if total == 0:
+        return
+
+    workers = max(1, min(workers, total))
+    max_pendientes = max(workers, max_pendientes)
+
+    inicio = time.perf_counter()
+    ultimo_reporte = inicio
+    procesadas = 0
+
+    def reportar() -> None:
+        transcurrido = time.perf_counter() - inicio
+        fotos_por_segundo = procesadas / transcurrido if transcurrido > 0 else 0.0
+        logger.info(f"Encodings: {procesadas}/{total} fotos ({fotos_por_segundo:.1f} fotos/s)")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=contexto_multiproceso()) as pool:
+        pendientes: Set[Future] = set()
+        siguientes = iter(fotos)
+        agotadas = False
+
+        while pendientes or not agotadas:
+            # Mantener a lo más max_pendientes fotos en vuelo
+            while not agotadas and len(pendientes) < max_pendientes:
+                path = next(siguientes, None)
+                if path is None:
+                    agotadas = True
+                else:
+                    pendientes.add(pool.submit(codificar_foto, path))
+
+            listos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+
+            for futuro in listos:
+                procesadas += 1
+                yield futuro.result()
+
+            if time.perf_counter() - ultimo_reporte >= intervalo_progreso:
+                ultimo_reporte = time.perf_counter()
+                reportar()
+
+    reportar()
+
+
+def workers_por_defecto(configurados: int) -> int:
+    """Resuelve ENROLLMENT_WORKERS (0 = todos los núcleos disponibles)"""
+    if configurados > 0:
+        return configurados
+    return os.cpu_count() or 1
@@ -3,63 +3,416 @@ face_recognition.py - Módulo de reconocimiento facial
 Carga encodings y compara rostros usando face_recognition library
 """
 
+import dlib
 import face_recognition
 import numpy as np
-import pickle
 import os
 import base64
 from PIL import Image
 import io
-from typing import Dict, List, Optional, Any, Tuple
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Sequence, Tuple, Union
 import logging
+from pathlib import Path
 
+from app.core.gallery import Gallery
+from app.core.snapshot import GallerySnapshot
+from app.core.quantization import GaleriaCompacta
+from app.core.prototypes import comprimir_galeria, prototipos_estudiante
+from app.core.duplicates import auditar_galeria, buscar_similares
+from app.core.detection import Roi, Ubicacion, detectar_rostros
+from app.core.profiles import PERFIL_POR_DEFECTO, PerfilReconocimiento
+from app.core.tracking import Identidad, Pista, rastreador
+from app.core.motion import detector_movimiento
+from app.core.frame_cache import cache_frames
+from app.core.quality import evaluar as evaluar_calidad
+from app.core.metrics import metricas
+from app.core.gallery_store import abrir_galeria, guardar_galeria, migrar_desde_pickle
+from app.core.ann_index import IVFIndex
+from app.core.encoding_cache import EncodingCache
+from app.core.enrollment import codificar_foto, codificar_fotos_paralelo, workers_por_defecto
 from app.config import (
     PHOTOS_DIR,
     ENCODINGS_FILE,
+    GALLERY_FILE,
+    GALLERY_RAW_FILE,
+    ENCODINGS_CACHE_FILE,
+    PROTOTYPES_PER_STUDENT,
     FACE_TOLERANCE,
-    FACE_DETECTION_MODEL,
-    KEEP_PHOTOS_AFTER_ENCODING
+    TRACKING_ENABLED,
+    MOTION_GATING,
+    QUALITY_GATE,
+    JPEG_DRAFT_WIDTH,
+    KEEP_PHOTOS_AFTER_ENCODING,
+    ENROLLMENT_WORKERS,
+    ENROLLMENT_MAX_PENDING,
+    ENROLLMENT_MIN_PARALLEL,
+    ANN_INDEX,
+    ANN_MIN_GALLERY_SIZE,
+    ANN_NLIST,
+    ANN_NPROBE,
+    ANN_INDEX_FILE,
+    ROSTER_FALLBACK_GLOBAL,
+    GALLERY_PRECISION,
+    RERANK_CANDIDATES,
+    DUPLICATE_THRESHOLD
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _a_rgb(img: Image.Image) -> np.ndarray:
+    """Array RGB escribible (dlib no acepta arrays de solo lectura); convierte solo si hace falta"""
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return np.array(img)
+
+
+@dataclass
+class FrameDraft:
+    """
+    JPEG decodificado en modo draft (JPEG_DRAFT_WIDTH) para el descarte por movimiento y la detección
+
+    La resolución completa se decodifica solo si algún rostro pasa al filtro
+    de calidad o al encoder: un frame sin rostros nuevos (la mayoría, con
+    seguimiento) nunca paga la IDCT completa.
+    """
+
+    datos: bytes
+    reducida: np.ndarray
+    # Forma (alto, ancho, 3) del frame completo: las cajas se expresan en ella
+    forma: Tuple[int, ...]
+    _completa: Optional[np.ndarray] = field(default=None, repr=False)
+
+    def completa(self) -> np.ndarray:
+        """Frame en resolución completa (se decodifica la primera vez)"""
+        if self._completa is None:
+            with metricas.medir("decode_completo"):
+                self._completa = _a_rgb(Image.open(io.BytesIO(self.datos)))
+        return self._completa
+
+
+# Frame decodificado para el pipeline: completo o en modo draft
+Imagen = Union[np.ndarray, FrameDraft]
+
+
+@dataclass
+class FrameDetectado:
+    """Frame ya detectado, a la espera del encoder (ver FaceRecognitionProcessor.detectar)"""
+
+    imagen: np.ndarray
+    device_id: Optional[str]
+    snapshot: GallerySnapshot
+    perfil: PerfilReconocimiento
+    ubicaciones: List[Ubicacion] = field(default_factory=list)
+    pistas: Optional[List[Pista]] = None
+    identidades: List[Optional[Identidad]] = field(default_factory=list)
+    # Índices (en `ubicaciones`) de los rostros que hay que codificar
+    pendientes: List[int] = field(default_factory=list)
+    rechazados: List[int] = field(default_factory=list)
+    # Resultado final si el frame no necesita el encoder (sin rostros, error, etc.)
+    resultado: Optional[Dict[str, Any]] = None
+    # Segundos del lote del encoder atribuidos a este frame (para el planificador)
+    costo_lote_s: float = 0.0
+
+    @property
+    def por_codificar(self) -> List[Ubicacion]:
+        return [self.ubicaciones[i] for i in self.pendientes]
+
+
+def codificar_rostros(
+    imagenes: Sequence[np.ndarray],
+    ubicaciones: Sequence[Sequence[Ubicacion]]
+) -> List[List[np.ndarray]]:
+    """
+    Encodings de 128-d de los rostros de varios frames en una sola pasada de la red
+
+    face_recognition.face_encodings evalúa la red de dlib rostro por rostro;
+    aquí se calculan los 5 landmarks de cada rostro y se usa la sobrecarga
+    por lotes de compute_face_descriptor (lista de imágenes), que arma los
+    recortes alineados de todos los frames y los evalúa juntos. Con una
+    versión de dlib sin esa sobrecarga se vuelve a face_encodings por frame.
+
+    Args:
+        imagenes: Frames RGB en resolución completa
+        ubicaciones: Lista paralela con las cajas (top, right, bottom, left) a codificar
+
+    Returns:
+        Lista paralela a `imagenes` con los encodings de cada frame
+    """
+    resultado: List[List[np.ndarray]] = [[] for _ in imagenes]
+    con_rostros = [k for k, cajas in enumerate(ubicaciones) if cajas]
+    if not con_rostros:
+        return resultado
+
+    try:
+        api = face_recognition.api
+        lote_imagenes = []
+        lote_formas = []
+        for k in con_rostros:
+            formas = dlib.full_object_detections()
+            for top, right, bottom, left in ubicaciones[k]:
+                formas.append(api.pose_predictor_5_point(imagenes[k], dlib.rectangle(left, top, right, bottom)))
+            lote_imagenes.append(imagenes[k])
+            lote_formas.append(formas)
+
+        descriptores = api.face_encoder.compute_face_descriptor(lote_imagenes, lote_formas, 1)
+        for k, descriptores_frame in zip(con_rostros, descriptores):
+            resultado[k] = [np.array(descriptor) for descriptor in descriptores_frame]
+
+    except (AttributeError, TypeError) as e:
+        logger.debug(f"compute_face_descriptor sin soporte de lotes ({e}), se codifica por frame")
+        for k in con_rostros:
+            resultado[k] = face_recognition.face_encodings(imagenes[k], list(ubicaciones[k]))
+
+    return resultado
+
+
 class FaceRecognitionProcessor:
     """Clase para procesar reconocimiento facial"""
 
-    def __init__(self) -> None:
-        self.known_encodings: List[np.ndarray] = []
-        self.known_ids: List[int] = []
-        self.known_names: List[str] = []
-        self.encodings_loaded: bool = False
+    # Cada modificación de una galería del proceso recibe un número de un
+    # contador común; `publicaciones` guarda el último por galería (clave:
+    # directorio, None = global) y los workers de inferencia recargan solo
+    # las galerías con un número mayor al último que vieron
+    _publicaciones = itertools.count(1)
+    ultima_publicacion = 0
+    publicaciones: Dict[Optional[Path], int] = {}
 
-        # Cargar encodings si existe el archivo
-        if os.path.exists(ENCODINGS_FILE):
+    def __init__(self, directorio: Optional[Path] = None) -> None:
+        """
+        Args:
+            directorio: Carpeta con los archivos de galería de un colegio
+                (TENANTS_DIR/<id_colegio>). None = galería global (GALLERY_FILE)
+        """
+        # Identifica la galería en el rastreador y el cache de frames (None = global)
+        self.directorio = directorio
+
+        # Archivos de la galería (propios de cada colegio)
+        if directorio is None:
+            self.gallery_file: Path = GALLERY_FILE
+            self.gallery_raw_file: Path = GALLERY_RAW_FILE
+            self.ann_index_file: Path = ANN_INDEX_FILE
+            self.encodings_file: Optional[Path] = ENCODINGS_FILE
+            cache_file = ENCODINGS_CACHE_FILE
+        else:
+            self.gallery_file = directorio / GALLERY_FILE.name
+            self.gallery_raw_file = directorio / GALLERY_RAW_FILE.name
+            self.ann_index_file = directorio / ANN_INDEX_FILE.name
+            self.encodings_file = None
+            cache_file = directorio / ENCODINGS_CACHE_FILE.name
+
+        # Galería, índice ANN y rosters publicados; se reemplaza completo en cada recarga
+        self._snapshot: GallerySnapshot = GallerySnapshot(Gallery.vacia())
+
+        # Rosters por dispositivo desde la BD: {device_id: [id_estudiante, ...]}
+        self.rosters_ids: Dict[str, List[int]] = {}
+
+        # Cache sha256(foto) -> encoding y lock para serializar modificaciones de la galería
+        self.encoding_cache = EncodingCache(cache_file)
+        self._lock_escritura = threading.RLock()
+
+        # Avance de la última codificación masiva (GET /api/recargar-encodings/progreso)
+        self.progreso_enrolamiento: Dict[str, Any] = {
+            'activo': False,
+            'procesadas': 0,
+            'total': 0,
+            'fotos_por_segundo': 0.0
+        }
+
+        # Cargar encodings si existe el archivo (o migrar el pickle anterior)
+        if os.path.exists(self.gallery_file) or (
+            self.encodings_file is not None and os.path.exists(self.encodings_file)
+        ):
             self.cargar_encodings()
         else:
-            logger.warning(f"Archivo de encodings no encontrado: {ENCODINGS_FILE}")
+            logger.warning(f"Archivo de encodings no encontrado: {self.gallery_file}")
 
-    def cargar_encodings(self) -> None:
+    def cargar_encodings(self, modificada: bool = False) -> None:
         """
-        Carga los encodings pre-calculados desde archivo pickle
+        Abre la galería desde GALLERY_FILE (np.memmap, sin deserializar)
+
+        Si solo existe el encodings.pkl anterior, lo migra una vez al formato
+        binario y continúa con el archivo migrado.
+
+        Args:
+            modificada: True si otro proceso reescribió el archivo desde la
+                última carga (ver publicar_galeria)
 
         Raises:
             Exception: Si hay un error al cargar el archivo de encodings
         """
         try:
-            with open(ENCODINGS_FILE, 'rb') as f:
-                data = pickle.load(f)
+            if not os.path.exists(self.gallery_file):
+                logger.info(f"Migrando {self.encodings_file} al formato binario {self.gallery_file}...")
+                gallery = migrar_desde_pickle(self.encodings_file, self.gallery_file)
+            else:
+                gallery = abrir_galeria(self.gallery_file)
+
+            self.publicar_galeria(gallery, modificada)
+
+            logger.info(f"Encodings cargados exitosamente: {len(gallery)} rostros")
+
+        except Exception as e:
+            logger.error(f"Error al cargar encodings desde {self.gallery_file}: {e}")
+
+    @property
+    def snapshot(self) -> GallerySnapshot:
+        """Snapshot publicado actualmente (tomar una referencia por frame)"""
+        return self._snapshot
+
+    @property
+    def gallery(self) -> Gallery:
+        return self._snapshot.gallery
+
+    @property
+    def ann_index(self) -> Optional[IVFIndex]:
+        return self._snapshot.ann_index
 
-            self.known_encodings = data['encodings']
-            self.known_ids = data['ids']
-            self.known_names = data['names']
-            self.encodings_loaded = True
+    @property
+    def rosters(self) -> Mapping[str, Gallery]:
+        return self._snapshot.rosters
 
-            logger.info(f"Encodings cargados exitosamente: {len(self.known_encodings)} rostros")
+    @property
+    def encodings_loaded(self) -> bool:
+        return self._snapshot.cargada
+
+    def publicar_galeria(self, gallery: Gallery, modificada: bool = True) -> None:
+        """
+        Publica una galería nueva junto con su índice ANN y sub-galerías por sala
+
+        Todo se construye aparte y se publica con una sola asignación del
+        snapshot: los frames en curso terminan con la versión anterior y los
+        lectores nunca esperan un lock.
+
+        Args:
+            gallery: Galería recién cargada o generada
+            modificada: False si solo se abre la galería ya publicada en disco
+                (las identidades vigentes siguen valiendo)
+        """
+        with self._lock_escritura:
+            actual = self._snapshot
+            self._snapshot = GallerySnapshot(
+                gallery=gallery,
+                ann_index=self.preparar_indice_ann(gallery, previo=actual.ann_index),
+                compacta=self.preparar_galeria_compacta(gallery),
+                rosters=MappingProxyType(self._construir_rosters(gallery, self.rosters_ids)),
+                version=actual.version + 1,
+                cargada=True
+            )
+            if modificada:
+                numero = next(FaceRecognitionProcessor._publicaciones)
+                FaceRecognitionProcessor.publicaciones[self.directorio] = numero
+                FaceRecognitionProcessor.ultima_publicacion = numero
+
+        if modificada:
+            # Las identidades de las pistas y del cache pueden haber cambiado
+            # (estudiante renombrado / eliminado); solo en los dispositivos de esta galería
+            rastreador.limpiar_galeria(self.directorio)
+            cache_frames.limpiar_galeria(self.directorio)
+
+    def cargar_rosters(self, rosters_db: Dict[str, List[int]]) -> None:
+        """
+        Carga el mapeo dispositivo -> estudiantes del curso y precalcula sus sub-galerías
+
+        Args:
+            rosters_db: Dict {device_id: [id_estudiante, ...]} desde la BD
+        """
+        with self._lock_escritura:
+            actual = self._snapshot
+            self.rosters_ids = rosters_db
+            self._snapshot = replace(
+                actual,
+                rosters=MappingProxyType(self._construir_rosters(actual.gallery, rosters_db)),
+                version=actual.version + 1
+            )
+
+        logger.info(
+            f"Rosters cargados: {len(self.rosters)} dispositivos con galería propia"
+        )
+
+    @staticmethod
+    def _construir_rosters(
+        gallery: Gallery,
+        rosters_ids: Dict[str, List[int]]
+    ) -> Dict[str, Gallery]:
+        """Construye la sub-galería de cada dispositivo (omite las vacías)"""
+        rosters: Dict[str, Gallery] = {}
+        for device_id, ids in rosters_ids.items():
+            subgaleria = gallery.subgaleria(ids)
+            if len(subgaleria) > 0:
+                rosters[device_id] = subgaleria
+            else:
+                logger.warning(
+                    f"Roster de {device_id} sin encodings, se usará la galería global"
+                )
+        return rosters
+
+    def preparar_indice_ann(
+        self,
+        gallery: Gallery,
+        previo: Optional[IVFIndex] = None
+    ) -> Optional[IVFIndex]:
+        """
+        Carga o construye el índice ANN para la galería según ANN_INDEX
+
+        Args:
+            gallery: Galería sobre la que se buscará
+            previo: Índice de la galería anterior; si existe se reutilizan sus
+                centroides y solo se reasignan las filas (sin re-entrenar k-means)
+
+        Returns:
+            IVFIndex listo para buscar, o None si se usa búsqueda exacta
+
+        Note:
+            El índice se persiste en ANN_INDEX_FILE junto a los encodings y
+            se reconstruye automáticamente si la galería cambió.
+        """
+        if ANN_INDEX == "none" or len(gallery) < ANN_MIN_GALLERY_SIZE:
+            return None
+
+        try:
+            indice = IVFIndex.cargar(self.ann_index_file, gallery)
+            if indice is None and previo is not None:
+                indice = previo.reasignar(gallery)
+                indice.guardar(self.ann_index_file)
+            elif indice is None:
+                logger.info(f"Construyendo índice ANN ({ANN_INDEX}) para {len(gallery)} rostros...")
+                indice = IVFIndex.construir(gallery, n_listas=ANN_NLIST)
+                indice.guardar(self.ann_index_file)
+
+            reporte = indice.medir_recall(gallery, ANN_NPROBE)
+            logger.info(
+                f"Índice ANN listo: {indice.n_listas} listas, n_probe={ANN_NPROBE}, "
+                f"recall@1={reporte['recall']:.3f} vs búsqueda exacta"
+            )
+            return indice
 
         except Exception as e:
-            logger.error(f"Error al cargar encodings desde {ENCODINGS_FILE}: {e}")
-            self.encodings_loaded = False
+            logger.error(f"Error al preparar índice ANN, se usará búsqueda exacta: {e}")
+            return None
+
+    @staticmethod
+    def preparar_galeria_compacta(gallery: Gallery) -> Optional[GaleriaCompacta]:
+        """
+        Construye la copia float16/int8 para el filtrado grueso según GALLERY_PRECISION
+
+        Returns:
+            GaleriaCompacta o None si se busca directamente en float32
+        """
+        if GALLERY_PRECISION == "float32" or len(gallery) <= RERANK_CANDIDATES:
+            return None
+
+        compacta = GaleriaCompacta(gallery, GALLERY_PRECISION)
+        logger.info(
+            f"Galería compacta ({GALLERY_PRECISION}): {compacta.nbytes / 1024 / 1024:.1f} MB, "
+            f"re-rank float32 de {RERANK_CANDIDATES} candidatos"
+        )
+        return compacta
 
     def generar_encodings_desde_fotos(self, estudiantes_db: List[Dict[str, Any]]) -> None:
         """
@@ -67,112 +420,548 @@ class FaceRecognitionProcessor:
 
         Args:
             estudiantes_db: Lista de estudiantes desde la BD con formato:
-                [{'id_estudiante': int, 'nombre_completo': str, 'path_foto_referencia': str}, ...]
+                [{'id_estudiante': int, 'nombre_completo': str, 'path_foto_referencia': str,
+                  'fotos_adicionales': [str, ...]}, ...]
 
         Note:
-            Los encodings se guardan automáticamente en ENCODINGS_FILE.
+            Los encodings se guardan automáticamente en GALLERY_FILE.
+            Cada foto de referencia (principal y adicionales) aporta un encoding;
+            con PROTOTYPES_PER_STUDENT > 0 se comprimen a prototipos por estudiante.
+            Las fotos cuyo contenido ya fue codificado se toman del cache
+            (ENCODINGS_CACHE_FILE) sin volver a ejecutar detección ni encoder.
+            Si las fotos de un estudiante ya no existen, se conservan sus encodings actuales.
             Si KEEP_PHOTOS_AFTER_ENCODING=false, las fotos se eliminan después de generar encodings.
         """
         logger.info("Generando encodings desde fotos de estudiantes...")
 
-        encodings: List[np.ndarray] = []
-        ids: List[int] = []
-        names: List[str] = []
-        fotos_procesadas: List[str] = []  # Track de fotos exitosamente procesadas
+        with self._lock_escritura:
+            encodings: List[np.ndarray] = []
+            ids: List[int] = []
+            names: List[str] = []
+            fotos_procesadas: List[str] = []  # Track de fotos exitosamente procesadas
+            hashes_vigentes: List[str] = []
 
-        for estudiante in estudiantes_db:
-            id_estudiante = estudiante['id_estudiante']
-            nombre = estudiante['nombre_completo']
-            path_foto = estudiante['path_foto_referencia']
+            # 1. Resolver desde el cache las fotos cuyo contenido ya fue codificado
+            resultados: Dict[str, Optional[np.ndarray]] = {}
+            hash_por_foto: Dict[str, str] = {}
+            por_codificar: List[str] = []
 
-            # Construir ruta completa
-            full_path = os.path.join(str(PHOTOS_DIR), path_foto)
+            for estudiante in estudiantes_db:
+                for full_path in self._fotos_estudiante(estudiante):
+                    if not os.path.exists(full_path) or full_path in hash_por_foto:
+                        continue
 
-            if not os.path.exists(full_path):
-                logger.warning(f"Foto no encontrada: {full_path}")
-                continue
+                    try:
+                        hash_foto = self.encoding_cache.hash_archivo(full_path)
+                    except Exception as e:
+                        logger.error(f"Error leyendo foto {full_path}: {e}")
+                        continue
 
-            try:
-                # Cargar imagen
-                image = face_recognition.load_image_file(full_path)
-
-                # Generar encoding
-                face_encodings = face_recognition.face_encodings(image)
-
-                if len(face_encodings) > 0:
-                    encodings.append(face_encodings[0])
-                    ids.append(id_estudiante)
-                    names.append(nombre)
-                    fotos_procesadas.append(full_path)  # Track para eliminar después
-                    logger.info(f"Encoding generado exitosamente: {nombre}")
-                else:
-                    logger.warning(
-                        f"No se detectó rostro en la imagen: {path_foto}. "
-                        f"Verifica que la foto contenga un rostro visible."
-                    )
+                    hash_por_foto[full_path] = hash_foto
+                    hashes_vigentes.append(hash_foto)
+                    cacheado = self.encoding_cache.obtener(hash_foto)
 
-            except Exception as e:
-                logger.error(f"Error procesando foto {path_foto}: {e}")
-
-        # Guardar encodings
-        if len(encodings) > 0:
-            data = {
-                'encodings': encodings,
-                'ids': ids,
-                'names': names
-            }
+                    if cacheado is not None:
+                        resultados[full_path] = cacheado if len(cacheado) > 0 else None
+                    else:
+                        por_codificar.append(full_path)
 
-            # Crear directorio si no existe
-            os.makedirs(os.path.dirname(ENCODINGS_FILE), exist_ok=True)
+            desde_cache = len(resultados)
 
-            with open(ENCODINGS_FILE, 'wb') as f:
-                pickle.dump(data, f)
+            # 2. Codificar el resto en paralelo (HOG + encoder en todos los núcleos)
+            self._codificar_pendientes(por_codificar, hash_por_foto, resultados)
 
-            self.known_encodings = encodings
-            self.known_ids = ids
-            self.known_names = names
-            self.encodings_loaded = True
+            # 3. Armar la galería por foto en el orden de la BD
+            gallery_actual = self._galeria_fotos()
 
-            logger.info(f"Encodings guardados exitosamente: {len(encodings)} rostros en {ENCODINGS_FILE}")
+            for estudiante in estudiantes_db:
+                id_estudiante = estudiante['id_estudiante']
+                nombre = estudiante['nombre_completo']
+                propios: List[np.ndarray] = []
+                faltantes: List[str] = []
 
-            # Eliminar fotos si está configurado (cumplimiento Ley 19.628)
-            if not KEEP_PHOTOS_AFTER_ENCODING:
-                logger.info("Eliminando fotos originales (KEEP_PHOTOS_AFTER_ENCODING=false)...")
-                fotos_eliminadas = 0
-                for foto_path in fotos_procesadas:
-                    try:
-                        os.remove(foto_path)
-                        fotos_eliminadas += 1
-                        logger.debug(f"Foto eliminada: {foto_path}")
-                    except Exception as e:
-                        logger.error(f"Error al eliminar foto {foto_path}: {e}")
+                for full_path in self._fotos_estudiante(estudiante):
+                    if full_path not in hash_por_foto:
+                        faltantes.append(full_path)
+                        continue
+
+                    if full_path not in resultados:
+                        continue  # Error ya registrado al codificar
+
+                    encoding = resultados[full_path]
+                    if encoding is not None:
+                        propios.append(encoding)
+                        fotos_procesadas.append(full_path)  # Track para eliminar después
+                        logger.debug(f"Encoding generado exitosamente: {nombre}")
+                    else:
+                        logger.warning(
+                            f"No se detectó rostro en la imagen: {os.path.basename(full_path)}. "
+                            f"Verifica que la foto contenga un rostro visible."
+                        )
+
+                if faltantes:
+                    # Las fotos pudieron eliminarse tras codificarlas (KEEP_PHOTOS_AFTER_ENCODING=false)
+                    filas = np.flatnonzero(gallery_actual.ids == id_estudiante)
+                    conservados = [
+                        fila for fila in gallery_actual.encodings[filas]
+                        if not any(np.allclose(fila, propio, atol=1e-6) for propio in propios)
+                    ]
+                    if len(filas) == 0:
+                        for full_path in faltantes:
+                            logger.warning(f"Foto no encontrada: {full_path}")
+                    propios.extend(conservados)
+
+                encodings.extend(propios)
+                ids.extend([id_estudiante] * len(propios))
+                names.extend([nombre] * len(propios))
+
+            self.encoding_cache.podar(hashes_vigentes)
+            self.encoding_cache.persistir()
+
+            # Guardar encodings
+            if len(encodings) > 0:
+                gallery = self._publicar_fotos(Gallery(encodings, ids, names))
 
                 logger.info(
-                    f"Fotos eliminadas: {fotos_eliminadas}/{len(fotos_procesadas)} "
-                    f"(cumplimiento principio de minimización de datos - Ley 19.628)"
+                    f"Encodings guardados exitosamente: {len(encodings)} fotos, "
+                    f"{len(gallery)} filas de galería en {self.gallery_file} "
+                    f"({desde_cache} fotos reutilizadas desde cache)"
                 )
+
+                self._eliminar_fotos(fotos_procesadas)
             else:
-                logger.info(
-                    f"Fotos conservadas (KEEP_PHOTOS_AFTER_ENCODING=true). "
-                    f"IMPORTANTE: Requiere consentimiento explícito de estudiantes."
+                logger.error(
+                    "No se generó ningún encoding. Verifica que las fotos contengan rostros visibles."
                 )
+
+    def vaciar_galeria(self) -> None:
+        """Publica y guarda una galería sin rostros (ej. el colegio se quedó sin estudiantes)"""
+        with self._lock_escritura:
+            self._publicar_fotos(Gallery.vacia())
+        logger.info(f"Galería vaciada: {self.gallery_file}")
+
+    def _codificar_pendientes(
+        self,
+        fotos: List[str],
+        hash_por_foto: Dict[str, str],
+        resultados: Dict[str, Optional[np.ndarray]]
+    ) -> None:
+        """
+        Codifica las fotos que no estaban en el cache y registra el resultado
+
+        Con ENROLLMENT_MIN_PARALLEL fotos o más usa el pool de procesos;
+        con menos, codifica en el proceso actual (el pool no compensa).
+        Las fotos con error no se agregan a `resultados`.
+        """
+        if len(fotos) == 0:
+            return
+
+        workers = workers_por_defecto(ENROLLMENT_WORKERS)
+
+        if len(fotos) >= ENROLLMENT_MIN_PARALLEL and workers > 1:
+            logger.info(f"Codificando {len(fotos)} fotos con {workers} procesos...")
+            resultados_fotos = codificar_fotos_paralelo(
+                fotos,
+                workers,
+                ENROLLMENT_MAX_PENDING or workers * 2
+            )
         else:
-            logger.error(
-                "No se generó ningún encoding. Verifica que las fotos contengan rostros visibles."
+            resultados_fotos = (codificar_foto(path) for path in fotos)
+
+        inicio = time.perf_counter()
+        procesadas = 0
+
+        for full_path, encoding, error in resultados_fotos:
+            procesadas += 1
+            transcurrido = time.perf_counter() - inicio
+            self.progreso_enrolamiento = {
+                'activo': procesadas < len(fotos),
+                'procesadas': procesadas,
+                'total': len(fotos),
+                'fotos_por_segundo': round(procesadas / transcurrido, 2) if transcurrido > 0 else 0.0
+            }
+
+            if error is not None:
+                logger.error(f"Error procesando foto {os.path.basename(full_path)}: {error}")
+                continue
+
+            resultados[full_path] = encoding
+            self.encoding_cache.agregar(hash_por_foto[full_path], encoding)
+
+        logger.info(
+            f"Fotos codificadas: {procesadas} "
+            f"({self.progreso_enrolamiento['fotos_por_segundo']} fotos/s)"
+        )
+
+    def agregar_estudiante(self, estudiante: Dict[str, Any]) -> bool:
+        """
+        Codifica solo las fotos de un estudiante y las incorpora a la galería
+
+        Args:
+            estudiante: Dict con 'id_estudiante', 'nombre_completo', 'path_foto_referencia'
+                y opcionalmente 'fotos_adicionales'
+
+        Returns:
+            True si se generó al menos un encoding, False si ninguna foto tiene rostro o falló
+
+        Note:
+            Reemplaza las filas previas del estudiante, por lo que también
+            sirve para actualizar su foto. El resto de la galería no se re-codifica.
+        """
+        encodings: List[np.ndarray] = []
+        fotos_procesadas: List[str] = []
+
+        for full_path in self._fotos_estudiante(estudiante):
+            try:
+                _, encoding, _ = self._codificar_foto(full_path)
+            except Exception as e:
+                logger.error(f"Error procesando foto {os.path.basename(full_path)}: {e}")
+                continue
+
+            if encoding is None:
+                logger.warning(
+                    f"No se detectó rostro en la imagen: {os.path.basename(full_path)}. "
+                    f"Verifica que la foto contenga un rostro visible."
+                )
+                continue
+
+            encodings.append(encoding)
+            fotos_procesadas.append(full_path)
+
+        self.encoding_cache.persistir()
+
+        if len(encodings) == 0:
+            return False
+
+        with self._lock_escritura:
+            gallery_fotos = self._galeria_fotos().con_estudiante(
+                estudiante['id_estudiante'], encodings, estudiante['nombre_completo']
+            )
+            gallery = self._publicar_fotos(gallery_fotos, estudiante['id_estudiante'])
+
+        logger.info(
+            f"Encodings agregados a la galería: {estudiante['nombre_completo']} "
+            f"({len(encodings)} fotos, {len(gallery)} rostros)"
+        )
+        self._eliminar_fotos(fotos_procesadas)
+        return True
+
+    def verificar_foto(self, full_path: str) -> bool:
+        """
+        Codifica una foto sin tocar la galería y dice si tiene rostro
+
+        El encoding queda en el cache por hash de contenido, así que al
+        incorporar después la misma foto (aunque se haya renombrado) no se
+        vuelve a codificar.
+
+        Args:
+            full_path: Ruta completa de la foto
+
+        Returns:
+            True si la foto se pudo leer y tiene un rostro
+        """
+        try:
+            _, encoding, _ = self._codificar_foto(full_path)
+            self.encoding_cache.persistir()
+        except Exception as e:
+            logger.error(f"Error procesando foto {os.path.basename(full_path)}: {e}")
+            return False
+
+        if encoding is None:
+            logger.warning(
+                f"No se detectó rostro en la imagen: {os.path.basename(full_path)}. "
+                f"Verifica que la foto contenga un rostro visible."
             )
+            return False
+        return True
 
-    def procesar_frame(self, image_array: np.ndarray) -> Dict[str, Any]:
+    def agregar_foto_estudiante(self, estudiante: Dict[str, Any], path_foto: str) -> bool:
+        """
+        Agrega una foto de referencia adicional a un estudiante ya enrolado
+
+        Args:
+            estudiante: Dict con 'id_estudiante' y 'nombre_completo'
+            path_foto: Nombre del archivo de la foto nueva en PHOTOS_DIR
+
+        Returns:
+            True si la foto tiene rostro y se incorporó a la galería
+
+        Note:
+            Conserva los encodings anteriores del estudiante; con
+            PROTOTYPES_PER_STUDENT > 0 solo se recalculan sus prototipos.
+        """
+        full_path = os.path.join(str(PHOTOS_DIR), path_foto)
+
+        try:
+            _, encoding, _ = self._codificar_foto(full_path)
+            self.encoding_cache.persistir()
+        except Exception as e:
+            logger.error(f"Error procesando foto {path_foto}: {e}")
+            return False
+
+        if encoding is None:
+            logger.warning(
+                f"No se detectó rostro en la imagen: {path_foto}. "
+                f"Verifica que la foto contenga un rostro visible."
+            )
+            return False
+
+        id_estudiante = estudiante['id_estudiante']
+
+        with self._lock_escritura:
+            gallery_fotos = self._galeria_fotos()
+            previos = gallery_fotos.encodings[gallery_fotos.ids == id_estudiante]
+            gallery_fotos = gallery_fotos.con_estudiante(
+                id_estudiante,
+                np.concatenate([previos, np.asarray([encoding], dtype=np.float32)]),
+                estudiante['nombre_completo']
+            )
+            gallery = self._publicar_fotos(gallery_fotos, id_estudiante)
+
+        logger.info(
+            f"Foto agregada a {estudiante['nombre_completo']}: {len(previos) + 1} fotos de referencia "
+            f"({len(gallery)} rostros)"
+        )
+        self._eliminar_fotos([full_path])
+        return True
+
+    def renombrar_estudiante(self, id_estudiante: int, nombre: str) -> None:
+        """
+        Actualiza el nombre de un estudiante en la galería sin re-codificar
+
+        Args:
+            id_estudiante: ID del estudiante
+            nombre: Nuevo nombre completo
+        """
+        with self._lock_escritura:
+            gallery_fotos = self._galeria_fotos().renombrar(id_estudiante, nombre)
+            self._publicar_fotos(gallery_fotos, id_estudiante)
+
+    def eliminar_estudiante(self, id_estudiante: int) -> bool:
+        """
+        Quita de la galería todos los encodings de un estudiante
+
+        Args:
+            id_estudiante: ID del estudiante a eliminar
+
+        Returns:
+            True si el estudiante tenía encodings en la galería
+        """
+        with self._lock_escritura:
+            gallery_fotos = self._galeria_fotos()
+            if id_estudiante not in gallery_fotos.ids and id_estudiante not in self.gallery.ids:
+                return False
+
+            gallery = self._publicar_fotos(gallery_fotos.sin_estudiante(id_estudiante), id_estudiante)
+
+        logger.info(f"Estudiante ID {id_estudiante} eliminado de la galería ({len(gallery)} rostros)")
+        return True
+
+    def auditar_duplicados(self, umbral: float = DUPLICATE_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        Reporta pares de estudiantes distintos cuyos rostros están a menos de `umbral`
+
+        Args:
+            umbral: Distancia máxima (por defecto DUPLICATE_THRESHOLD)
+
+        Returns:
+            Lista de pares ordenada de menor a mayor distancia:
+            [{'id_a': int, 'nombre_a': str, 'id_b': int, 'nombre_b': str, 'distancia': float}, ...]
+        """
+        gallery = self.gallery
+        pares = auditar_galeria(gallery, umbral)
+        nombres = dict(zip(gallery.ids.tolist(), gallery.names))
+
+        return [
+            {
+                'id_a': id_a,
+                'nombre_a': nombres[id_a],
+                'id_b': id_b,
+                'nombre_b': nombres[id_b],
+                'distancia': round(distancia, 4)
+            }
+            for (id_a, id_b), distancia in sorted(pares.items(), key=lambda par: par[1])
+        ]
+
+    def posible_duplicado(
+        self,
+        id_estudiante: int,
+        umbral: float = DUPLICATE_THRESHOLD
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Revisa si un estudiante recién enrolado se parece a otro ya existente
+
+        Args:
+            id_estudiante: ID del estudiante enrolado o actualizado
+            umbral: Distancia máxima (por defecto DUPLICATE_THRESHOLD)
+
+        Returns:
+            Dict {'id_estudiante', 'nombre', 'distancia'} del estudiante más
+            parecido, o None si ninguno está bajo el umbral
+        """
+        gallery = self.gallery
+        filas = np.flatnonzero(gallery.ids == id_estudiante)
+        if len(filas) == 0:
+            return None
+
+        similares = buscar_similares(
+            gallery, gallery.encodings[filas], umbral, id_excluir=id_estudiante
+        )
+        if not similares:
+            return None
+
+        id_similar, distancia = similares[0]
+        nombre = gallery.names[int(np.flatnonzero(gallery.ids == id_similar)[0])]
+        logger.warning(
+            f"Posible estudiante duplicado: ID {id_estudiante} se parece a "
+            f"{nombre} (ID {id_similar}, distancia {distancia:.3f})"
+        )
+        return {'id_estudiante': id_similar, 'nombre': nombre, 'distancia': round(distancia, 4)}
+
+    @staticmethod
+    def _fotos_estudiante(estudiante: Dict[str, Any]) -> List[str]:
+        """Rutas completas de la foto principal y las fotos adicionales de un estudiante"""
+        fotos = [estudiante['path_foto_referencia']] + list(estudiante.get('fotos_adicionales') or [])
+        return [os.path.join(str(PHOTOS_DIR), path_foto) for path_foto in fotos]
+
+    def _galeria_fotos(self) -> Gallery:
+        """
+        Galería con un encoding por foto de referencia (sin comprimir)
+
+        Returns:
+            GALLERY_RAW_FILE si existe; si no, la galería publicada (que sin
+            prototipos ya tiene una fila por foto)
+        """
+        if os.path.exists(self.gallery_raw_file):
+            try:
+                return abrir_galeria(self.gallery_raw_file)
+            except Exception as e:
+                logger.error(f"Error al abrir {self.gallery_raw_file}, se usará la galería publicada: {e}")
+        return self.gallery
+
+    def _publicar_fotos(self, gallery_fotos: Gallery, id_estudiante: Optional[int] = None) -> Gallery:
+        """
+        Guarda la galería por foto, la comprime a prototipos y publica el resultado
+
+        Args:
+            gallery_fotos: Galería con un encoding por foto de referencia
+            id_estudiante: Si se indica, solo se recalculan los prototipos de ese
+                estudiante sobre la galería publicada (el resto no cambia)
+
+        Returns:
+            La galería publicada (reabierta con np.memmap)
+        """
+        if PROTOTYPES_PER_STUDENT > 0:
+            guardar_galeria(gallery_fotos, self.gallery_raw_file)
+
+            if id_estudiante is None:
+                gallery = comprimir_galeria(gallery_fotos, PROTOTYPES_PER_STUDENT)
+            else:
+                filas = np.flatnonzero(gallery_fotos.ids == id_estudiante)
+                if len(filas) > 0:
+                    gallery = self.gallery.con_estudiante(
+                        id_estudiante,
+                        prototipos_estudiante(gallery_fotos.encodings[filas], PROTOTYPES_PER_STUDENT),
+                        gallery_fotos.names[filas[0]]
+                    )
+                else:
+                    gallery = self.gallery.sin_estudiante(id_estudiante)
+        else:
+            # Sin prototipos la galería publicada es la galería por foto
+            gallery = gallery_fotos
+            if os.path.exists(self.gallery_raw_file):
+                os.remove(self.gallery_raw_file)
+
+        gallery = self._guardar_galeria(gallery)
+        self.publicar_galeria(gallery)
+        return gallery
+
+    def _codificar_foto(self, full_path: str) -> Tuple[str, Optional[np.ndarray], bool]:
+        """
+        Genera el encoding de una foto reutilizando el cache por hash de contenido
+
+        Returns:
+            Tupla (hash, encoding o None si no hay rostro, si vino del cache)
+
+        Raises:
+            Exception: Si la foto no se puede leer o codificar
+        """
+        hash_foto = self.encoding_cache.hash_archivo(full_path)
+        cacheado = self.encoding_cache.obtener(hash_foto)
+        if cacheado is not None:
+            return hash_foto, (cacheado if len(cacheado) > 0 else None), True
+
+        _, encoding, error = codificar_foto(full_path)
+        if error is not None:
+            raise RuntimeError(error)
+
+        self.encoding_cache.agregar(hash_foto, encoding)
+        return hash_foto, encoding, False
+
+    def _guardar_galeria(self, gallery: Gallery) -> Gallery:
+        """
+        Persiste la galería en su archivo .fgal (escritura atómica)
+
+        Returns:
+            La galería reabierta con np.memmap desde el archivo recién escrito
+        """
+        guardar_galeria(gallery, self.gallery_file)
+        return abrir_galeria(self.gallery_file)
+
+    def _eliminar_fotos(self, fotos_procesadas: List[str]) -> None:
+        """Elimina las fotos ya codificadas si está configurado (cumplimiento Ley 19.628)"""
+        if not KEEP_PHOTOS_AFTER_ENCODING:
+            logger.info("Eliminando fotos originales (KEEP_PHOTOS_AFTER_ENCODING=false)...")
+            fotos_eliminadas = 0
+            for foto_path in fotos_procesadas:
+                try:
+                    os.remove(foto_path)
+                    fotos_eliminadas += 1
+                    logger.debug(f"Foto eliminada: {foto_path}")
+                except Exception as e:
+                    logger.error(f"Error al eliminar foto {foto_path}: {e}")
+
+            logger.info(
+                f"Fotos eliminadas: {fotos_eliminadas}/{len(fotos_procesadas)} "
+                f"(cumplimiento principio de minimización de datos - Ley 19.628)"
+            )
+        else:
+            logger.info(
+                f"Fotos conservadas (KEEP_PHOTOS_AFTER_ENCODING=true). "
+                f"IMPORTANTE: Requiere consentimiento explícito de estudiantes."
+            )
+
+    def procesar_frame(
+        self,
+        image_array: Imagen,
+        device_id: Optional[str] = None,
+        roi: Optional[Roi] = None,
+        perfil: Optional[PerfilReconocimiento] = None
+    ) -> Dict[str, Any]:
         """
         Procesa un frame y busca rostros conocidos
 
+        Equivale a detectar() + codificar_rostros() + identificar_lote() con
+        un lote de un solo frame (el pipeline agrupa frames de varios
+        dispositivos, ver batching.py).
+
         Args:
-            image_array: Frame en formato numpy array (RGB)
+            image_array: Frame en formato numpy array (RGB) o FrameDraft
+            device_id: Dispositivo que envió el frame. Si tiene un curso
+                asignado se compara solo contra el roster de esa sala.
+            roi: Región de interés del dispositivo; solo se detecta dentro de
+                ella, pero 'location' queda en coordenadas del frame completo
+            perfil: Detector, upsampling, ancho y tolerancia de la cámara
+                (por defecto, DEFAULT_RECOGNITION_PROFILE)
 
         Returns:
             Dict con resultado del procesamiento:
             {
                 'faces_found': int,
-                'matches': [{'id': int, 'name': str, 'location': tuple, 'confidence': float}],
+                'matches': [{'id': int, 'name': str, 'location': tuple, 'confidence': float,
+                             'rastreado': bool (identidad tomada de la pista, sin encoding)}],
+                'low_quality': int (rostros descartados por el filtro de calidad),
+                'sin_movimiento': bool (opcional, frame omitido sin detectar),
                 'error': str (opcional, solo si hay error)
             }
 
@@ -180,77 +969,297 @@ class FaceRecognitionProcessor:
             >>> processor.procesar_frame(image_array)
             {'faces_found': 1, 'matches': [{'id': 1, 'name': 'Juan Pérez', ...}]}
         """
-        if not self.encodings_loaded:
+        frame = self.detectar(image_array, device_id, roi, perfil)
+        if frame.resultado is not None:
+            return frame.resultado
+
+        try:
+            with metricas.medir(f"encoding_{frame.perfil.nombre}"):
+                encodings = codificar_rostros([frame.imagen], [frame.por_codificar])
+        except Exception as e:
+            logger.error(f"Error al procesar frame de reconocimiento facial: {e}")
             return {
+                'faces_found': 0,
+                'matches': [],
+                'error': str(e)
+            }
+
+        return self.identificar_lote([frame], encodings)[0]
+
+    def detectar(
+        self,
+        image_array: Imagen,
+        device_id: Optional[str] = None,
+        roi: Optional[Roi] = None,
+        perfil: Optional[PerfilReconocimiento] = None
+    ) -> FrameDetectado:
+        """
+        Primera mitad de procesar_frame: todo lo que depende solo del frame
+
+        Aplica el descarte por movimiento, la detección, el seguimiento y el
+        filtro de calidad, y deja en `pendientes` los rostros que deben pasar
+        por el encoder. Con un FrameDraft se detecta sobre la copia draft y
+        la resolución completa se decodifica solo si hay rostros pendientes.
+
+        Returns:
+            FrameDetectado. Si ya no hace falta el encoder (sin rostros, todos
+            rastreados o rechazados, error) trae el resultado final en
+            'resultado' o bien ningún rostro pendiente.
+        """
+        # Una sola lectura del snapshot: una recarga concurrente no afecta a este frame
+        snapshot = self._snapshot
+        draft = image_array if isinstance(image_array, FrameDraft) else None
+        imagen = draft.reducida if draft is not None else image_array
+        frame = FrameDetectado(imagen, device_id, snapshot, perfil or PERFIL_POR_DEFECTO)
+
+        if not snapshot.cargada:
+            frame.resultado = {
                 'faces_found': 0,
                 'matches': [],
                 'error': 'Encodings no cargados. Ejecuta primero /api/recargar-encodings'
             }
+            return frame
 
         try:
-            # Detectar ubicaciones de rostros
-            face_locations = face_recognition.face_locations(
-                image_array,
-                model=FACE_DETECTION_MODEL
-            )
+            # Escena igual al último frame sin rostros: no vale la pena detectar
+            gating = MOTION_GATING and device_id is not None
+            if gating and detector_movimiento.omitir(device_id, imagen, roi):
+                metricas.incrementar("frames_sin_movimiento")
+                frame.resultado = {
+                    'faces_found': 0,
+                    'matches': [],
+                    'sin_movimiento': True
+                }
+                return frame
+
+            # Detectar rostros en una copia reducida del frame o de su ROI
+            # (cajas en coordenadas del frame original)
+            with metricas.medir(f"deteccion_{frame.perfil.nombre}"):
+                face_locations = detectar_rostros(
+                    imagen,
+                    frame.perfil.ancho_deteccion,
+                    frame.perfil.modelo,
+                    roi,
+                    frame.perfil.upsample,
+                    draft.forma if draft is not None else None
+                )
+
+            if gating:
+                detector_movimiento.registrar_resultado(device_id, len(face_locations))
 
             if len(face_locations) == 0:
-                return {
+                frame.resultado = {
                     'faces_found': 0,
                     'matches': []
                 }
+                return frame
 
-            # Generar encodings para los rostros detectados
-            face_encodings = face_recognition.face_encodings(
-                image_array,
-                face_locations
+            # Rostros que siguen una pista ya identificada no se vuelven a codificar
+            pistas = rastreador.asociar(device_id, face_locations, self.directorio) if TRACKING_ENABLED and device_id else None
+            identidades: List[Optional[Identidad]] = (
+                [rastreador.vigente(pista) for pista in pistas] if pistas else [None] * len(face_locations)
             )
+            pendientes = [i for i, identidad in enumerate(identidades) if identidad is None]
 
-            matches_result: List[Dict[str, Any]] = []
+            # Filtro de calidad y encoder trabajan en resolución completa
+            if pendientes and draft is not None:
+                frame.imagen = draft.completa()
 
-            # Comparar cada rostro detectado con los conocidos
-            for face_encoding, face_location in zip(face_encodings, face_locations):
-                # Comparar con todos los rostros conocidos
-                matches = face_recognition.compare_faces(
-                    self.known_encodings,
-                    face_encoding,
-                    tolerance=FACE_TOLERANCE
-                )
-
-                # Calcular distancias para encontrar la mejor coincidencia
-                face_distances = face_recognition.face_distance(
-                    self.known_encodings,
-                    face_encoding
-                )
+            # Rostros pequeños, borrosos o girados no pasan por el encoder
+            rechazados: List[int] = []
+            if pendientes and QUALITY_GATE:
+                with metricas.medir("calidad"):
+                    motivos = evaluar_calidad(frame.imagen, [face_locations[i] for i in pendientes])
+                for motivo in motivos:
+                    if motivo is not None:
+                        metricas.incrementar(f"rostros_baja_calidad_{motivo}")
+                rechazados = [i for i, motivo in zip(pendientes, motivos) if motivo is not None]
+                pendientes = [i for i, motivo in zip(pendientes, motivos) if motivo is None]
 
-                if True in matches:
-                    # Encontrar la mejor coincidencia (menor distancia)
-                    best_match_index = np.argmin(face_distances)
-
-                    if matches[best_match_index]:
-                        id_estudiante = self.known_ids[best_match_index]
-                        nombre = self.known_names[best_match_index]
-                        confidence = 1 - face_distances[best_match_index]
-
-                        matches_result.append({
-                            'id': id_estudiante,
-                            'name': nombre,
-                            'location': face_location,
-                            'confidence': float(confidence)
-                        })
-
-            return {
-                'faces_found': len(face_locations),
-                'matches': matches_result
-            }
+            frame.ubicaciones = face_locations
+            frame.pistas = pistas
+            frame.identidades = identidades
+            frame.pendientes = pendientes
+            frame.rechazados = rechazados
+            return frame
 
         except Exception as e:
             logger.error(f"Error al procesar frame de reconocimiento facial: {e}")
-            return {
+            frame.resultado = {
                 'faces_found': 0,
                 'matches': [],
                 'error': str(e)
             }
+            return frame
+
+    def identificar_lote(
+        self,
+        frames: Sequence[FrameDetectado],
+        encodings: Sequence[List[np.ndarray]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Segunda mitad de procesar_frame para varios frames de esta galería
+
+        Los encodings de frames que comparten galería (mismo snapshot, mismo
+        roster o ninguno, misma tolerancia) se comparan en una sola llamada a
+        identificar(): una multiplicación de matrices en vez de una por frame.
+
+        Args:
+            frames: Frames devueltos por detectar()
+            encodings: Lista paralela a `frames` con los encodings de sus
+                rostros pendientes (ver codificar_rostros)
+
+        Returns:
+            Lista paralela a `frames` con el resultado de cada uno (mismo
+            formato que procesar_frame)
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [frame.resultado for frame in frames]
+
+        grupos: Dict[Tuple[int, Optional[str], float], List[int]] = {}
+        for k, frame in enumerate(frames):
+            if frame.resultado is None and frame.pendientes:
+                roster = frame.device_id if frame.device_id in frame.snapshot.rosters else None
+                grupos.setdefault((id(frame.snapshot), roster, frame.perfil.tolerancia), []).append(k)
+
+        nuevas: Dict[int, List[Optional[Identidad]]] = {}
+        for indices in grupos.values():
+            primero = frames[indices[0]]
+            consultas = [encoding for k in indices for encoding in encodings[k]]
+
+            try:
+                identidades = self.identificar(
+                    consultas, primero.device_id, primero.snapshot, primero.perfil.tolerancia
+                )
+            except Exception as e:
+                logger.error(f"Error al procesar frame de reconocimiento facial: {e}")
+                for k in indices:
+                    resultados[k] = {
+                        'faces_found': 0,
+                        'matches': [],
+                        'error': str(e)
+                    }
+                continue
+
+            inicio = 0
+            for k in indices:
+                fin = inicio + len(encodings[k])
+                nuevas[k] = identidades[inicio:fin]
+                inicio = fin
+
+        for k, frame in enumerate(frames):
+            if resultados[k] is None:
+                resultados[k] = self._completar(frame, nuevas.get(k, []))
+
+        return resultados
+
+    @staticmethod
+    def _completar(frame: FrameDetectado, nuevas: List[Optional[Identidad]]) -> Dict[str, Any]:
+        """Combina identidades rastreadas y recién comparadas en el resultado del frame"""
+        identidades = list(frame.identidades)
+
+        for i, identidad in zip(frame.pendientes, nuevas):
+            identidades[i] = identidad
+            if frame.pistas:
+                rastreador.verificar(frame.pistas[i], identidad, frame.perfil.tolerancia)
+
+        metricas.incrementar("rostros_codificados", len(frame.pendientes))
+        metricas.incrementar(
+            "rostros_rastreados", len(frame.ubicaciones) - len(frame.pendientes) - len(frame.rechazados)
+        )
+
+        matches_result: List[Dict[str, Any]] = []
+        codificados = set(frame.pendientes) | set(frame.rechazados)
+
+        for i, (face_location, identidad) in enumerate(zip(frame.ubicaciones, identidades)):
+            if identidad is not None:
+                id_estudiante, nombre, distancia = identidad
+                matches_result.append({
+                    'id': id_estudiante,
+                    'name': nombre,
+                    'location': face_location,
+                    'confidence': float(1 - distancia),
+                    'rastreado': i not in codificados
+                })
+
+        return {
+            'faces_found': len(frame.ubicaciones),
+            'matches': matches_result,
+            'low_quality': len(frame.rechazados)
+        }
+
+    def identificar(
+        self,
+        face_encodings: List[np.ndarray],
+        device_id: Optional[str] = None,
+        snapshot: Optional[GallerySnapshot] = None,
+        tolerancia: float = FACE_TOLERANCE
+    ) -> List[Optional[Tuple[int, str, float]]]:
+        """
+        Resuelve la identidad de cada encoding contra la galería del dispositivo
+
+        Args:
+            face_encodings: Encodings de los rostros detectados
+            device_id: Dispositivo de origen (selecciona el roster de su sala)
+            snapshot: Versión de la galería a usar (por defecto, la publicada)
+            tolerancia: Distancia máxima para aceptar una coincidencia (la del perfil)
+
+        Returns:
+            Lista paralela a face_encodings con (id_estudiante, nombre, distancia)
+            o None si el rostro no coincide dentro de la tolerancia
+        """
+        if snapshot is None:
+            snapshot = self._snapshot
+
+        roster = snapshot.rosters.get(device_id) if device_id else None
+
+        if roster is not None:
+            # Sala con curso asignado: solo se compara contra su roster
+            identidades = self._resolver(roster, *roster.buscar(face_encodings), tolerancia)
+
+            if ROSTER_FALLBACK_GLOBAL:
+                pendientes = [i for i, identidad in enumerate(identidades) if identidad is None]
+                if pendientes:
+                    consultas = [face_encodings[i] for i in pendientes]
+                    globales = self._resolver(
+                        snapshot.gallery, *self._buscar_global(snapshot, consultas, tolerancia), tolerancia
+                    )
+                    for i, identidad in zip(pendientes, globales):
+                        identidades[i] = identidad
+
+            return identidades
+
+        return self._resolver(
+            snapshot.gallery, *self._buscar_global(snapshot, face_encodings, tolerancia), tolerancia
+        )
+
+    @staticmethod
+    def _buscar_global(
+        snapshot: GallerySnapshot,
+        face_encodings: List[np.ndarray],
+        tolerancia: float = FACE_TOLERANCE
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Busca en la galería global, usando el índice ANN o la copia compacta si están activos"""
+        if snapshot.ann_index is not None:
+            return snapshot.ann_index.buscar(
+                snapshot.gallery, face_encodings, ANN_NPROBE, tolerancia=tolerancia
+            )
+        if snapshot.compacta is not None:
+            return snapshot.compacta.buscar(snapshot.gallery, face_encodings, RERANK_CANDIDATES)
+        return snapshot.gallery.buscar(face_encodings)
+
+    @staticmethod
+    def _resolver(
+        gallery: Gallery,
+        indices: np.ndarray,
+        distancias: np.ndarray,
+        tolerancia: float = FACE_TOLERANCE
+    ) -> List[Optional[Tuple[int, str, float]]]:
+        """Traduce filas de la galería a (id, nombre, distancia) aplicando la tolerancia"""
+        return [
+            (int(gallery.ids[indice]), gallery.names[indice], float(distancia))
+            if distancia <= tolerancia else None
+            for indice, distancia in zip(indices, distancias)
+        ]
 
     def decode_image_from_base64(self, base64_string: str) -> Optional[np.ndarray]:
         """
@@ -268,23 +1277,73 @@ class FaceRecognitionProcessor:
             <class 'numpy.ndarray'>
         """
         try:
-            # Decodificar base64
             img_data = base64.b64decode(base64_string)
+        except Exception as e:
+            logger.error(f"Error al decodificar imagen desde base64: {e}")
+            return None
+
+        return self.decode_image_bytes(img_data)
 
-            # Convertir a PIL Image
-            img = Image.open(io.BytesIO(img_data))
+    def decode_image_bytes(self, img_data: bytes) -> Optional[np.ndarray]:
+        """
+        Decodifica los bytes de una imagen (JPEG/PNG) a numpy array RGB en resolución completa
 
-            # Convertir a RGB si es necesario
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+        Si el decoder ya entrega RGB no se hace la conversión posterior.
+        El tiempo de cada decodificación se registra en la métrica "decode".
 
-            # Convertir a numpy array
-            img_array = np.array(img)
+        Args:
+            img_data: Bytes del archivo de imagen
 
-            return img_array
+        Returns:
+            numpy array (alto, ancho, 3) uint8 o None si falla la decodificación
+        """
+        try:
+            with metricas.medir("decode"):
+                return _a_rgb(Image.open(io.BytesIO(img_data)))
 
         except Exception as e:
-            logger.error(f"Error al decodificar imagen desde base64: {e}")
+            logger.error(f"Error al decodificar imagen: {e}")
+            return None
+
+    def decode_frame(self, img_data: bytes, perfil: Optional[PerfilReconocimiento] = None) -> Optional[Imagen]:
+        """
+        Decodifica un frame para detectar (etapa decodificar del pipeline)
+
+        Con JPEG_DRAFT_WIDTH > 0 los JPEG más anchos se decodifican solo con
+        escalado DCT (modo draft de PIL: la IDCT se calcula directamente a
+        1/2, 1/4 u 1/8 del tamaño) y se devuelven como FrameDraft; detectar()
+        usa esa copia y decodifica la resolución completa solo si hay rostros
+        que codificar. Las cajas siempre quedan en coordenadas del frame completo.
+
+        La copia draft nunca es más angosta que el ancho de detección del
+        perfil, y un perfil que detecta sobre el frame completo (ancho 0) no
+        usa draft.
+
+        Args:
+            img_data: Bytes del archivo de imagen
+            perfil: Perfil de reconocimiento del dispositivo (None = por defecto)
+
+        Returns:
+            FrameDraft, numpy array RGB completo (PNG, JPEG angosto o sin
+            draft) o None si falla la decodificación
+        """
+        ancho_deteccion = (perfil or PERFIL_POR_DEFECTO).ancho_deteccion
+        if JPEG_DRAFT_WIDTH <= 0 or ancho_deteccion == 0:
+            return self.decode_image_bytes(img_data)
+        ancho = max(JPEG_DRAFT_WIDTH, ancho_deteccion)
+
+        try:
+            with metricas.medir("decode"):
+                img = Image.open(io.BytesIO(img_data))
+                if img.format != 'JPEG' or img.width <= ancho:
+                    return _a_rgb(img)
+
+                forma = (img.height, img.width, 3)
+                img.draft('RGB', (ancho, max(1, img.height * ancho // img.width)))
+                return FrameDraft(img_data, _a_rgb(img), forma)
+
+        except Exception as e:
+            logger.error(f"Error al decodificar imagen: {e}")
             return None
 
 
@@ -0,0 +1,273 @@
+"""
+frame_cache.py - Cache de resultados para frames casi idénticos
+La huella perceptual (dHash) se calcula decodificando el JPEG en modo draft a
+1/8 de su tamaño y en escala de grises, antes de la decodificación completa:
+si el mismo dispositivo envió hace menos de FRAME_CACHE_TTL_SECONDS un frame
+con una huella a distancia de Hamming <= FRAME_CACHE_MAX_DISTANCE, se reutiliza
+su resultado sin decodificar, detectar ni codificar. Como el dHash casi no
+cambia cuando aparece algo pequeño (un rostro en un costado del frame), cada
+acierto se confirma además con la miniatura gris, igual que en motion.py
+"""
+
+import io
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.detection import Roi
+from app.core.motion import hay_cambio
+from app.config import (
+    FRAME_CACHE_TTL_SECONDS,
+    FRAME_CACHE_MAX_MB,
+    FRAME_CACHE_MAX_DISTANCE,
+    MOTION_THUMB_WIDTH,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_CHANGED_FRACTION
+)
+
+logger = logging.getLogger(__name__)
+
+# Memoria aproximada de una entrada además del resultado serializado
+_OVERHEAD_ENTRADA = 256
+
+
+@dataclass(frozen=True)
+class Huella:
+    """dHash (clave de búsqueda) y miniatura gris (confirmación) de un frame"""
+
+    bits: int
+    miniatura: np.ndarray
+
+
+def huella_perceptual(
+    img_data: bytes,
+    lado: int,
+    roi: Optional[Roi] = None,
+    ancho_miniatura: int = MOTION_THUMB_WIDTH
+) -> Optional[Huella]:
+    """
+    Calcula la huella de un frame sin decodificarlo en resolución completa
+
+    El dHash compara cada píxel con su vecino derecho en una miniatura gris
+    de (lado + 1) x lado: el resultado es un entero de lado² bits.
+
+    Args:
+        img_data: Bytes del JPEG (otros formatos se decodifican completos)
+        lado: Lado del dHash (16 = 256 bits)
+        roi: Región de interés del dispositivo (la huella solo mira esa zona)
+        ancho_miniatura: Ancho de la miniatura usada para confirmar aciertos
+
+    Returns:
+        Huella, o None si la imagen no se puede leer
+    """
+    try:
+        img = Image.open(io.BytesIO(img_data))
+        img.draft("L", (img.width // 8, img.height // 8))
+        img = img.convert("L")
+
+        if roi is not None:
+            x, y, ancho, alto = roi
+            img = img.crop((
+                int(x * img.width),
+                int(y * img.height),
+                max(int(x * img.width) + 1, round((x + ancho) * img.width)),
+                max(int(y * img.height) + 1, round((y + alto) * img.height))
+            ))
+
+        pixeles = np.asarray(img.resize((lado + 1, lado), Image.BOX), dtype=np.int16)
+
+        ancho = min(ancho_miniatura, img.width)
+        alto = max(1, round(img.height * ancho / img.width))
+        miniatura = np.asarray(img.resize((ancho, alto), Image.BOX), dtype=np.int16)
+    except Exception as e:
+        logger.warning(f"No se pudo calcular la huella del frame: {e}")
+        return None
+
+    bits = (pixeles[:, 1:] > pixeles[:, :-1]).ravel()
+    return Huella(int.from_bytes(np.packbits(bits).tobytes(), "big"), miniatura)
+
+
+@dataclass
+class EntradaCache:
+    """Resultado guardado para una huella"""
+
+    resultado: Dict[str, Any]
+    miniatura: np.ndarray
+    creada: float
+    nbytes: int
+
+
+class CacheFrames:
+    """Resultados por (device_id, huella) con TTL y límite de memoria (seguro entre threads)"""
+
+    def __init__(
+        self,
+        ttl_s: float,
+        presupuesto_bytes: int,
+        distancia_max: int,
+        umbral_pixel: int,
+        fraccion_minima: float
+    ) -> None:
+        """
+        Args:
+            ttl_s: Segundos que vive cada resultado
+            presupuesto_bytes: Memoria máxima aproximada de todas las entradas
+            distancia_max: Bits distintos tolerados entre huellas (ruido del sensor)
+            umbral_pixel: Diferencia de gris para que un píxel de la miniatura cuente como cambio
+            fraccion_minima: Fracción de píxeles cambiados que invalida el acierto
+        """
+        self.ttl_s = ttl_s
+        self.presupuesto_bytes = presupuesto_bytes
+        self.distancia_max = distancia_max
+        self.umbral_pixel = umbral_pixel
+        self.fraccion_minima = fraccion_minima
+
+        # Orden de inserción = orden de vencimiento: se desaloja siempre por el frente
+        self._entradas: "OrderedDict[Tuple[str, int], EntradaCache]" = OrderedDict()
+        self._por_dispositivo: Dict[str, Set[int]] = {}
+        # Galería con la que se obtuvieron los resultados de cada dispositivo
+        self._galerias: Dict[str, Hashable] = {}
+        self._memoria = 0
+        self._lock = threading.Lock()
+
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, device_id: str, huella: Huella, galeria: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Busca un resultado vigente del dispositivo con una huella parecida
+
+        Args:
+            device_id: Dispositivo que envió el frame
+            huella: Huella del frame
+            galeria: Galería que identifica al dispositivo (directorio, None = global);
+                los resultados obtenidos con otra galería no se reutilizan
+
+        Returns:
+            Copia del resultado guardado (con 'en_cache': True) o None
+        """
+        with self._lock:
+            self._vencer(time.monotonic())
+            if self._galerias.get(device_id, galeria) != galeria:
+                self._quitar_dispositivo(device_id)
+
+            for candidata in self._por_dispositivo.get(device_id, ()):
+                if bin(candidata ^ huella.bits).count("1") > self.distancia_max:
+                    continue
+
+                entrada = self._entradas[(device_id, candidata)]
+                if entrada.miniatura.shape != huella.miniatura.shape or hay_cambio(
+                    entrada.miniatura, huella.miniatura, self.umbral_pixel, self.fraccion_minima
+                ):
+                    continue
+
+                self.aciertos += 1
+                return {**entrada.resultado, 'en_cache': True}
+
+            self.fallos += 1
+            return None
+
+    def guardar(
+        self,
+        device_id: str,
+        huella: Huella,
+        resultado: Dict[str, Any],
+        galeria: Hashable = None
+    ) -> None:
+        """Guarda el resultado de un frame, desalojando lo más antiguo si se supera la memoria"""
+        nbytes = len(pickle.dumps(resultado)) + huella.miniatura.nbytes + _OVERHEAD_ENTRADA
+        if nbytes > self.presupuesto_bytes:
+            return
+
+        with self._lock:
+            ahora = time.monotonic()
+            self._vencer(ahora)
+            if self._galerias.get(device_id, galeria) != galeria:
+                self._quitar_dispositivo(device_id)
+
+            clave = (device_id, huella.bits)
+            previa = self._entradas.pop(clave, None)
+            if previa is not None:
+                self._memoria -= previa.nbytes
+
+            self._entradas[clave] = EntradaCache(resultado, huella.miniatura, ahora, nbytes)
+            self._por_dispositivo.setdefault(device_id, set()).add(huella.bits)
+            self._galerias[device_id] = galeria
+            self._memoria += nbytes
+
+            while self._memoria > self.presupuesto_bytes:
+                self._quitar_primera()
+
+    def invalidar(self, device_id: str) -> None:
+        """Descarta los resultados de un dispositivo (ej. cambió su ROI o perfil)"""
+        with self._lock:
+            self._quitar_dispositivo(device_id)
+
+    def limpiar(self) -> None:
+        """Descarta todos los resultados"""
+        with self._lock:
+            self._entradas.clear()
+            self._por_dispositivo.clear()
+            self._galerias.clear()
+            self._memoria = 0
+
+    def limpiar_galeria(self, galeria: Hashable) -> None:
+        """Descarta los resultados obtenidos con esa galería (ej. al publicarla de nuevo)"""
+        with self._lock:
+            for device_id in [d for d, g in self._galerias.items() if g == galeria]:
+                self._quitar_dispositivo(device_id)
+
+    def _quitar_dispositivo(self, device_id: str) -> None:
+        """Quita las entradas de un dispositivo (con el lock tomado)"""
+        for huella in self._por_dispositivo.pop(device_id, set()):
+            entrada = self._entradas.pop((device_id, huella))
+            self._memoria -= entrada.nbytes
+        self._galerias.pop(device_id, None)
+
+    def _vencer(self, ahora: float) -> None:
+        """Quita las entradas con más de ttl_s (con el lock tomado)"""
+        while self._entradas:
+            entrada = next(iter(self._entradas.values()))
+            if ahora - entrada.creada <= self.ttl_s:
+                break
+            self._quitar_primera()
+
+    def _quitar_primera(self) -> None:
+        (device_id, huella), entrada = self._entradas.popitem(last=False)
+        self._memoria -= entrada.nbytes
+        huellas = self._por_dispositivo.get(device_id)
+        if huellas is not None:
+            huellas.discard(huella)
+            if not huellas:
+                del self._por_dispositivo[device_id]
+                self._galerias.pop(device_id, None)
+
+    def estado(self) -> Dict[str, Any]:
+        """Aciertos, fallos y memoria usada (para /api/metricas)"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "memoria_kb": round(self._memoria / 1024, 1),
+                "presupuesto_kb": round(self.presupuesto_bytes / 1024, 1),
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / consultas, 3) if consultas else 0.0
+            }
+
+
+# Instancia global
+cache_frames = CacheFrames(
+    FRAME_CACHE_TTL_SECONDS,
+    FRAME_CACHE_MAX_MB * 1024 * 1024,
+    FRAME_CACHE_MAX_DISTANCE,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_CHANGED_FRACTION
+)
@@ -0,0 +1,190 @@
+"""
+gallery.py - Galería de encodings faciales en memoria
+Mantiene los encodings como una matriz contigua float32 con normas precalculadas
+y resuelve todos los rostros de un frame en una sola operación vectorizada
+"""
+
+import mmap
+
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+
+# Dimensión de los encodings generados por face_recognition (dlib)
+ENCODING_DIM = 128
+
+
+def _solo_lectura(array: np.ndarray) -> np.ndarray:
+    """Devuelve una vista no modificable (la galería se comparte entre threads)"""
+    vista = array.view()
+    vista.flags.writeable = False
+    return vista
+
+
+def _bytes_en_heap(array: np.ndarray) -> int:
+    """nbytes del array, o 0 si es una vista de un archivo mapeado (np.memmap)"""
+    base = array
+    while isinstance(base, np.ndarray):
+        base = base.base
+    return 0 if isinstance(base, mmap.mmap) else int(array.nbytes)
+
+
+class Gallery:
+    """
+    Galería de rostros conocidos como matriz (N, 128) float32
+
+    Es inmutable: las operaciones de modificación devuelven una galería nueva.
+    """
+
+    def __init__(
+        self,
+        encodings: Sequence[np.ndarray],
+        ids: Sequence[int],
+        names: Sequence[str],
+        norms_sq: Optional[np.ndarray] = None
+    ) -> None:
+        matriz = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+        if len(matriz) != len(ids) or len(ids) != len(names):
+            raise ValueError(
+                f"Galería inconsistente: {len(matriz)} encodings, "
+                f"{len(ids)} ids, {len(names)} nombres"
+            )
+
+        self.encodings: np.ndarray = _solo_lectura(np.ascontiguousarray(matriz))
+        self.ids: np.ndarray = _solo_lectura(np.asarray(ids, dtype=np.int32))
+        self.names: List[str] = list(names)
+
+        # ||g||^2 por fila, reutilizado en cada búsqueda (puede venir precalculado del archivo)
+        if norms_sq is None:
+            norms_sq = np.einsum('ij,ij->i', self.encodings, self.encodings)
+        self.norms_sq: np.ndarray = _solo_lectura(np.asarray(norms_sq, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.encodings)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria de la matriz, normas e IDs (los nombres no se cuentan)"""
+        return int(self.encodings.nbytes + self.norms_sq.nbytes + self.ids.nbytes)
+
+    @property
+    def bytes_residentes(self) -> int:
+        """
+        Memoria propia del proceso (sin contar los arrays abiertos con np.memmap)
+
+        Las páginas de un archivo mapeado están en el page cache: el sistema
+        las comparte entre procesos y las libera bajo presión de memoria.
+        """
+        return sum(_bytes_en_heap(array) for array in (self.encodings, self.norms_sq, self.ids))
+
+    @classmethod
+    def vacia(cls) -> "Gallery":
+        """Crea una galería sin rostros"""
+        return cls(np.empty((0, ENCODING_DIM), dtype=np.float32), [], [])
+
+    def subgaleria(self, ids: Sequence[int]) -> "Gallery":
+        """
+        Crea una galería con las filas de los estudiantes indicados
+
+        Args:
+            ids: IDs de estudiante a conservar (ej. el curso de una sala)
+
+        Returns:
+            Nueva Gallery con copia contigua de las filas seleccionadas
+        """
+        filas = np.flatnonzero(np.isin(self.ids, np.asarray(ids, dtype=np.int32)))
+        return Gallery(
+            self.encodings[filas],
+            self.ids[filas],
+            [self.names[i] for i in filas]
+        )
+
+    def sin_estudiante(self, id_estudiante: int) -> "Gallery":
+        """
+        Crea una galería sin las filas de un estudiante
+
+        Args:
+            id_estudiante: ID del estudiante a quitar
+
+        Returns:
+            Nueva Gallery (la actual no se modifica)
+        """
+        filas = np.flatnonzero(self.ids != id_estudiante)
+        return Gallery(
+            self.encodings[filas],
+            self.ids[filas],
+            [self.names[i] for i in filas]
+        )
+
+    def con_estudiante(
+        self,
+        id_estudiante: int,
+        encodings: Sequence[np.ndarray],
+        nombre: str
+    ) -> "Gallery":
+        """
+        Crea una galería donde el estudiante tiene exactamente los encodings indicados
+
+        Reemplaza las filas previas del estudiante (si existían) y agrega
+        las nuevas al final, sin recalcular el resto de la galería.
+
+        Args:
+            id_estudiante: ID del estudiante a agregar o actualizar
+            encodings: Encodings del estudiante (uno o más)
+            nombre: Nombre completo del estudiante
+
+        Returns:
+            Nueva Gallery (la actual no se modifica)
+        """
+        base = self.sin_estudiante(id_estudiante)
+        nuevos = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        return Gallery(
+            np.concatenate([base.encodings, nuevos]),
+            np.concatenate([base.ids, np.full(len(nuevos), id_estudiante, dtype=np.int32)]),
+            base.names + [nombre] * len(nuevos)
+        )
+
+    def renombrar(self, id_estudiante: int, nombre: str) -> "Gallery":
+        """Crea una galería con el nombre del estudiante actualizado (sin re-codificar)"""
+        names = [
+            nombre if id_fila == id_estudiante else actual
+            for id_fila, actual in zip(self.ids, self.names)
+        ]
+        return Gallery(self.encodings, self.ids, names, norms_sq=self.norms_sq)
+
+    def buscar(self, queries: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca el rostro conocido más cercano para cada encoding consultado
+
+        Calcula ||q - g||^2 = ||q||^2 + ||g||^2 - 2 q·g para todos los pares
+        (rostros del frame x galería) con un único producto matricial.
+
+        Args:
+            queries: Encodings de los rostros detectados (M, 128)
+
+        Returns:
+            Tupla (indices, distancias) de largo M con la fila de la galería
+            más cercana y su distancia euclidiana. Si la galería está vacía,
+            los índices son -1 y las distancias infinito.
+
+        Example:
+            >>> indices, distancias = gallery.buscar(face_encodings)
+            >>> distancias[0] <= FACE_TOLERANCE
+            True
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+        if len(q) == 0 or len(self) == 0:
+            return (
+                np.full(len(q), -1, dtype=np.intp),
+                np.full(len(q), np.inf, dtype=np.float32)
+            )
+
+        # ||q||^2 es constante por fila: no afecta al argmin, se suma al final
+        parcial = self.norms_sq[np.newaxis, :] - 2.0 * (q @ self.encodings.T)
+        indices = np.argmin(parcial, axis=1)
+
+        mejores = parcial[np.arange(len(q)), indices] + np.einsum('ij,ij->i', q, q)
+        distancias = np.sqrt(np.maximum(mejores, 0.0))
+
+        return indices, distancias
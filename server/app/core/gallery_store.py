@@ -0,0 +1,166 @@
+"""
+gallery_store.py - Formato binario versionado de la galería (.fgal)
+Guarda la matriz float32, las normas, los IDs int32 y una tabla de nombres
+única; se abre con np.memmap para que el arranque sea inmediato y todos los
+procesos compartan las mismas páginas del archivo
+
+Layout (little endian, secciones alineadas a 64 bytes):
+    cabecera (64 bytes)
+    encodings  float32 (n, dim)
+    norms_sq   float32 (n,)
+    ids        int32   (n,)
+    name_idx   int32   (n,)   índice en la tabla de nombres
+    nombres    JSON utf-8     lista de nombres únicos
+"""
+
+import json
+import logging
+import os
+import pickle
+import struct
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"FGAL"
+FORMAT_VERSION = 1
+
+# magic, version, dim, n_filas, n_nombres, offsets de cada sección, largo de nombres
+_CABECERA = struct.Struct("<4sHHIIQQQQQQ")
+_ALINEACION = 64
+
+
+def _alinear(offset: int) -> int:
+    return (offset + _ALINEACION - 1) // _ALINEACION * _ALINEACION
+
+
+def guardar_galeria(gallery: Gallery, path: Path) -> None:
+    """
+    Escribe la galería en formato .fgal de forma atómica
+
+    Se escribe en un archivo temporal y se reemplaza con os.replace: los
+    procesos que tienen abierto el archivo anterior siguen leyendo una
+    versión completa hasta que lo vuelven a abrir.
+
+    Args:
+        gallery: Galería a guardar
+        path: Ruta destino (ej. GALLERY_FILE)
+    """
+    n = len(gallery)
+
+    # Tabla de nombres única (varias filas del mismo estudiante comparten nombre)
+    tabla: Dict[str, int] = {}
+    name_idx = np.fromiter(
+        (tabla.setdefault(nombre, len(tabla)) for nombre in gallery.names),
+        dtype=np.int32,
+        count=n
+    )
+    nombres = json.dumps(list(tabla), ensure_ascii=False).encode("utf-8")
+
+    off_encodings = _alinear(_CABECERA.size)
+    off_norms = _alinear(off_encodings + n * ENCODING_DIM * 4)
+    off_ids = _alinear(off_norms + n * 4)
+    off_name_idx = _alinear(off_ids + n * 4)
+    off_nombres = _alinear(off_name_idx + n * 4)
+
+    cabecera = _CABECERA.pack(
+        MAGIC, FORMAT_VERSION, ENCODING_DIM, n, len(tabla),
+        off_encodings, off_norms, off_ids, off_name_idx, off_nombres, len(nombres)
+    )
+
+    secciones = [
+        (0, cabecera),
+        (off_encodings, np.ascontiguousarray(gallery.encodings, dtype='<f4').tobytes()),
+        (off_norms, np.ascontiguousarray(gallery.norms_sq, dtype='<f4').tobytes()),
+        (off_ids, np.ascontiguousarray(gallery.ids, dtype='<i4').tobytes()),
+        (off_name_idx, name_idx.astype('<i4').tobytes()),
+        (off_nombres, nombres),
+    ]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, 'wb') as f:
+        for offset, datos in secciones:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(datos)
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(tmp_path, path)
+
+
+def abrir_galeria(path: Path) -> Gallery:
+    """
+    Abre una galería .fgal mapeando sus arrays en memoria (sin copiarlos)
+
+    Args:
+        path: Ruta del archivo .fgal
+
+    Returns:
+        Gallery cuyos encodings, normas e IDs son np.memmap de solo lectura
+
+    Raises:
+        ValueError: Si el archivo no es una galería válida o es de otra versión
+    """
+    with open(path, 'rb') as f:
+        cabecera = f.read(_CABECERA.size)
+
+    if len(cabecera) < _CABECERA.size:
+        raise ValueError(f"Archivo de galería truncado: {path}")
+
+    (magic, version, dim, n, n_nombres, off_encodings, off_norms,
+     off_ids, off_name_idx, off_nombres, largo_nombres) = _CABECERA.unpack(cabecera)
+
+    if magic != MAGIC:
+        raise ValueError(f"No es un archivo de galería: {path}")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Versión de galería no soportada ({version}) en {path}")
+    if dim != ENCODING_DIM:
+        raise ValueError(f"Dimensión de encodings inesperada ({dim}) en {path}")
+
+    if n == 0:
+        return Gallery.vacia()
+
+    encodings = np.memmap(path, dtype='<f4', mode='r', offset=off_encodings, shape=(n, dim))
+    norms_sq = np.memmap(path, dtype='<f4', mode='r', offset=off_norms, shape=(n,))
+    ids = np.memmap(path, dtype='<i4', mode='r', offset=off_ids, shape=(n,))
+    name_idx = np.memmap(path, dtype='<i4', mode='r', offset=off_name_idx, shape=(n,))
+
+    with open(path, 'rb') as f:
+        f.seek(off_nombres)
+        tabla: List[str] = json.loads(f.read(largo_nombres).decode("utf-8"))
+
+    if len(tabla) != n_nombres:
+        raise ValueError(f"Tabla de nombres corrupta en {path}")
+
+    names = [tabla[i] for i in name_idx.tolist()]
+
+    return Gallery(encodings, ids, names, norms_sq=norms_sq)
+
+
+def migrar_desde_pickle(pickle_path: Path, path: Path) -> Gallery:
+    """
+    Convierte el encodings.pkl anterior (listas de Python) al formato .fgal
+
+    Args:
+        pickle_path: Ruta del pickle con claves 'encodings', 'ids', 'names'
+        path: Ruta destino del archivo .fgal
+
+    Returns:
+        Gallery abierta desde el archivo migrado
+    """
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+
+    gallery = Gallery(data['encodings'], data['ids'], data['names'])
+    guardar_galeria(gallery, path)
+
+    logger.info(f"Galería migrada: {len(gallery)} rostros de {pickle_path} a {path}")
+
+    return abrir_galeria(path)
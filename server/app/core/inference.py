@@ -0,0 +1,332 @@
+"""
+inference.py - Etapa reconocer en procesos worker (INFERENCE_BACKEND=processes)
+Con threads, la detección HOG, el encoder y numpy compiten por el GIL del
+servidor. Aquí cada worker es un proceso propio con su copia de las galerías
+(abiertas desde disco al lanzarlo), que recibe el frame decodificado
+en un bloque de memoria compartida (sin serializar el array) y devuelve solo
+el resultado. Cada dispositivo va siempre al mismo worker, así sus pistas y
+su escena de referencia (tracking.py, motion.py) siguen en un solo lugar.
+Un worker que se cae o deja de responder se reemplaza en el siguiente frame
+"""
+
+import logging
+import os
+import signal
+import threading
+import zlib
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from app.core.enrollment import contexto_multiproceso
+from app.core.face_recognition import FaceRecognitionProcessor
+from app.core.tenants import galerias_colegios
+
+logger = logging.getLogger(__name__)
+
+# (generación de dispositivos, última galería publicada) del proceso principal
+Generaciones = Tuple[int, int]
+
+
+def _fijar_hilos(indice: int, hilos: int, total_procesos: int) -> None:
+    """
+    Limita los threads nativos del worker y, si alcanzan los núcleos, lo fija a los suyos
+
+    Sin esto cada proceso abriría un thread de BLAS por núcleo y N workers
+    se pelearían por los mismos núcleos. OMP_NUM_THREADS y similares ya no
+    sirven aquí (numpy se importó antes); threadpoolctl cambia el límite de
+    las librerías BLAS / OpenMP ya cargadas.
+    """
+    threadpool_limits(limits=hilos)
+
+    if not hasattr(os, "sched_setaffinity"):
+        return
+
+    nucleos = sorted(os.sched_getaffinity(0))
+    if total_procesos * hilos > len(nucleos):
+        # Más threads que núcleos: fijar solo repartiría mal la carga
+        return
+
+    propios = set(nucleos[indice * hilos:(indice + 1) * hilos])
+    os.sched_setaffinity(0, propios)
+
+
+def _bucle_worker(
+    conexion: Connection,
+    indice: int,
+    hilos: int,
+    total_procesos: int,
+    dispositivos: Tuple[Any, ...]
+) -> None:
+    """
+    Proceso worker: atiende frames hasta recibir None o perder la conexión
+
+    Mensajes recibidos: (nombre del bloque compartido, forma del frame,
+    device_id, sincronización o None). Responde con el dict de procesar_frame.
+    """
+    # Ctrl+C llega a todo el grupo: el cierre lo coordina el proceso principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _fijar_hilos(indice, hilos, total_procesos)
+    galerias_colegios.cargar_dispositivos(*dispositivos)
+
+    bloque: Optional[shared_memory.SharedMemory] = None
+
+    while True:
+        try:
+            mensaje = conexion.recv()
+        except (EOFError, OSError):
+            break
+        if mensaje is None:
+            break
+
+        nombre, forma, device_id, sincronizar = mensaje
+        try:
+            if sincronizar is not None:
+                modificadas, configuracion = sincronizar
+                if configuracion is not None:
+                    galerias_colegios.cargar_dispositivos(*configuracion)
+                if modificadas:
+                    galerias_colegios.recargar_galerias(modificadas)
+
+            if bloque is None or bloque.name != nombre:
+                # El proceso principal agrandó el bloque para un frame más grande
+                if bloque is not None:
+                    bloque.close()
+                bloque = shared_memory.SharedMemory(name=nombre)
+
+            imagen = np.ndarray(forma, dtype=np.uint8, buffer=bloque.buf)
+            resultado = galerias_colegios.procesar_frame(imagen, device_id)
+            del imagen
+        except Exception as e:
+            logger.error(f"Worker de inferencia {indice}: error al procesar frame: {e}")
+            resultado = {'faces_found': 0, 'matches': [], 'error': str(e)}
+
+        try:
+            conexion.send(resultado)
+        except (EOFError, OSError):
+            break
+
+    if bloque is not None:
+        bloque.close()
+
+
+class WorkerInferencia:
+    """Un proceso worker, su conexión y su bloque de memoria compartida (visto desde el servidor)"""
+
+    def __init__(self, indice: int, total_procesos: int, hilos: int, bytes_bloque: int, timeout_s: float) -> None:
+        self.indice = indice
+        self.total_procesos = total_procesos
+        self.hilos = hilos
+        self.timeout_s = timeout_s
+
+        # El bloque se crea al lanzar el proceso: los workers vuelven a
+        # importar app.main (spawn / forkserver) y no deben crear bloques propios
+        self.bytes_bloque = bytes_bloque
+        self._bloque: Optional[shared_memory.SharedMemory] = None
+        self._proceso: Optional[BaseProcess] = None
+        self._conexion: Optional[Connection] = None
+        # Generaciones que el worker ya conoce (se fijan al lanzarlo)
+        self._sincronizado: Generaciones = (0, 0)
+        # Un frame a la vez: el bloque compartido es uno solo
+        self._lock = threading.Lock()
+
+        self.frames = 0
+        self.reinicios = 0
+
+    def iniciar(self, generaciones: Generaciones) -> None:
+        """Lanza el proceso si todavía no corre"""
+        with self._lock:
+            if self._proceso is None:
+                self._iniciar(generaciones)
+
+    def procesar(self, imagen: np.ndarray, device_id: Optional[str], generaciones: Generaciones) -> Dict[str, Any]:
+        """
+        Procesa un frame en el worker (bloquea el thread que llama, no el GIL)
+
+        Args:
+            imagen: Frame RGB uint8 decodificado
+            device_id: Dispositivo que envió el frame
+            generaciones: Estado actual de dispositivos y galerías del servidor
+
+        Returns:
+            Resultado de procesar_frame, o un dict con 'error' si el worker
+            se cayó o no respondió a tiempo (en ese caso ya fue reemplazado)
+        """
+        with self._lock:
+            if self._proceso is None or not self._proceso.is_alive():
+                if self._proceso is not None:
+                    logger.error(f"Worker de inferencia {self.indice} terminó (exitcode {self._proceso.exitcode}); reiniciando")
+                    self.reinicios += 1
+                self._iniciar(generaciones)
+
+            self._copiar(imagen)
+            mensaje = (self._bloque.name, imagen.shape, device_id, self._sincronizacion(generaciones))
+
+            try:
+                self._conexion.send(mensaje)
+                if not self._conexion.poll(self.timeout_s):
+                    raise TimeoutError(f"sin respuesta en {self.timeout_s:g} s")
+                resultado = self._conexion.recv()
+            except (EOFError, OSError, TimeoutError) as e:
+                logger.error(f"Worker de inferencia {self.indice} falló ({e}); reiniciando")
+                self.reinicios += 1
+                self._detener(forzar=True)
+                self._iniciar(generaciones)
+                return {'faces_found': 0, 'matches': [], 'error': f"Worker de inferencia reiniciado: {e}"}
+
+            self._sincronizado = generaciones
+            self.frames += 1
+            return resultado
+
+    def _iniciar(self, generaciones: Generaciones) -> None:
+        """Lanza el proceso con la configuración de dispositivos actual (las galerías las abre desde disco)"""
+        if self._bloque is None:
+            self._bloque = shared_memory.SharedMemory(create=True, size=self.bytes_bloque)
+
+        contexto = contexto_multiproceso()
+        extremo_servidor, extremo_worker = contexto.Pipe()
+        self._proceso = contexto.Process(
+            target=_bucle_worker,
+            args=(
+                extremo_worker,
+                self.indice,
+                self.hilos,
+                self.total_procesos,
+                galerias_colegios.configuracion_dispositivos()
+            ),
+            name=f"inferencia-{self.indice}",
+            daemon=True
+        )
+        self._proceso.start()
+        extremo_worker.close()
+        self._conexion = extremo_servidor
+        self._sincronizado = generaciones
+        logger.info(f"Worker de inferencia {self.indice} iniciado (pid {self._proceso.pid})")
+
+    def _sincronizacion(
+        self,
+        generaciones: Generaciones
+    ) -> Optional[Tuple[Tuple[Optional[Path], ...], Optional[Tuple[Any, ...]]]]:
+        """
+        (galerías modificadas, configuración de dispositivos o None), o None si el worker está al día
+
+        Solo se envían los directorios de las galerías publicadas después de
+        la última que vio el worker: las cargas bajo demanda no cuentan.
+        """
+        if self._sincronizado == generaciones:
+            return None
+        dispositivos_previos, galerias_previas = self._sincronizado
+        configuracion = (
+            galerias_colegios.configuracion_dispositivos()
+            if dispositivos_previos != generaciones[0] else None
+        )
+        modificadas = tuple(
+            directorio
+            for directorio, numero in list(FaceRecognitionProcessor.publicaciones.items())
+            if numero > galerias_previas
+        )
+        return modificadas, configuracion
+
+    def _copiar(self, imagen: np.ndarray) -> None:
+        """Copia el frame al bloque compartido, reemplazándolo por uno mayor si no cabe"""
+        if imagen.nbytes > self._bloque.size:
+            logger.info(f"Worker de inferencia {self.indice}: bloque compartido ampliado a {imagen.nbytes / 1024 / 1024:.1f} MB")
+            self._bloque.close()
+            self._bloque.unlink()
+            self._bloque = shared_memory.SharedMemory(create=True, size=imagen.nbytes)
+
+        destino = np.ndarray(imagen.shape, dtype=np.uint8, buffer=self._bloque.buf)
+        destino[...] = imagen
+        del destino
+
+    def _detener(self, forzar: bool = False) -> None:
+        if self._proceso is None:
+            return
+        if not forzar:
+            try:
+                self._conexion.send(None)
+            except (EOFError, OSError):
+                pass
+            self._proceso.join(timeout=self.timeout_s)
+        if self._proceso.is_alive():
+            self._proceso.kill()
+            self._proceso.join()
+        self._conexion.close()
+        self._proceso = None
+        self._conexion = None
+
+    def estado(self) -> Dict[str, Any]:
+        proceso = self._proceso
+        bytes_bloque = self._bloque.size if self._bloque is not None else self.bytes_bloque
+        return {
+            "pid": proceso.pid if proceso is not None else None,
+            "vivo": proceso is not None and proceso.is_alive(),
+            "frames": self.frames,
+            "reinicios": self.reinicios,
+            "bloque_mb": round(bytes_bloque / 1024 / 1024, 1)
+        }
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._detener()
+            if self._bloque is not None:
+                self._bloque.close()
+                self._bloque.unlink()
+                self._bloque = None
+
+
+class PoolInferencia:
+    """Reparte los frames entre procesos worker, cada dispositivo siempre al mismo"""
+
+    def __init__(self, procesos: int, hilos: int, bytes_bloque: int, timeout_s: float) -> None:
+        """
+        Args:
+            procesos: Número de procesos worker
+            hilos: Threads nativos por worker
+            bytes_bloque: Tamaño inicial de la memoria compartida de cada worker
+            timeout_s: Espera máxima por un frame antes de reiniciar el worker
+        """
+        self.workers: List[WorkerInferencia] = [
+            WorkerInferencia(i, procesos, hilos, bytes_bloque, timeout_s)
+            for i in range(procesos)
+        ]
+
+    def iniciar(self) -> None:
+        """
+        Lanza todos los workers
+
+        Conviene llamarlo al arrancar: cada worker importa app.core y abre
+        sus galerías, lo que demora el primer frame. Los que falten se
+        lanzan igual en su primer frame.
+        """
+        generaciones = self._generaciones()
+        for worker in self.workers:
+            worker.iniciar(generaciones)
+
+    def procesar_frame(self, imagen: np.ndarray, device_id: Optional[str] = None) -> Dict[str, Any]:
+        """Mismo contrato que galerias_colegios.procesar_frame, en el worker del dispositivo"""
+        return self._worker(device_id).procesar(np.ascontiguousarray(imagen, dtype=np.uint8), device_id, self._generaciones())
+
+    def _worker(self, device_id: Optional[str]) -> WorkerInferencia:
+        # crc32 y no hash(): estable entre reinicios del servidor
+        clave = zlib.crc32((device_id or "").encode("utf-8"))
+        return self.workers[clave % len(self.workers)]
+
+    @staticmethod
+    def _generaciones() -> Generaciones:
+        return galerias_colegios.generacion, FaceRecognitionProcessor.ultima_publicacion
+
+    def estado(self) -> List[Dict[str, Any]]:
+        """Estado de cada worker (para /api/metricas)"""
+        return [worker.estado() for worker in self.workers]
+
+    def cerrar(self) -> None:
+        """Detiene los workers y libera la memoria compartida"""
+        for worker in self.workers:
+            worker.cerrar()
+
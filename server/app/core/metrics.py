@@ -0,0 +1,81 @@
+"""
+metrics.py - Métricas de rendimiento en memoria
+Guarda las últimas METRICS_WINDOW muestras de cada tiempo (decodificación,
+detección, etc.) y contadores acumulados, expuestos en GET /api/metricas
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator
+
+import numpy as np
+
+from app.config import METRICS_WINDOW
+
+
+class Metricas:
+    """Tiempos por etapa (ventana móvil) y contadores, seguros entre threads"""
+
+    def __init__(self, ventana: int) -> None:
+        self.ventana = ventana
+        self._tiempos: Dict[str, Deque[float]] = {}
+        self._contadores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def registrar_tiempo(self, nombre: str, ms: float) -> None:
+        """Agrega una muestra en milisegundos a la métrica `nombre`"""
+        with self._lock:
+            muestras = self._tiempos.get(nombre)
+            if muestras is None:
+                muestras = self._tiempos[nombre] = deque(maxlen=self.ventana)
+            muestras.append(ms)
+
+    @contextmanager
+    def medir(self, nombre: str) -> Iterator[None]:
+        """
+        Mide el tiempo del bloque y lo registra en la métrica `nombre`
+
+        Example:
+            >>> with metricas.medir("decode"):
+            ...     img = decodificar(datos)
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar_tiempo(nombre, (time.perf_counter() - inicio) * 1000)
+
+    def incrementar(self, nombre: str, cantidad: int = 1) -> None:
+        """Suma `cantidad` al contador `nombre`"""
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + cantidad
+
+    def resumen(self) -> Dict[str, Any]:
+        """
+        Percentiles de cada tiempo y valor de cada contador
+
+        Returns:
+            {'tiempos_ms': {nombre: {'muestras', 'p50', 'p95', 'max'}}, 'contadores': {...}}
+        """
+        with self._lock:
+            tiempos = {nombre: np.asarray(muestras) for nombre, muestras in self._tiempos.items()}
+            contadores = dict(self._contadores)
+
+        return {
+            'tiempos_ms': {
+                nombre: {
+                    'muestras': int(len(valores)),
+                    'p50': round(float(np.percentile(valores, 50)), 2),
+                    'p95': round(float(np.percentile(valores, 95)), 2),
+                    'max': round(float(valores.max()), 2)
+                }
+                for nombre, valores in tiempos.items() if len(valores) > 0
+            },
+            'contadores': contadores
+        }
+
+
+# Instancia global
+metricas = Metricas(METRICS_WINDOW)
@@ -0,0 +1,166 @@
+"""
+motion.py - Descarte de frames sin cambios por dispositivo
+Compara una miniatura en escala de grises (MOTION_THUMB_WIDTH px de ancho) con
+la del último frame procesado: si ese frame no tenía rostros y la escena no
+cambió, se responde "no_face" sin correr la detección. Con la puerta vacía
+esto evita casi todo el costo de HOG
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.detection import Roi, recortar_roi
+from app.config import (
+    MOTION_THUMB_WIDTH,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_CHANGED_FRACTION,
+    MOTION_MAX_SKIP_SECONDS
+)
+
+
+@dataclass
+class EstadoEscena:
+    """Último frame procesado de un dispositivo"""
+
+    miniatura: np.ndarray
+    instante: float
+    sin_rostros: bool = False
+    frames: int = 0
+    omitidos: int = 0
+
+
+def miniatura(image_array: np.ndarray, ancho: int, roi: Optional[Roi] = None) -> np.ndarray:
+    """
+    Reduce el frame (o su ROI) a `ancho` píxeles en escala de grises
+
+    El filtro BOX promedia bloques completos, lo que además suaviza el ruido
+    del sensor antes de comparar.
+
+    Returns:
+        Matriz (alto, ancho) int16, lista para restar sin desbordes
+    """
+    if roi is not None:
+        image_array, _, _ = recortar_roi(image_array, roi)
+
+    alto_original, ancho_original = image_array.shape[:2]
+    ancho = min(ancho, ancho_original)
+    alto = max(1, round(alto_original * ancho / ancho_original))
+
+    reducida = Image.fromarray(image_array).resize((ancho, alto), Image.BOX).convert("L")
+    return np.asarray(reducida, dtype=np.int16)
+
+
+def hay_cambio(
+    anterior: np.ndarray,
+    actual: np.ndarray,
+    umbral_pixel: int,
+    fraccion_minima: float
+) -> bool:
+    """
+    Compara dos miniaturas del mismo tamaño
+
+    Returns:
+        True si más de `fraccion_minima` de los píxeles cambió más de `umbral_pixel`
+    """
+    cambiados = np.count_nonzero(np.abs(actual - anterior) > umbral_pixel)
+    return cambiados > fraccion_minima * actual.size
+
+
+class DetectorMovimiento:
+    """Decide por dispositivo si un frame puede omitirse (seguro entre threads)"""
+
+    def __init__(
+        self,
+        ancho: int,
+        umbral_pixel: int,
+        fraccion_minima: float,
+        max_omision_s: float
+    ) -> None:
+        """
+        Args:
+            ancho: Ancho de la miniatura comparada
+            umbral_pixel: Diferencia de gris (0-255) para considerar que un píxel cambió
+            fraccion_minima: Fracción de píxeles cambiados que cuenta como movimiento
+            max_omision_s: Segundos máximos sin procesar un frame del dispositivo
+        """
+        self.ancho = ancho
+        self.umbral_pixel = umbral_pixel
+        self.fraccion_minima = fraccion_minima
+        self.max_omision_s = max_omision_s
+
+        self._escenas: Dict[str, EstadoEscena] = {}
+        self._lock = threading.Lock()
+
+    def omitir(self, device_id: str, image_array: np.ndarray, roi: Optional[Roi] = None) -> bool:
+        """
+        Indica si el frame es igual al último procesado sin rostros
+
+        Si no se omite, el frame pasa a ser la nueva referencia del dispositivo
+        y se debe informar su resultado con registrar_resultado().
+
+        Args:
+            device_id: Dispositivo que envió el frame
+            image_array: Frame RGB decodificado
+            roi: Región de interés del dispositivo (el movimiento fuera de ella no cuenta)
+
+        Returns:
+            True si se puede responder "no_face" sin detectar
+        """
+        actual = miniatura(image_array, self.ancho, roi)
+        ahora = time.monotonic()
+
+        with self._lock:
+            escena = self._escenas.get(device_id)
+
+            if escena is None:
+                self._escenas[device_id] = EstadoEscena(actual, ahora, frames=1)
+                return False
+
+            escena.frames += 1
+
+            if (
+                escena.sin_rostros
+                and ahora - escena.instante < self.max_omision_s
+                and escena.miniatura.shape == actual.shape
+                and not hay_cambio(escena.miniatura, actual, self.umbral_pixel, self.fraccion_minima)
+            ):
+                escena.omitidos += 1
+                return True
+
+            escena.miniatura = actual
+            escena.instante = ahora
+            escena.sin_rostros = False
+            return False
+
+    def registrar_resultado(self, device_id: str, rostros: int) -> None:
+        """Guarda si el frame de referencia del dispositivo tenía rostros"""
+        with self._lock:
+            escena = self._escenas.get(device_id)
+            if escena is not None:
+                escena.sin_rostros = rostros == 0
+
+    def estado(self) -> Dict[str, Any]:
+        """Frames recibidos y omitidos por dispositivo (para /api/metricas)"""
+        with self._lock:
+            return {
+                device_id: {
+                    "frames": escena.frames,
+                    "omitidos": escena.omitidos,
+                    "tasa_omision": round(escena.omitidos / escena.frames, 3) if escena.frames else 0.0
+                }
+                for device_id, escena in self._escenas.items()
+            }
+
+
+# Instancia global
+detector_movimiento = DetectorMovimiento(
+    MOTION_THUMB_WIDTH,
+    MOTION_PIXEL_THRESHOLD,
+    MOTION_MIN_CHANGED_FRACTION,
+    MOTION_MAX_SKIP_SECONDS
+)
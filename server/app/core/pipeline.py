@@ -0,0 +1,396 @@
+"""
+pipeline.py - Procesamiento de frames en etapas fuera del event loop
+Cada frame pasa por decodificar -> reconocer -> persistir -> notificar (un
+frame casi idéntico a uno reciente toma el resultado del cache; dentro de
+reconocer, el encoder corre en micro-lotes con frames de otros dispositivos).
+Antes de todo pasa por el control de admisión: un frame en curso por
+dispositivo (o su peso redondeado hacia arriba) y el más reciente en espera;
+y la etapa reconocer se reparte entre dispositivos según su peso
+(scheduling.py). Las
+etapas bloqueantes corren en su propio ThreadPoolExecutor con un límite de
+frames en curso, de modo que un frame pesado o una consulta lenta a MySQL no
+detienen los WebSockets ni el dashboard; el event loop solo hace I/O
+"""
+
+import asyncio
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.admission import ControlAdmision, DispositivoOcupado
+from app.core.batching import AgrupadorLotes
+from app.core.database import db
+from app.core.face_recognition import FaceRecognitionProcessor, FrameDetectado, face_recognition_processor
+from app.core.frame_cache import cache_frames, huella_perceptual
+from app.core.inference import PoolInferencia
+from app.core.metrics import metricas
+from app.core.profiles import PERFILES
+from app.core.scheduling import PlanificadorDRR
+from app.core.tenants import galerias_colegios
+from app.core.tracking import rastreador
+from app.config import (
+    ADMISSION_CONTROL,
+    ADMISSION_DEADLINE_MS,
+    ADMISSION_MIN_RETRY_MS,
+    BATCH_MAX_SIZE,
+    BATCH_MAX_WAIT_MS,
+    COOLDOWN_SECONDS,
+    FAIR_SCHEDULING,
+    FRAME_CACHE_ENABLED,
+    FRAME_CACHE_HASH_SIZE,
+    INFERENCE_BACKEND,
+    INFERENCE_PROCESSES,
+    INFERENCE_THREADS_PER_PROCESS,
+    INFERENCE_SHM_MB,
+    INFERENCE_TIMEOUT_SECONDS,
+    PIPELINE_DECODE_WORKERS,
+    PIPELINE_RECOGNITION_WORKERS,
+    PIPELINE_DB_WORKERS,
+    SCHEDULER_QUANTUM_MS
+)
+
+logger = logging.getLogger(__name__)
+
+# Envía un comando a un dispositivo: (device_id, comando) -> entregado
+Notificador = Callable[[str, Dict[str, Any]], Awaitable[bool]]
+
+
+class ErrorDecodificacion(Exception):
+    """El frame recibido no es una imagen válida"""
+
+
+def _cronometrar(funcion: Callable[..., Any], *args: Any) -> Tuple[Any, float]:
+    """(funcion(*args), segundos que tardó), medido dentro del thread que la ejecuta"""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+class Etapa:
+    """Executor dedicado + semáforo que limita los frames en curso de una etapa"""
+
+    def __init__(self, nombre: str, workers: int) -> None:
+        self.nombre = nombre
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"etapa-{nombre}")
+
+        # Se crea en el primer uso: debe pertenecer al event loop del servidor
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self.en_curso = 0
+        self.esperando = 0
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecuta `funcion(*args)` en el executor de la etapa
+
+        Con `workers` frames ya en curso, el siguiente espera en el event loop
+        (sin ocupar un thread) y ese tiempo se registra como cola_<etapa>.
+        """
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.workers)
+
+        loop = asyncio.get_running_loop()
+        llegada = time.perf_counter()
+
+        self.esperando += 1
+        try:
+            await self._semaforo.acquire()
+        finally:
+            self.esperando -= 1
+
+        inicio = time.perf_counter()
+        metricas.registrar_tiempo(f"cola_{self.nombre}", (inicio - llegada) * 1000)
+
+        self.en_curso += 1
+        try:
+            return await loop.run_in_executor(self.executor, funcion, *args)
+        finally:
+            self.en_curso -= 1
+            self._semaforo.release()
+            metricas.registrar_tiempo(f"etapa_{self.nombre}", (time.perf_counter() - inicio) * 1000)
+
+    def estado(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "en_curso": self.en_curso, "esperando": self.esperando}
+
+    def cerrar(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class PipelineFrames:
+    """Etapas del procesamiento de un frame de asistencia"""
+
+    def __init__(self, notificar: Notificador) -> None:
+        """
+        Args:
+            notificar: Corrutina que envía comandos al dispositivo (LED por WebSocket)
+        """
+        self.notificar = notificar
+        self.decodificar = Etapa("decode", PIPELINE_DECODE_WORKERS)
+        self.reconocer = Etapa("reconocer", PIPELINE_RECOGNITION_WORKERS)
+        self.persistir = Etapa("persistir", PIPELINE_DB_WORKERS)
+        self.admision: Optional[ControlAdmision] = None
+        if ADMISSION_CONTROL:
+            self.admision = ControlAdmision(
+                ADMISSION_DEADLINE_MS / 1000,
+                ADMISSION_MIN_RETRY_MS / 1000,
+                self._cupo_dispositivo
+            )
+        # Turnos de la etapa reconocer por dispositivo, según su peso: tantos
+        # como threads de la etapa, así el semáforo nunca reordena los frames
+        self.planificador: Optional[PlanificadorDRR] = None
+        if FAIR_SCHEDULING:
+            self.planificador = PlanificadorDRR(
+                self.reconocer.workers,
+                SCHEDULER_QUANTUM_MS / 1000,
+                lambda device_id: galerias_colegios.peso_por_dispositivo.get(device_id, 1.0)
+            )
+        # Los lotes del encoder corren en los threads de la etapa reconocer
+        self.lotes = AgrupadorLotes(self.reconocer.ejecutar, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS / 1000)
+        # Con INFERENCE_BACKEND=processes, esos threads solo esperan a los procesos worker
+        self.inferencia: Optional[PoolInferencia] = None
+        if INFERENCE_BACKEND == "processes":
+            self.inferencia = PoolInferencia(
+                INFERENCE_PROCESSES,
+                INFERENCE_THREADS_PER_PROCESS,
+                INFERENCE_SHM_MB * 1024 * 1024,
+                INFERENCE_TIMEOUT_SECONDS
+            )
+
+    def _cupo_dispositivo(self, device_id: str) -> int:
+        """
+        Frames en curso que admite un dispositivo: su peso redondeado hacia arriba
+
+        Con un solo frame en curso por dispositivo el peso no tendría efecto
+        (nunca habría dos frames suyos esperando turno en el planificador).
+        Más frames que threads de la etapa reconocer solo agregarían espera.
+        """
+        if self.planificador is None:
+            return 1
+        peso = galerias_colegios.peso_por_dispositivo.get(device_id, 1.0)
+        return max(1, min(math.ceil(peso), self.reconocer.workers))
+
+    def iniciar(self) -> None:
+        """Lanza los procesos worker de inferencia, si se usan (llamar con las galerías ya cargadas)"""
+        if self.inferencia is not None:
+            self.inferencia.iniciar()
+
+    async def procesar(self, img_data: bytes, device_id: str) -> Dict[str, Any]:
+        """
+        Decodifica, reconoce, registra la asistencia y notifica al dispositivo
+
+        Args:
+            img_data: Bytes de la imagen (JPEG/PNG)
+            device_id: ID del dispositivo que envió el frame
+
+        Returns:
+            Dict de respuesta ('recognized', 'unknown', 'low_quality', 'no_face',
+            'busy' con 'retry_after' en segundos, o 'error')
+
+        Raises:
+            ErrorDecodificacion: Si la imagen no se puede decodificar
+        """
+        llegada = time.monotonic()
+
+        try:
+            if self.admision is None:
+                return await self._procesar(img_data, device_id, llegada)
+
+            await self.admision.admitir(device_id, llegada)
+            try:
+                return await self._procesar(img_data, device_id, llegada)
+            finally:
+                self.admision.liberar(device_id)
+
+        except DispositivoOcupado as e:
+            metricas.incrementar(f"frames_{e.motivo}s")
+            return {
+                "status": "busy",
+                "message": "Dispositivo con un frame en proceso" if e.motivo == "reemplazado"
+                else "Frame descartado por antigüedad",
+                "retry_after": e.reintentar_s
+            }
+
+    async def _procesar(self, img_data: bytes, device_id: str, llegada: float) -> Dict[str, Any]:
+        """Cuerpo de procesar() para un frame ya admitido"""
+        resultado = None
+        huella = None
+        galeria = galerias_colegios.galeria_dispositivo(device_id)
+
+        if FRAME_CACHE_ENABLED:
+            # Huella sobre una decodificación draft a 1/8: mucho más barata que el frame completo
+            huella = await self.decodificar.ejecutar(
+                huella_perceptual, img_data, FRAME_CACHE_HASH_SIZE,
+                galerias_colegios.roi_por_dispositivo.get(device_id)
+            )
+            if huella is not None:
+                resultado = cache_frames.obtener(device_id, huella, galeria)
+
+        if resultado is None:
+            # Los procesos worker reciben el frame completo; con threads la
+            # detección puede usar la decodificación draft (JPEG_DRAFT_WIDTH)
+            if self.inferencia is not None:
+                img_array = await self.decodificar.ejecutar(
+                    face_recognition_processor.decode_image_bytes, img_data
+                )
+            else:
+                img_array = await self.decodificar.ejecutar(
+                    face_recognition_processor.decode_frame, img_data,
+                    PERFILES.get(galerias_colegios.perfil_por_dispositivo.get(device_id))
+                )
+            if img_array is None:
+                raise ErrorDecodificacion("Error al decodificar imagen")
+
+            # Si el frame se atrasó en la cola de decodificación ya no vale la pena reconocerlo
+            if self.admision is not None:
+                self.admision.verificar_plazo(device_id, llegada)
+
+            if self.planificador is None:
+                resultado = await self._reconocer(img_array, device_id)
+            else:
+                resultado = await self._reconocer_con_turno(img_array, device_id)
+
+            if huella is not None and 'error' not in resultado:
+                cache_frames.guardar(device_id, huella, resultado, galeria)
+
+        if resultado['faces_found'] == 0:
+            return {
+                "status": "no_face",
+                "message": "No se detectaron rostros"
+            }
+
+        if len(resultado['matches']) == 0 and resultado.get('low_quality', 0) == resultado['faces_found']:
+            # Ningún rostro apto para comparar: no se informa como desconocido (sin LED rojo)
+            return {
+                "status": "low_quality",
+                "message": "Rostro muy pequeño, borroso o girado",
+                "faces_found": resultado['faces_found']
+            }
+
+        if len(resultado['matches']) == 0:
+            await self.notificar(device_id, {"type": "led_control", "color": "red", "duration": 1})
+            return {
+                "status": "unknown",
+                "message": "Rostro no reconocido",
+                "faces_found": resultado['faces_found']
+            }
+
+        match = resultado['matches'][0]
+
+        reutilizado = match.get('rastreado') or resultado.get('en_cache')
+        if reutilizado and rastreador.registrada(device_id, match['id']):
+            # Mismo rostro (pista o frame en cache) ya registrado: sin consultar la BD
+            registro = None
+        else:
+            registro = await self.persistir.ejecutar(self._registrar, match['id'], device_id)
+            if registro is None or registro['success']:
+                rastreador.marcar_registrada(device_id, match['id'])
+
+        if registro is None:
+            # Ya fue registrado recientemente
+            logger.info(f"{match['name']} ya registrado (cooldown activo)")
+            return {
+                "status": "recognized",
+                "nombre": match['name'],
+                "id_estudiante": match['id'],
+                "confidence": match['confidence'],
+                "registrado": False,
+                "mensaje": "Ya registrado hoy"
+            }
+
+        if not registro['success']:
+            logger.error(f"Error al registrar: {registro.get('error')}")
+            return {
+                "status": "error",
+                "message": "Error al registrar en BD"
+            }
+
+        await self.notificar(device_id, {"type": "led_control", "color": "green", "duration": 2})
+        logger.info(f"Asistencia registrada: {match['name']} (ID: {match['id']})")
+
+        return {
+            "status": "recognized",
+            "nombre": match['name'],
+            "id_estudiante": match['id'],
+            "confidence": match['confidence'],
+            "registrado": True,
+            "resultado": registro['resultado']
+        }
+
+    async def _reconocer(self, img_array: Any, device_id: str) -> Dict[str, Any]:
+        """Etapa reconocer en los procesos worker o en los threads del servidor"""
+        if self.inferencia is not None:
+            return await self.reconocer.ejecutar(self.inferencia.procesar_frame, img_array, device_id)
+        return await self._reconocer_en_lotes(img_array, device_id)
+
+    async def _reconocer_en_lotes(self, img_array: Any, device_id: str) -> Dict[str, Any]:
+        """Detección por frame en la etapa reconocer; los rostros por codificar esperan compañía"""
+        procesador, frame = await self.reconocer.ejecutar(
+            galerias_colegios.detectar, img_array, device_id
+        )
+        return await self._identificar(procesador, frame)
+
+    async def _reconocer_con_turno(self, img_array: Any, device_id: str) -> Dict[str, Any]:
+        """
+        _reconocer() dentro del turno DRR del dispositivo
+
+        El turno cubre solo la llamada por frame (detección o el proceso
+        worker) y se cobra su tiempo medido en el thread, sin la espera del
+        semáforo. La parte del lote del encoder se cobra al terminar el lote,
+        ya fuera del turno: así los frames que esperan compañía no ocupan
+        turnos y el lote no queda limitado a los threads de la etapa.
+        """
+        await self.planificador.adquirir(device_id)
+        costo_s = 0.0
+        try:
+            if self.inferencia is not None:
+                resultado, costo_s = await self.reconocer.ejecutar(
+                    _cronometrar, self.inferencia.procesar_frame, img_array, device_id
+                )
+                return resultado
+            (procesador, frame), costo_s = await self.reconocer.ejecutar(
+                _cronometrar, galerias_colegios.detectar, img_array, device_id
+            )
+        finally:
+            self.planificador.liberar(device_id, costo_s)
+
+        resultado = await self._identificar(procesador, frame)
+        self.planificador.cobrar(device_id, frame.costo_lote_s)
+        return resultado
+
+    async def _identificar(self, procesador: FaceRecognitionProcessor, frame: FrameDetectado) -> Dict[str, Any]:
+        """Resultado de un frame ya detectado: directo, o esperando el lote del encoder"""
+        if frame.resultado is not None:
+            return frame.resultado
+        if frame.pendientes:
+            return await self.lotes.enviar(procesador, frame)
+        # Todos los rostros rastreados o rechazados: no hay nada que codificar
+        return procesador.identificar_lote([frame], [[]])[0]
+
+    @staticmethod
+    def _registrar(id_estudiante: int, device_id: str) -> Optional[Dict[str, Any]]:
+        """Verifica el cooldown y registra la asistencia (None si está en cooldown)"""
+        if db.verificar_cooldown(id_estudiante, COOLDOWN_SECONDS):
+            return None
+        return db.registrar_asistencia(id_estudiante, device_id)
+
+    def estado(self) -> Dict[str, Any]:
+        """Frames en curso y en espera por etapa, lotes del encoder y procesos worker (para /api/metricas)"""
+        estado = {
+            **{
+                etapa.nombre: etapa.estado()
+                for etapa in (self.decodificar, self.reconocer, self.persistir)
+            },
+            "lotes": self.lotes.estado()
+        }
+        if self.inferencia is not None:
+            estado["workers_inferencia"] = self.inferencia.estado()
+        return estado
+
+    def cerrar(self) -> None:
+        """Espera a que terminen los frames en curso y libera los threads y procesos worker"""
+        for etapa in (self.decodificar, self.reconocer, self.persistir):
+            etapa.cerrar()
+        if self.inferencia is not None:
+            self.inferencia.cerrar()
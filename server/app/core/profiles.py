@@ -0,0 +1,96 @@
+"""
+profiles.py - Perfiles de reconocimiento por dispositivo
+Un perfil agrupa los parámetros que antes eran globales (modelo de detección,
+upsampling, ancho de la copia reducida y tolerancia) para que cada cámara use
+el más barato que le alcance
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping
+
+from app.config import (
+    FACE_DETECTION_MODEL,
+    FACE_TOLERANCE,
+    FRAME_RESIZE_WIDTH,
+    RECOGNITION_PROFILES,
+    DEFAULT_RECOGNITION_PROFILE
+)
+
+
+@dataclass(frozen=True)
+class PerfilReconocimiento:
+    """Parámetros de detección y comparación de un tipo de cámara"""
+
+    nombre: str
+    modelo: str = FACE_DETECTION_MODEL
+    upsample: int = 1
+    ancho_deteccion: int = FRAME_RESIZE_WIDTH
+    tolerancia: float = FACE_TOLERANCE
+
+    def __post_init__(self) -> None:
+        if self.modelo not in ("hog", "cnn"):
+            raise ValueError(f"Perfil '{self.nombre}': modelo debe ser 'hog' o 'cnn'")
+        if self.upsample < 0:
+            raise ValueError(f"Perfil '{self.nombre}': upsample debe ser mayor o igual a 0")
+        if self.ancho_deteccion < 0:
+            raise ValueError(f"Perfil '{self.nombre}': ancho debe ser mayor o igual a 0")
+        if not 0.0 <= self.tolerancia <= 1.0:
+            raise ValueError(f"Perfil '{self.nombre}': tolerancia debe estar entre 0.0 y 1.0")
+
+    def como_dict(self) -> Dict[str, Any]:
+        """Parámetros del perfil para las respuestas de la API"""
+        return {
+            "modelo": self.modelo,
+            "upsample": self.upsample,
+            "ancho": self.ancho_deteccion,
+            "tolerancia": self.tolerancia
+        }
+
+
+def cargar_perfiles(definiciones: Mapping[str, Mapping[str, Any]]) -> Dict[str, PerfilReconocimiento]:
+    """
+    Construye los perfiles incluidos más los definidos en RECOGNITION_PROFILES
+
+    Args:
+        definiciones: {nombre: {"modelo", "upsample", "ancho", "tolerancia"}};
+            los campos omitidos toman el valor global
+
+    Returns:
+        Dict {nombre: PerfilReconocimiento}
+
+    Raises:
+        ValueError: Si algún perfil tiene campos desconocidos o fuera de rango
+    """
+    perfiles = {
+        # Parámetros globales (comportamiento de siempre)
+        "default": PerfilReconocimiento("default"),
+        # Rostros grandes y cercanos (torniquete): sin upsampling, copia pequeña
+        "cercano": PerfilReconocimiento("cercano", modelo="hog", upsample=0, ancho_deteccion=320),
+        # Rostros pequeños y lejanos (auditorio): frame completo con upsampling
+        "amplio": PerfilReconocimiento("amplio", modelo="hog", upsample=1, ancho_deteccion=0),
+    }
+
+    for nombre, campos in definiciones.items():
+        desconocidos = set(campos) - {"modelo", "upsample", "ancho", "tolerancia"}
+        if desconocidos:
+            raise ValueError(f"Perfil '{nombre}': campos desconocidos {sorted(desconocidos)}")
+
+        base = perfiles.get(nombre, PerfilReconocimiento(nombre))
+        perfiles[nombre] = PerfilReconocimiento(
+            nombre,
+            modelo=campos.get("modelo", base.modelo),
+            upsample=int(campos.get("upsample", base.upsample)),
+            ancho_deteccion=int(campos.get("ancho", base.ancho_deteccion)),
+            tolerancia=float(campos.get("tolerancia", base.tolerancia))
+        )
+
+    return perfiles
+
+
+# Instancia global
+PERFILES = cargar_perfiles(RECOGNITION_PROFILES)
+
+if DEFAULT_RECOGNITION_PROFILE not in PERFILES:
+    raise ValueError(f"DEFAULT_RECOGNITION_PROFILE '{DEFAULT_RECOGNITION_PROFILE}' no es un perfil definido")
+
+PERFIL_POR_DEFECTO = PERFILES[DEFAULT_RECOGNITION_PROFILE]
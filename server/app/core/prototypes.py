@@ -0,0 +1,71 @@
+"""
+prototypes.py - Compresión de encodings por estudiante en prototipos
+Con varias fotos de referencia por estudiante, k-means sobre sus encodings
+deja un número fijo de filas por estudiante: la galería crece con la cantidad
+de estudiantes y no con la cantidad de fotos
+"""
+
+import numpy as np
+
+from app.core.ann_index import kmeans
+from app.core.gallery import ENCODING_DIM, Gallery
+
+
+def prototipos_estudiante(encodings: np.ndarray, k: int) -> np.ndarray:
+    """
+    Reduce los encodings de un estudiante a lo más `k` prototipos
+
+    Args:
+        encodings: Matriz (n, 128) con un encoding por foto
+        k: Máximo de prototipos (0 = sin compresión)
+
+    Returns:
+        Matriz (min(n, k), 128) float32; si n <= k se devuelven los encodings tal cual
+    """
+    encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+    if k <= 0 or len(encodings) <= k:
+        return encodings.copy()
+
+    return kmeans(encodings, k)
+
+
+def comprimir_galeria(gallery: Gallery, k: int) -> Gallery:
+    """
+    Comprime una galería de encodings por foto a prototipos por estudiante
+
+    Las filas resultantes conservan el id_estudiante, por lo que la búsqueda
+    sigue resolviendo cada rostro al estudiante en la misma pasada vectorizada.
+
+    Args:
+        gallery: Galería con una fila por foto de referencia
+        k: Prototipos por estudiante (0 = devolver la galería sin cambios)
+
+    Returns:
+        Nueva Gallery con a lo más k filas por estudiante
+
+    Example:
+        >>> compacta = comprimir_galeria(gallery_fotos, 3)
+        >>> len(compacta) <= 3 * len(set(gallery_fotos.ids))
+        True
+    """
+    if k <= 0 or len(gallery) == 0:
+        return gallery
+
+    orden = np.argsort(gallery.ids, kind='stable')
+    ids_ordenados = gallery.ids[orden]
+    inicios = np.flatnonzero(np.r_[True, ids_ordenados[1:] != ids_ordenados[:-1]])
+    finales = np.r_[inicios[1:], len(orden)]
+
+    encodings = []
+    ids = []
+    names = []
+
+    for inicio, fin in zip(inicios, finales):
+        filas = orden[inicio:fin]
+        prototipos = prototipos_estudiante(gallery.encodings[filas], k)
+        encodings.append(prototipos)
+        ids.extend([int(ids_ordenados[inicio])] * len(prototipos))
+        names.extend([gallery.names[filas[0]]] * len(prototipos))
+
+    return Gallery(np.concatenate(encodings), ids, names)
@@ -0,0 +1,123 @@
+"""
+quality.py - Filtro de calidad de rostros antes del encoder de 128-d
+Descarta rostros que nunca van a coincidir (muy pequeños, borrosos o muy
+girados) con pruebas de menor a mayor costo: tamaño de la caja, varianza del
+Laplaciano y pose según los 5 landmarks del modelo "small" de dlib
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import face_recognition
+import numpy as np
+from PIL import Image
+
+from app.core.detection import Ubicacion
+from app.config import (
+    QUALITY_MIN_FACE_PX,
+    QUALITY_MIN_SHARPNESS,
+    QUALITY_MAX_YAW,
+    QUALITY_MAX_ROLL_DEG
+)
+
+# Lado al que se lleva cada rostro antes de medir nitidez (la varianza del
+# Laplaciano depende de la escala: así es comparable entre rostros)
+LADO_NITIDEZ = 96
+
+
+@dataclass(frozen=True)
+class UmbralesCalidad:
+    """Límites de aceptación de un rostro"""
+
+    min_px: int = QUALITY_MIN_FACE_PX
+    min_nitidez: float = QUALITY_MIN_SHARPNESS
+    max_giro: float = QUALITY_MAX_YAW
+    max_inclinacion: float = QUALITY_MAX_ROLL_DEG
+
+
+def nitidez(image_array: np.ndarray, caja: Ubicacion) -> float:
+    """
+    Varianza del Laplaciano (4 vecinos) del rostro en gris a LADO_NITIDEZ px
+
+    Returns:
+        Valor alto = bordes marcados; bajo = rostro borroso o movido
+    """
+    top, right, bottom, left = caja
+    rostro = Image.fromarray(image_array[top:bottom, left:right]).convert("L")
+    gris = np.asarray(rostro.resize((LADO_NITIDEZ, LADO_NITIDEZ), Image.BILINEAR), dtype=np.float32)
+
+    laplaciano = (
+        gris[:-2, 1:-1] + gris[2:, 1:-1] + gris[1:-1, :-2] + gris[1:-1, 2:]
+        - 4.0 * gris[1:-1, 1:-1]
+    )
+    return float(laplaciano.var())
+
+
+def pose(landmarks: Dict[str, List[Tuple[int, int]]]) -> Tuple[float, float]:
+    """
+    Estima giro e inclinación a partir de ojos y punta de la nariz
+
+    Returns:
+        Tupla (giro, inclinación): giro = desplazamiento horizontal de la nariz
+        respecto del punto medio entre los ojos, relativo a la distancia entre
+        ojos (0 = de frente); inclinación = ángulo de la línea de los ojos en grados
+    """
+    ojo_izq = np.mean(landmarks["left_eye"], axis=0)
+    ojo_der = np.mean(landmarks["right_eye"], axis=0)
+    nariz = np.asarray(landmarks["nose_tip"][0], dtype=np.float64)
+
+    dx, dy = ojo_izq - ojo_der
+    distancia_ojos = math.hypot(dx, dy)
+    if distancia_ojos == 0:
+        return math.inf, 0.0
+
+    medio = (ojo_izq + ojo_der) / 2.0
+    giro = abs(nariz[0] - medio[0]) / distancia_ojos
+    inclinacion = abs(math.degrees(math.atan2(dy, dx)))
+    inclinacion = min(inclinacion, 180.0 - inclinacion)
+
+    return float(giro), inclinacion
+
+
+def evaluar(
+    image_array: np.ndarray,
+    ubicaciones: Sequence[Ubicacion],
+    umbrales: UmbralesCalidad = UmbralesCalidad()
+) -> List[Optional[str]]:
+    """
+    Revisa cada rostro detectado antes de codificarlo
+
+    Args:
+        image_array: Frame RGB en resolución completa
+        ubicaciones: Cajas (top, right, bottom, left) en coordenadas del frame
+        umbrales: Límites de aceptación
+
+    Returns:
+        Lista paralela a `ubicaciones` con None (rostro aceptado) o el motivo
+        del rechazo: "pequeno", "borroso" o "girado"
+
+    Example:
+        >>> evaluar(frame, [(40, 120, 160, 20), (300, 900, 330, 870)])
+        [None, 'pequeno']
+    """
+    motivos: List[Optional[str]] = [None] * len(ubicaciones)
+
+    for i, (top, right, bottom, left) in enumerate(ubicaciones):
+        if min(bottom - top, right - left) < umbrales.min_px:
+            motivos[i] = "pequeno"
+        elif nitidez(image_array, ubicaciones[i]) < umbrales.min_nitidez:
+            motivos[i] = "borroso"
+
+    # Los landmarks (dlib, 5 puntos) solo se calculan para los que pasaron lo anterior
+    pendientes = [i for i, motivo in enumerate(motivos) if motivo is None]
+    if pendientes:
+        landmarks = face_recognition.face_landmarks(
+            image_array, [ubicaciones[i] for i in pendientes], model="small"
+        )
+        for i, puntos in zip(pendientes, landmarks):
+            giro, inclinacion = pose(puntos)
+            if giro > umbrales.max_giro or inclinacion > umbrales.max_inclinacion:
+                motivos[i] = "girado"
+
+    return motivos
@@ -0,0 +1,123 @@
+"""
+quantization.py - Copia compacta de la galería para el filtrado grueso
+Guarda los encodings en float16 o int8 (escala por dimensión) para recorrer
+toda la galería con la mitad o un cuarto del ancho de banda de memoria; solo
+los mejores candidatos se re-rankean con la matriz float32 original
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+
+class GaleriaCompacta:
+    """Matriz reducida (float16 / int8) paralela a las filas de una Gallery"""
+
+    def __init__(self, gallery: Gallery, modo: str) -> None:
+        if modo not in ("float16", "int8"):
+            raise ValueError(f"Modo de precisión no soportado: {modo}")
+
+        self.modo = modo
+        self.escala: Optional[np.ndarray] = None
+
+        if modo == "float16":
+            self.codigos: np.ndarray = gallery.encodings.astype(np.float16)
+            aproximados = self.codigos.astype(np.float32)
+        else:
+            # Escala simétrica por dimensión: x ~ codigo * escala, codigo en [-127, 127]
+            maximo = np.abs(gallery.encodings).max(axis=0) if len(gallery) else np.ones(ENCODING_DIM)
+            self.escala = (np.maximum(maximo, 1e-12) / 127.0).astype(np.float32)
+            self.codigos = np.clip(
+                np.rint(gallery.encodings / self.escala), -127, 127
+            ).astype(np.int8)
+            aproximados = self.codigos.astype(np.float32) * self.escala
+
+        # Normas de los valores reconstruidos (coherentes con el producto aproximado)
+        self.norms_sq: np.ndarray = np.einsum('ij,ij->i', aproximados, aproximados)
+
+    def __len__(self) -> int:
+        return len(self.codigos)
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria ocupada por la matriz compacta y sus normas"""
+        return int(self.codigos.nbytes + self.norms_sq.nbytes)
+
+    def candidatos(
+        self,
+        queries: np.ndarray,
+        k: int,
+        bloque: int = 16384
+    ) -> np.ndarray:
+        """
+        Selecciona las `k` filas más cercanas a cada consulta con la distancia aproximada
+
+        La matriz se convierte a float32 por bloques, de modo que nunca se
+        materializa completa en precisión simple.
+
+        Returns:
+            Matriz (M, k') de índices de fila, con k' = min(k, N)
+        """
+        k = min(k, len(self))
+        # Con int8 la escala se aplica a la consulta: q·(c*s) = (q*s)·c
+        q = queries if self.escala is None else queries * self.escala
+
+        mejores_idx = np.empty((len(q), 0), dtype=np.intp)
+        mejores_d = np.empty((len(q), 0), dtype=np.float32)
+
+        for inicio in range(0, len(self), bloque):
+            parte = self.codigos[inicio:inicio + bloque].astype(np.float32)
+            parcial = self.norms_sq[np.newaxis, inicio:inicio + bloque] - 2.0 * (q @ parte.T)
+
+            k_bloque = min(k, parcial.shape[1])
+            if k_bloque < parcial.shape[1]:
+                top = np.argpartition(parcial, k_bloque - 1, axis=1)[:, :k_bloque]
+            else:
+                top = np.broadcast_to(np.arange(parcial.shape[1]), parcial.shape)
+
+            mejores_idx = np.concatenate([mejores_idx, top + inicio], axis=1)
+            mejores_d = np.concatenate([mejores_d, np.take_along_axis(parcial, top, axis=1)], axis=1)
+
+            # Conservar solo los k mejores acumulados
+            if mejores_idx.shape[1] > k:
+                sel = np.argpartition(mejores_d, k - 1, axis=1)[:, :k]
+                mejores_idx = np.take_along_axis(mejores_idx, sel, axis=1)
+                mejores_d = np.take_along_axis(mejores_d, sel, axis=1)
+
+        return mejores_idx
+
+    def buscar(
+        self,
+        gallery: Gallery,
+        queries: Sequence[np.ndarray],
+        k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filtrado grueso sobre la matriz compacta + re-rank exacto en float32
+
+        Args:
+            gallery: Galería original (float32) de la que se derivó esta copia
+            queries: Encodings consultados (M, 128)
+            k: Candidatos por consulta que se re-rankean en float32
+
+        Returns:
+            Tupla (indices, distancias), igual que Gallery.buscar
+        """
+        q = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+
+        if len(q) == 0 or len(self) == 0:
+            return gallery.buscar(q)
+
+        candidatos = self.candidatos(q, k)
+
+        # Re-rank exacto: solo se leen k filas float32 por consulta
+        filas = gallery.encodings[candidatos.ravel()].reshape(len(q), -1, ENCODING_DIM)
+        parcial = gallery.norms_sq[candidatos] - 2.0 * np.einsum('mkd,md->mk', filas, q)
+        mejor = np.argmin(parcial, axis=1)
+
+        indices = candidatos[np.arange(len(q)), mejor]
+        mejores = parcial[np.arange(len(q)), mejor] + np.einsum('ij,ij->i', q, q)
+
+        return indices, np.sqrt(np.maximum(mejores, 0.0))
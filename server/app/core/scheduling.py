@@ -0,0 +1,203 @@
+"""
+scheduling.py - Reparto justo del reconocimiento entre dispositivos (deficit round robin)
+El semáforo de una etapa atiende en orden de llegada: una cámara que envía
+frames muy seguido (CAPTURE_INTERVAL bajo) ocupa los workers y las demás
+salas esperan. Aquí cada dispositivo tiene su cola y un crédito (déficit)
+que crece en cada vuelta según su peso; un frame pasa cuando su dispositivo
+tiene crédito, y se le descuenta el tiempo de worker que realmente usó. Con
+sobrecarga, cada dispositivo recibe una fracción del tiempo de los workers
+proporcional a su peso (ej. mayor para la entrada principal)
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Tuple
+
+import numpy as np
+
+from app.core.metrics import metricas
+
+# Esperas recientes guardadas por dispositivo (para los percentiles)
+_VENTANA_ESPERAS = 200
+
+# Peso de la última muestra en el promedio móvil del costo por frame
+_ALFA_COSTO = 0.2
+
+# Menor peso usado en las vueltas: con peso 0, negativo o NaN el déficit no
+# crecería nunca y _despachar no terminaría
+_PESO_MINIMO = 0.01
+
+
+def _peso_valido(peso: float) -> float:
+    """El peso, o _PESO_MINIMO si no es un número positivo (NaN incluido)"""
+    return peso if peso > _PESO_MINIMO else _PESO_MINIMO
+
+
+@dataclass
+class ColaDispositivo:
+    """Frames en espera y crédito de un dispositivo"""
+
+    peso: float
+    esperando: Deque[Tuple["asyncio.Future[None]", float]] = field(default_factory=deque)
+    # Segundos de worker que el dispositivo puede usar antes de ceder el turno
+    deficit: float = 0.0
+    # Costo estimado de un frame (promedio móvil, s): se cobra al despachar y se corrige al terminar
+    costo_estimado: float = 0.0
+    en_curso: int = 0
+    atendidos: int = 0
+    servicio_s: float = 0.0
+    esperas_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=_VENTANA_ESPERAS))
+
+
+class PlanificadorDRR:
+    """Deficit round robin por dispositivo sobre `capacidad` workers (vive en el event loop)"""
+
+    def __init__(self, capacidad: int, quantum_s: float, peso: Callable[[str], float]) -> None:
+        """
+        Args:
+            capacidad: Frames que pueden estar reconociéndose a la vez (workers de la etapa)
+            quantum_s: Crédito que recibe un dispositivo de peso 1 en cada vuelta
+            peso: Función device_id -> peso actual del dispositivo
+        """
+        self.capacidad = capacidad
+        self.quantum_s = quantum_s
+        self.peso = peso
+
+        self._colas: Dict[str, ColaDispositivo] = {}
+        # Dispositivos con frames en espera, en orden de turno
+        self._activos: Deque[str] = deque()
+        self.en_curso = 0
+
+    async def adquirir(self, device_id: str) -> None:
+        """
+        Espera el turno del dispositivo; al volver, el frame ocupa un worker
+
+        Cada llamada que retorna debe cerrarse con liberar(device_id, costo_s).
+        """
+        peso = _peso_valido(self.peso(device_id))
+        cola = self._colas.get(device_id)
+        if cola is None:
+            cola = self._colas[device_id] = ColaDispositivo(peso)
+        cola.peso = peso
+
+        if self.en_curso < self.capacidad and not self._activos:
+            # Sin competencia: pasa de inmediato
+            self._otorgar(cola, 0.0)
+            return
+
+        futuro: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        if not cola.esperando:
+            # El crédito acumulado mientras no esperaba no se conserva (sí la deuda)
+            cola.deficit = min(cola.deficit, 0.0)
+            self._activos.append(device_id)
+        cola.esperando.append((futuro, time.perf_counter()))
+        self._despachar()
+
+        try:
+            await futuro
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                # Ya tenía el worker asignado: se devuelve sin costo
+                self.liberar(device_id, 0.0)
+            else:
+                self._quitar(device_id, futuro)
+            raise
+
+    def liberar(self, device_id: str, costo_s: float) -> None:
+        """
+        Devuelve el worker y cobra al dispositivo el tiempo que realmente usó
+
+        Args:
+            device_id: Dispositivo del frame
+            costo_s: Segundos que el frame ocupó el worker
+        """
+        cola = self._colas[device_id]
+        cola.en_curso -= 1
+        self.en_curso -= 1
+
+        # Al despachar se cobró el costo estimado: se corrige con el real
+        cola.deficit -= costo_s - cola.costo_estimado
+        cola.costo_estimado = (
+            costo_s if cola.costo_estimado == 0.0
+            else (1 - _ALFA_COSTO) * cola.costo_estimado + _ALFA_COSTO * costo_s
+        )
+        cola.servicio_s += costo_s
+
+        self._despachar()
+
+    def cobrar(self, device_id: str, costo_s: float) -> None:
+        """
+        Cobra al dispositivo trabajo hecho después de liberar el turno
+
+        Args:
+            device_id: Dispositivo del frame
+            costo_s: Segundos de su parte de un lote del encoder
+        """
+        cola = self._colas[device_id]
+        cola.deficit -= costo_s
+        cola.servicio_s += costo_s
+
+    def _despachar(self) -> None:
+        """Asigna los workers libres recorriendo los dispositivos activos en orden DRR"""
+        while self.en_curso < self.capacidad and self._activos:
+            device_id = self._activos[0]
+            cola = self._colas[device_id]
+
+            # Frames cuyo cliente se desconectó mientras esperaban
+            while cola.esperando and cola.esperando[0][0].done():
+                cola.esperando.popleft()
+            if not cola.esperando:
+                self._activos.popleft()
+                continue
+
+            if cola.deficit <= 0:
+                # Sin crédito: recibe su quantum y pasa al final de la vuelta
+                cola.deficit += self.quantum_s * _peso_valido(cola.peso)
+                self._activos.rotate(-1)
+                continue
+
+            futuro, encolado = cola.esperando.popleft()
+            if not cola.esperando:
+                self._activos.popleft()
+            self._otorgar(cola, (time.perf_counter() - encolado) * 1000)
+            futuro.set_result(None)
+
+    def _otorgar(self, cola: ColaDispositivo, espera_ms: float) -> None:
+        cola.en_curso += 1
+        cola.atendidos += 1
+        cola.deficit -= cola.costo_estimado
+        cola.esperas_ms.append(espera_ms)
+        self.en_curso += 1
+        metricas.registrar_tiempo("cola_planificador", espera_ms)
+
+    def _quitar(self, device_id: str, futuro: "asyncio.Future[None]") -> None:
+        """Saca de la cola un frame cancelado antes de recibir el turno"""
+        cola = self._colas[device_id]
+        cola.esperando = deque(par for par in cola.esperando if par[0] is not futuro)
+        if not cola.esperando and device_id in self._activos:
+            self._activos.remove(device_id)
+
+    def estado(self) -> Dict[str, Any]:
+        """Cola, espera y fracción del tiempo de worker por dispositivo (para /api/metricas)"""
+        total_s = sum(cola.servicio_s for cola in self._colas.values())
+        dispositivos = {}
+        for device_id, cola in self._colas.items():
+            esperas = np.asarray(cola.esperas_ms)
+            dispositivos[device_id] = {
+                "peso": cola.peso,
+                "en_cola": len(cola.esperando),
+                "en_curso": cola.en_curso,
+                "atendidos": cola.atendidos,
+                "espera_p50_ms": round(float(np.percentile(esperas, 50)), 2) if len(esperas) else 0.0,
+                "espera_p95_ms": round(float(np.percentile(esperas, 95)), 2) if len(esperas) else 0.0,
+                "cuota_servicio": round(cola.servicio_s / total_s, 3) if total_s > 0 else 0.0
+            }
+
+        return {
+            "capacidad": self.capacidad,
+            "en_curso": self.en_curso,
+            "quantum_ms": round(self.quantum_s * 1000, 2),
+            "dispositivos": dispositivos
+        }
@@ -0,0 +1,46 @@
+"""
+snapshot.py - Snapshot inmutable de la galería publicada
+Agrupa galería, índice ANN, copia compacta y sub-galerías por sala en un solo
+objeto que se reemplaza de una vez: cada frame toma una referencia al inicio y
+termina con esa misma versión aunque en paralelo se publique una galería nueva
+"""
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from app.core.ann_index import IVFIndex
+from app.core.gallery import Gallery
+from app.core.quantization import GaleriaCompacta
+
+
+@dataclass(frozen=True)
+class GallerySnapshot:
+    """Versión publicada de la galería (solo lectura)"""
+
+    gallery: Gallery
+    ann_index: Optional[IVFIndex] = None
+    compacta: Optional[GaleriaCompacta] = None
+    rosters: Mapping[str, Gallery] = field(default_factory=lambda: MappingProxyType({}))
+    version: int = 0
+    cargada: bool = False
+
+    @property
+    def nbytes(self) -> int:
+        """Memoria aproximada de la galería y todas sus estructuras derivadas"""
+        total = self.gallery.nbytes + sum(roster.nbytes for roster in self.rosters.values())
+        if self.ann_index is not None:
+            total += self.ann_index.nbytes
+        if self.compacta is not None:
+            total += self.compacta.nbytes
+        return total
+
+    @property
+    def bytes_residentes(self) -> int:
+        """Como nbytes, pero sin la galería abierta con np.memmap (índice, copia compacta y rosters sí cuentan)"""
+        total = self.gallery.bytes_residentes + sum(roster.bytes_residentes for roster in self.rosters.values())
+        if self.ann_index is not None:
+            total += self.ann_index.nbytes
+        if self.compacta is not None:
+            total += self.compacta.nbytes
+        return total
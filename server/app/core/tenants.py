@@ -0,0 +1,326 @@
+"""
+tenants.py - Galerías por colegio con cache LRU acotado por memoria
+Cada colegio tiene su propia galería en disco (TENANTS_DIR/<id_colegio>/) y
+solo se carga cuando llega un frame o un enrolamiento de ese colegio; los
+colegios inactivos se descargan cuando se supera TENANT_CACHE_MB
+"""
+
+import logging
+import math
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.detection import Roi
+from app.core.face_recognition import FaceRecognitionProcessor, FrameDetectado, face_recognition_processor
+from app.core.frame_cache import cache_frames
+from app.core.profiles import PERFILES
+from app.config import GALLERY_FILE, TENANTS_DIR, TENANT_CACHE_MB
+
+logger = logging.getLogger(__name__)
+
+
+class GaleriasColegios:
+    """Enruta cada dispositivo a la galería de su colegio (LRU por memoria)"""
+
+    def __init__(
+        self,
+        procesador_global: FaceRecognitionProcessor,
+        directorio: Path,
+        presupuesto_bytes: int
+    ) -> None:
+        """
+        Args:
+            procesador_global: Galería de estudiantes y dispositivos sin colegio
+            directorio: Carpeta con una subcarpeta por id_colegio
+            presupuesto_bytes: Memoria máxima de las galerías de colegios cargadas
+        """
+        self.procesador_global = procesador_global
+        self.directorio = directorio
+        self.presupuesto_bytes = presupuesto_bytes
+
+        # id_colegio -> procesador, del usado hace más tiempo al más reciente
+        self._cargados: "OrderedDict[int, FaceRecognitionProcessor]" = OrderedDict()
+        # Todos los procesadores vivos, también los desalojados que siguen en
+        # uso (un enrolamiento o un frame en curso): se reutilizan si se vuelve
+        # a pedir su colegio, así nunca hay dos escribiendo la misma galería
+        self._vivos: "weakref.WeakValueDictionary[int, FaceRecognitionProcessor]" = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+        # Desde la BD: {device_id: id_colegio}, {device_id: [id_estudiante, ...]},
+        # {device_id: (x, y, ancho, alto)} con la región de interés de la cámara,
+        # {device_id: nombre del perfil de reconocimiento} y {device_id: peso}
+        # en el reparto del reconocimiento (scheduling.py)
+        self.colegio_por_dispositivo: Dict[str, int] = {}
+        self.rosters_ids: Dict[str, List[int]] = {}
+        self.roi_por_dispositivo: Dict[str, Roi] = {}
+        self.perfil_por_dispositivo: Dict[str, str] = {}
+        self.peso_por_dispositivo: Dict[str, float] = {}
+        # Aumenta con cada cambio de los datos anteriores (los workers de
+        # inferencia en otros procesos se resincronizan al verlo cambiar)
+        self.generacion = 0
+
+        self.cargas = 0
+        self.desalojos = 0
+
+    def cargar_dispositivos(
+        self,
+        colegios_db: Dict[str, int],
+        rosters_db: Dict[str, List[int]],
+        rois_db: Optional[Dict[str, Roi]] = None,
+        perfiles_db: Optional[Dict[str, str]] = None,
+        pesos_db: Optional[Dict[str, float]] = None
+    ) -> None:
+        """
+        Actualiza el colegio, el roster, la región de interés, el perfil y el peso de cada dispositivo
+
+        Args:
+            colegios_db: Dict {device_id: id_colegio} desde la BD
+            rosters_db: Dict {device_id: [id_estudiante, ...]} desde la BD
+            rois_db: Dict {device_id: (x, y, ancho, alto)} desde la BD
+                (None = conservar las ROI actuales)
+            perfiles_db: Dict {device_id: perfil} desde la BD
+                (None = conservar los perfiles actuales)
+            pesos_db: Dict {device_id: peso} desde la BD
+                (None = conservar los pesos actuales)
+        """
+        self.colegio_por_dispositivo = colegios_db
+        self.rosters_ids = rosters_db
+        if rois_db is not None:
+            self.roi_por_dispositivo = rois_db
+        if perfiles_db is not None:
+            desconocidos = {d: p for d, p in perfiles_db.items() if p not in PERFILES}
+            for device_id, perfil in desconocidos.items():
+                logger.warning(f"Perfil '{perfil}' del dispositivo {device_id} no existe; se usa el perfil por defecto")
+            self.perfil_por_dispositivo = {d: p for d, p in perfiles_db.items() if p in PERFILES}
+        if pesos_db is not None:
+            invalidos = {d: p for d, p in pesos_db.items() if not (math.isfinite(p) and p > 0)}
+            for device_id, peso in invalidos.items():
+                logger.warning(f"Peso {peso} del dispositivo {device_id} no es positivo; se usa el peso por defecto (1)")
+            self.peso_por_dispositivo = {d: p for d, p in pesos_db.items() if d not in invalidos}
+        self.generacion += 1
+
+        self.procesador_global.cargar_rosters(self._rosters_colegio(None))
+
+        with self._lock:
+            cargados = list(self._cargados.items())
+        for id_colegio, procesador in cargados:
+            procesador.cargar_rosters(self._rosters_colegio(id_colegio))
+
+    def procesador_dispositivo(self, device_id: Optional[str]) -> FaceRecognitionProcessor:
+        """Procesador de la galería del colegio dueño del dispositivo (o el global)"""
+        id_colegio = self.colegio_por_dispositivo.get(device_id) if device_id else None
+        return self.procesador_colegio(id_colegio)
+
+    def galeria_dispositivo(self, device_id: Optional[str]) -> Optional[Path]:
+        """Directorio de la galería que usa el dispositivo, sin cargarla (None = galería global)"""
+        id_colegio = self.colegio_por_dispositivo.get(device_id) if device_id else None
+        return None if id_colegio is None else self.directorio / str(id_colegio)
+
+    def procesador_colegio(self, id_colegio: Optional[int]) -> FaceRecognitionProcessor:
+        """
+        Obtiene el procesador de un colegio, cargando su galería si no está en memoria
+
+        Args:
+            id_colegio: ID del colegio (None = galería global)
+
+        Returns:
+            FaceRecognitionProcessor del colegio, marcado como el más reciente
+
+        Note:
+            La carga (abrir la galería e índices) se hace fuera del lock: un
+            colegio que se está cargando no bloquea los frames de los demás.
+        """
+        if id_colegio is None:
+            return self.procesador_global
+
+        with self._lock:
+            procesador = self._reutilizar(id_colegio)
+            if procesador is not None:
+                return procesador
+
+        logger.info(f"Cargando galería del colegio {id_colegio}...")
+        nuevo = FaceRecognitionProcessor(self.directorio / str(id_colegio))
+        nuevo.cargar_rosters(self._rosters_colegio(id_colegio))
+
+        with self._lock:
+            # Otro thread pudo cargarlo mientras tanto
+            procesador = self._reutilizar(id_colegio)
+            if procesador is not None:
+                return procesador
+
+            self._cargados[id_colegio] = nuevo
+            self._vivos[id_colegio] = nuevo
+            self.cargas += 1
+            self._desalojar()
+
+        return nuevo
+
+    def _reutilizar(self, id_colegio: int) -> Optional[FaceRecognitionProcessor]:
+        """Procesador cargado o todavía en uso del colegio, marcado como el más reciente (con el lock tomado)"""
+        procesador = self._cargados.get(id_colegio)
+        if procesador is not None:
+            self._cargados.move_to_end(id_colegio)
+            return procesador
+
+        procesador = self._vivos.get(id_colegio)
+        if procesador is not None:
+            # Desalojado pero en uso: vuelve al LRU con sus datos al día
+            self._cargados[id_colegio] = procesador
+            self._desalojar()
+        return procesador
+
+    def actualizar_roi(self, device_id: str, roi: Optional[Roi]) -> None:
+        """Cambia la región de interés de un dispositivo (None = frame completo)"""
+        rois = dict(self.roi_por_dispositivo)
+        if roi is None:
+            rois.pop(device_id, None)
+        else:
+            rois[device_id] = roi
+        # Se reemplaza el dict completo: los frames en curso no lo ven a medio cambiar
+        self.roi_por_dispositivo = rois
+        self.generacion += 1
+        cache_frames.invalidar(device_id)
+
+    def actualizar_perfil(self, device_id: str, perfil: Optional[str]) -> None:
+        """Cambia el perfil de reconocimiento de un dispositivo (None = perfil por defecto)"""
+        perfiles = dict(self.perfil_por_dispositivo)
+        if perfil is None:
+            perfiles.pop(device_id, None)
+        else:
+            perfiles[device_id] = perfil
+        self.perfil_por_dispositivo = perfiles
+        self.generacion += 1
+        cache_frames.invalidar(device_id)
+
+    def actualizar_peso(self, device_id: str, peso: Optional[float]) -> None:
+        """Cambia el peso de un dispositivo en el reparto del reconocimiento (None = 1)"""
+        pesos = dict(self.peso_por_dispositivo)
+        if peso is None:
+            pesos.pop(device_id, None)
+        else:
+            pesos[device_id] = peso
+        self.peso_por_dispositivo = pesos
+
+    def configuracion_dispositivos(
+        self
+    ) -> Tuple[Dict[str, int], Dict[str, List[int]], Dict[str, Roi], Dict[str, str]]:
+        """Argumentos de cargar_dispositivos() que reproducen la configuración actual"""
+        return (
+            self.colegio_por_dispositivo,
+            self.rosters_ids,
+            self.roi_por_dispositivo,
+            self.perfil_por_dispositivo
+        )
+
+    def recargar_galerias(self, directorios: Iterable[Optional[Path]]) -> None:
+        """
+        Vuelve a abrir desde disco las galerías indicadas que estén en memoria
+
+        Args:
+            directorios: Directorio de cada galería modificada (None = global);
+                las de colegios que no están cargados se abrirán al día bajo demanda
+        """
+        modificadas = set(directorios)
+        with self._lock:
+            procesadores = [self.procesador_global, *self._vivos.values()]
+        for procesador in procesadores:
+            if procesador.directorio in modificadas:
+                procesador.cargar_encodings(modificada=True)
+
+    def procesar_frame(self, image_array: Any, device_id: Optional[str] = None) -> Dict[str, Any]:
+        """Procesa un frame con la galería del colegio del dispositivo (y su ROI y perfil)"""
+        roi = self.roi_por_dispositivo.get(device_id) if device_id else None
+        perfil = PERFILES.get(self.perfil_por_dispositivo.get(device_id)) if device_id else None
+        return self.procesador_dispositivo(device_id).procesar_frame(image_array, device_id, roi, perfil)
+
+    def detectar(
+        self,
+        image_array: Any,
+        device_id: Optional[str] = None
+    ) -> Tuple[FaceRecognitionProcessor, FrameDetectado]:
+        """
+        Detección del frame con la galería, ROI y perfil del dispositivo
+
+        Returns:
+            Tupla (procesador del colegio, frame detectado): el procesador es
+            el que debe resolver sus identidades en identificar_lote()
+        """
+        roi = self.roi_por_dispositivo.get(device_id) if device_id else None
+        perfil = PERFILES.get(self.perfil_por_dispositivo.get(device_id)) if device_id else None
+        procesador = self.procesador_dispositivo(device_id)
+        return procesador, procesador.detectar(image_array, device_id, roi, perfil)
+
+    def generar_encodings_desde_fotos(self, estudiantes_db: List[Dict[str, Any]]) -> None:
+        """
+        Regenera la galería de cada colegio con sus propios estudiantes
+
+        Un colegio que ya no tiene estudiantes (el último se eliminó o cambió
+        de colegio) pero sí galería en memoria o en disco queda con la galería
+        vacía: si no, seguiría reconociendo a los estudiantes que ya no tiene.
+
+        Args:
+            estudiantes_db: Estudiantes desde la BD (con 'id_colegio')
+        """
+        por_colegio: Dict[Optional[int], List[Dict[str, Any]]] = {}
+        for estudiante in estudiantes_db:
+            por_colegio.setdefault(estudiante.get('id_colegio'), []).append(estudiante)
+
+        for id_colegio, estudiantes in por_colegio.items():
+            self.procesador_colegio(id_colegio).generar_encodings_desde_fotos(estudiantes)
+
+        for id_colegio in self._colegios_con_galeria() - set(por_colegio):
+            procesador = self.procesador_colegio(id_colegio)
+            if len(procesador.gallery) > 0:
+                procesador.vaciar_galeria()
+
+    def _colegios_con_galeria(self) -> Set[Optional[int]]:
+        """Colegios en memoria o con galería en disco, más la galería global (None)"""
+        with self._lock:
+            colegios: Set[Optional[int]] = {None, *self._cargados.keys(), *self._vivos.keys()}
+        if self.directorio.is_dir():
+            colegios.update(
+                int(carpeta.name) for carpeta in self.directorio.iterdir()
+                if carpeta.name.isdigit() and (carpeta / GALLERY_FILE.name).exists()
+            )
+        return colegios
+
+    def _desalojar(self) -> None:
+        """Descarga los colegios usados hace más tiempo hasta cumplir el presupuesto (con el lock tomado)"""
+        while len(self._cargados) > 1 and self._memoria() > self.presupuesto_bytes:
+            id_colegio, _ = self._cargados.popitem(last=False)
+            self.desalojos += 1
+            logger.info(f"Galería del colegio {id_colegio} descargada de memoria (LRU)")
+
+    def _memoria(self) -> int:
+        # Sin la galería mapeada con np.memmap (page cache, la libera el sistema)
+        return sum(procesador.snapshot.bytes_residentes for procesador in self._cargados.values())
+
+    def _rosters_colegio(self, id_colegio: Optional[int]) -> Dict[str, List[int]]:
+        """Rosters de los dispositivos de un colegio (None = dispositivos sin colegio)"""
+        return {
+            device_id: ids
+            for device_id, ids in self.rosters_ids.items()
+            if self.colegio_por_dispositivo.get(device_id) == id_colegio
+        }
+
+    def estado(self) -> Dict[str, Any]:
+        """Colegios en memoria y uso del presupuesto (para /api/health)"""
+        with self._lock:
+            return {
+                "cargados": list(self._cargados.keys()),
+                "memoria_mb": round(self._memoria() / 1024 / 1024, 2),
+                "presupuesto_mb": round(self.presupuesto_bytes / 1024 / 1024, 2),
+                "cargas": self.cargas,
+                "desalojos": self.desalojos
+            }
+
+
+# Instancia global
+galerias_colegios = GaleriasColegios(
+    face_recognition_processor,
+    TENANTS_DIR,
+    TENANT_CACHE_MB * 1024 * 1024
+)
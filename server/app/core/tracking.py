@@ -0,0 +1,213 @@
+"""
+tracking.py - Seguimiento de rostros entre frames consecutivos de un dispositivo
+Un estudiante parado en la puerta aparece en muchos frames seguidos: si su caja
+se superpone (IoU) con una pista ya identificada con confianza, se reutiliza la
+identidad sin volver a calcular el encoding de 128-d ni consultar el cooldown en
+la BD. La identidad se vuelve a verificar cada TRACK_REVERIFY_SECONDS y la pista
+se descarta si el rostro deja de verse por TRACK_LOST_SECONDS
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from app.core.detection import Ubicacion
+from app.config import (
+    TRACK_IOU_THRESHOLD,
+    TRACK_REVERIFY_SECONDS,
+    TRACK_LOST_SECONDS,
+    TRACK_CONFIDENT_DISTANCE
+)
+
+# (id_estudiante, nombre, distancia), igual que FaceRecognitionProcessor.identificar
+Identidad = Tuple[int, str, float]
+
+
+@dataclass
+class Pista:
+    """Un rostro seguido a lo largo de los frames de un dispositivo"""
+
+    caja: Ubicacion
+    vista: float
+    identidad: Optional[Identidad] = None
+    verificada: float = 0.0
+    # La asistencia de esta identidad ya se registró (o estaba en cooldown)
+    registrada: bool = False
+
+
+def iou(a: Ubicacion, b: Ubicacion) -> float:
+    """Intersección sobre unión de dos cajas (top, right, bottom, left)"""
+    alto = min(a[2], b[2]) - max(a[0], b[0])
+    ancho = min(a[1], b[1]) - max(a[3], b[3])
+    if alto <= 0 or ancho <= 0:
+        return 0.0
+
+    interseccion = alto * ancho
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return interseccion / float(area_a + area_b - interseccion)
+
+
+class Rastreador:
+    """Pistas de rostros por dispositivo, emparejadas por IoU (seguro entre threads)"""
+
+    def __init__(
+        self,
+        iou_minimo: float,
+        reverificar_s: float,
+        perdida_s: float,
+        distancia_confiable: float
+    ) -> None:
+        """
+        Args:
+            iou_minimo: Superposición mínima para considerar que es el mismo rostro
+            reverificar_s: Segundos tras los cuales se vuelve a codificar el rostro
+            perdida_s: Segundos sin ver el rostro para descartar la pista
+            distancia_confiable: Distancia máxima para reutilizar una identidad
+        """
+        self.iou_minimo = iou_minimo
+        self.reverificar_s = reverificar_s
+        self.perdida_s = perdida_s
+        self.distancia_confiable = distancia_confiable
+
+        self._pistas: Dict[str, List[Pista]] = {}
+        # Galería con la que se identificaron las pistas de cada dispositivo
+        self._galerias: Dict[str, Hashable] = {}
+        self._lock = threading.Lock()
+
+    def asociar(
+        self,
+        device_id: str,
+        ubicaciones: List[Ubicacion],
+        galeria: Hashable = None
+    ) -> List[Pista]:
+        """
+        Empareja las cajas de un frame con las pistas vivas del dispositivo
+
+        Los pares se asignan de mayor a menor IoU (cada pista a una sola caja);
+        las cajas sin pareja abren una pista nueva, sin identidad.
+
+        Args:
+            device_id: Dispositivo que envió el frame
+            ubicaciones: Cajas detectadas en el frame
+            galeria: Galería que identifica al dispositivo (directorio, None = global);
+                si cambió desde el frame anterior sus pistas se descartan
+
+        Returns:
+            Lista de pistas paralela a `ubicaciones`
+        """
+        ahora = time.monotonic()
+
+        with self._lock:
+            if self._galerias.get(device_id, galeria) != galeria:
+                self._pistas.pop(device_id, None)
+
+            vivas = [
+                pista for pista in self._pistas.get(device_id, [])
+                if ahora - pista.vista <= self.perdida_s
+            ]
+
+            pares = sorted(
+                (
+                    (iou(pista.caja, caja), i, j)
+                    for i, pista in enumerate(vivas)
+                    for j, caja in enumerate(ubicaciones)
+                ),
+                reverse=True
+            )
+
+            asignadas: List[Optional[Pista]] = [None] * len(ubicaciones)
+            usadas = set()
+            for valor, i, j in pares:
+                if valor < self.iou_minimo:
+                    break
+                if i in usadas or asignadas[j] is not None:
+                    continue
+                usadas.add(i)
+                asignadas[j] = vivas[i]
+
+            resultado: List[Pista] = []
+            for caja, pista in zip(ubicaciones, asignadas):
+                if pista is None:
+                    pista = Pista(caja, ahora)
+                else:
+                    pista.caja = caja
+                    pista.vista = ahora
+                resultado.append(pista)
+
+            # Las pistas no vistas en este frame se conservan hasta vencer
+            pendientes = [pista for i, pista in enumerate(vivas) if i not in usadas]
+            if resultado or pendientes:
+                self._pistas[device_id] = resultado + pendientes
+                self._galerias[device_id] = galeria
+            else:
+                self._pistas.pop(device_id, None)
+                self._galerias.pop(device_id, None)
+
+        return resultado
+
+    def vigente(self, pista: Pista) -> Optional[Identidad]:
+        """Identidad de la pista si todavía no toca re-verificarla (None = hay que codificar)"""
+        if pista.identidad is not None and time.monotonic() - pista.verificada < self.reverificar_s:
+            return pista.identidad
+        return None
+
+    def verificar(self, pista: Pista, identidad: Optional[Identidad], tolerancia: float) -> None:
+        """
+        Guarda el resultado de codificar y comparar el rostro de la pista
+
+        Solo se conserva una identidad con distancia dentro de la tolerancia
+        y de TRACK_CONFIDENT_DISTANCE; si no, el rostro se vuelve a codificar
+        en el siguiente frame.
+        """
+        limite = min(tolerancia, self.distancia_confiable)
+        nueva = identidad if identidad is not None and identidad[2] <= limite else None
+
+        with self._lock:
+            if nueva is None or pista.identidad is None or nueva[0] != pista.identidad[0]:
+                pista.registrada = False
+            pista.identidad = nueva
+            pista.verificada = time.monotonic()
+
+    def marcar_registrada(self, device_id: str, id_estudiante: int) -> None:
+        """Indica que la asistencia del estudiante ya quedó en la BD (registro o cooldown)"""
+        with self._lock:
+            for pista in self._pistas.get(device_id, []):
+                if pista.identidad is not None and pista.identidad[0] == id_estudiante:
+                    pista.registrada = True
+
+    def registrada(self, device_id: str, id_estudiante: int) -> bool:
+        """True si una pista viva del dispositivo ya registró a este estudiante"""
+        with self._lock:
+            return any(
+                pista.registrada and pista.identidad is not None and pista.identidad[0] == id_estudiante
+                for pista in self._pistas.get(device_id, [])
+            )
+
+    def limpiar(self) -> None:
+        """Descarta todas las pistas"""
+        with self._lock:
+            self._pistas.clear()
+            self._galerias.clear()
+
+    def limpiar_galeria(self, galeria: Hashable) -> None:
+        """Descarta las pistas de los dispositivos identificados con esa galería (ej. al publicarla de nuevo)"""
+        with self._lock:
+            for device_id in [d for d, g in self._galerias.items() if g == galeria]:
+                self._pistas.pop(device_id, None)
+                del self._galerias[device_id]
+
+    def estado(self) -> Dict[str, Any]:
+        """Pistas activas por dispositivo (para /api/metricas)"""
+        with self._lock:
+            return {device_id: len(pistas) for device_id, pistas in self._pistas.items()}
+
+
+# Instancia global
+rastreador = Rastreador(
+    TRACK_IOU_THRESHOLD,
+    TRACK_REVERIFY_SECONDS,
+    TRACK_LOST_SECONDS,
+    TRACK_CONFIDENT_DISTANCE
+)
@@ -12,6 +12,9 @@ import uvicorn
 import os
 import re
 import asyncio
+import base64
+import tempfile
+import time
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Optional, List
@@ -29,21 +32,33 @@ from app.config import (
     SERVER_HOST,
     SERVER_PORT,
     ALLOWED_ORIGINS,
-    COOLDOWN_SECONDS,
     PHOTOS_DIR,
     RATE_LIMIT_PROCESS_FRAME,
     RATE_LIMIT_READ,
     RATE_LIMIT_WRITE,
+    RATE_LIMIT_AUDIT,
     ASYNC_WORKERS,
     APP_NAME,
     APP_VERSION,
     APP_DESCRIPTION,
     LOG_LEVEL,
     LOG_FORMAT,
-    MAX_VIEWERS_PER_DEVICE
+    MAX_VIEWERS_PER_DEVICE,
+    MAX_PHOTO_SIZE_BYTES,
+    DUPLICATE_THRESHOLD
 )
 from app.core.database import db
+from app.core.enrollment import preparar_multiproceso
 from app.core.face_recognition import face_recognition_processor
+from app.core.tenants import galerias_colegios
+from app.core.metrics import metricas
+from app.core.pipeline import PipelineFrames, ErrorDecodificacion
+from app.core.tracking import rastreador
+from app.core.motion import detector_movimiento
+from app.core.frame_cache import cache_frames
+from app.models.frame import FrameRequest
+from app.models.device import RoiRequest, PerfilRequest, PesoRequest
+from app.core.profiles import PERFILES, PERFIL_POR_DEFECTO
 
 # ====================================
 # CONFIGURACIÓN DE LOGGING
@@ -68,15 +83,30 @@ async def lifespan(app: FastAPI):
     # STARTUP
     logger.info(f"Iniciando {APP_NAME} v{APP_VERSION}...")
 
-    # Verificar si hay encodings cargados
+    # Proceso del que salen los workers de enrolamiento e inferencia
+    preparar_multiproceso()
+
+    # Cargar colegio, roster por sala, ROI y perfil de cada dispositivo (dispositivo -> curso -> estudiantes)
+    galerias_colegios.cargar_dispositivos(
+        db.obtener_colegios_dispositivos(),
+        db.obtener_rosters_dispositivos(),
+        db.obtener_roi_dispositivos(),
+        db.obtener_perfiles_dispositivos(),
+        db.obtener_pesos_dispositivos()
+    )
+
+    # Verificar si hay encodings cargados (las galerías de colegios se cargan bajo demanda)
     if not face_recognition_processor.encodings_loaded:
         logger.warning("Encodings no cargados. Generando desde fotos...")
-        estudiantes = db.obtener_estudiantes()
+        estudiantes = [e for e in db.obtener_estudiantes() if e.get('id_colegio') is None]
         if estudiantes:
             face_recognition_processor.generar_encodings_desde_fotos(estudiantes)
         else:
             logger.warning("No hay estudiantes en la base de datos")
 
+    # Procesos worker de inferencia (INFERENCE_BACKEND=processes): con las galerías ya cargadas
+    pipeline.iniciar()
+
     logger.info(f"Servidor listo - ThreadPoolExecutor con {ASYNC_WORKERS} workers")
 
     yield  # Aquí corre la aplicación
@@ -101,8 +131,9 @@ async def lifespan(app: FastAPI):
                 pass
         logger.info(f"Viewers cerrados para {device_id}")
 
-    # Cerrar ThreadPoolExecutor
+    # Cerrar ThreadPoolExecutor, executors del pipeline y procesos worker
     executor.shutdown(wait=True)
+    pipeline.cerrar()
     logger.info("ThreadPoolExecutor cerrado")
 
 
@@ -148,12 +179,6 @@ executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS)
 # ====================================
 
 
-class FrameRequest(BaseModel):
-    """Request model para procesamiento de frames"""
-    image: str  # Base64 encoded image
-    device_id: str
-
-
 class RegistroRequest(BaseModel):
     """Request model para registro manual de asistencia"""
     id_estudiante: int
@@ -229,6 +254,10 @@ async def enviar_comando_websocket(device_id: str, comando: Dict) -> bool:
         return False
 
 
+# Pipeline de frames: decodificar / reconocer / persistir en executors propios
+pipeline = PipelineFrames(enviar_comando_websocket)
+
+
 # ====================================
 # EVENTOS DE CICLO DE VIDA
 # ====================================
@@ -251,12 +280,24 @@ async def root():
         "timestamp": datetime.now().isoformat(),
         "endpoints": {
             "procesar_frame": "POST /api/procesar-frame",
+            "procesar_frame_binario": "POST /api/procesar-frame/binario",
             "estudiantes": "GET /api/estudiantes",
             "asistencia_hoy": "GET /api/asistencia/hoy",
             "registrar": "POST /api/registrar",
             "nuevo_estudiante": "POST /api/estudiantes/nuevo",
+            "actualizar_estudiante": "PUT /api/estudiantes/{id_estudiante}",
+            "eliminar_estudiante": "DELETE /api/estudiantes/{id_estudiante}",
+            "agregar_foto": "POST /api/estudiantes/{id_estudiante}/fotos",
             "recargar_encodings": "POST /api/recargar-encodings",
+            "progreso_encodings": "GET /api/recargar-encodings/progreso",
+            "recargar_rosters": "POST /api/rosters/recargar",
+            "roi_dispositivo": "GET|PUT|DELETE /api/devices/{device_id}/roi",
+            "perfiles": "GET /api/perfiles",
+            "perfil_dispositivo": "PUT /api/devices/{device_id}/perfil",
+            "peso_dispositivo": "PUT /api/devices/{device_id}/peso",
+            "auditoria_duplicados": "GET /api/auditoria/duplicados",
             "health": "GET /api/health",
+            "metricas": "GET /api/metricas",
             "websocket": "WS /ws/{device_id}"
         },
         "conexiones_activas": len(active_websockets)
@@ -271,17 +312,72 @@ async def health_check(request: Request):
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "encodings_loaded": face_recognition_processor.encodings_loaded,
-        "total_encodings": len(face_recognition_processor.known_encodings),
+        "total_encodings": len(face_recognition_processor.gallery),
+        "ann_index": {
+            "activo": face_recognition_processor.ann_index is not None,
+            "recall": face_recognition_processor.ann_index.recall
+            if face_recognition_processor.ann_index is not None else None
+        },
+        "colegios": galerias_colegios.estado(),
         "websockets_activos": len(active_websockets),
         "dispositivos_conectados": list(active_websockets.keys())
     }
 
 
+@app.get("/api/metricas")
+@limiter.limit(RATE_LIMIT_READ)
+async def obtener_metricas(request: Request):
+    """
+    Tiempos por etapa (p50 / p95 / max de las últimas METRICS_WINDOW muestras) y contadores
+
+    Returns:
+        JSON con 'tiempos_ms' (ej. decode, cola_reconocer, espera_lote,
+        encoding_lote), 'contadores' (ej. rostros_rastreados /
+        rostros_codificados), 'etapas' (frames en curso / en espera por etapa
+        del pipeline, tamaño medio de los lotes del encoder y, con
+        INFERENCE_BACKEND=processes, frames y reinicios de cada worker), 'pistas' por dispositivo,
+        'movimiento' (frames omitidos sin detectar por dispositivo),
+        'cache_frames' (aciertos / fallos y memoria del cache de resultados),
+        'admision' (frames admitidos / reemplazados / vencidos por dispositivo) y
+        'planificador' (peso, frames en cola, espera p50 / p95 y fracción del
+        tiempo de reconocimiento de cada dispositivo)
+    """
+    return {
+        **metricas.resumen(),
+        "etapas": pipeline.estado(),
+        "pistas": rastreador.estado(),
+        "movimiento": detector_movimiento.estado(),
+        "cache_frames": cache_frames.estado(),
+        "admision": pipeline.admision.estado() if pipeline.admision is not None else {},
+        "planificador": pipeline.planificador.estado() if pipeline.planificador is not None else {}
+    }
+
+
 # ====================================
 # ENDPOINTS - PROCESAMIENTO
 # ====================================
 
 
+async def procesar_imagen(img_data: bytes, device_id: str) -> Dict:
+    """
+    Procesa un frame con el pipeline por etapas (común a ambos endpoints)
+
+    Args:
+        img_data: Bytes de la imagen (JPEG/PNG)
+        device_id: ID del dispositivo que envió el frame
+
+    Returns:
+        Dict de respuesta ('recognized', 'unknown', 'no_face', 'busy', etc.)
+
+    Raises:
+        HTTPException: 400 si la imagen no se puede decodificar
+    """
+    try:
+        return await pipeline.procesar(img_data, device_id)
+    except ErrorDecodificacion as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/api/procesar-frame")
 @limiter.limit(RATE_LIMIT_PROCESS_FRAME)
 async def procesar_frame(request: Request, frame_request: FrameRequest):
@@ -295,93 +391,60 @@ async def procesar_frame(request: Request, frame_request: FrameRequest):
         JSON con resultado del procesamiento y reconocimiento
     """
     try:
-        device_id = frame_request.device_id
+        # Única decodificación base64 (el modelo solo valida el formato)
+        try:
+            img_data = base64.b64decode(frame_request.image)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Error al decodificar imagen")
 
-        # Decodificar imagen
-        img_array = face_recognition_processor.decode_image_from_base64(frame_request.image)
+        return await procesar_imagen(img_data, frame_request.device_id)
 
-        if img_array is None:
-            raise HTTPException(status_code=400, detail="Error al decodificar imagen")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error procesando frame: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Procesar frame (se ejecuta en el thread pool para no bloquear)
-        loop = asyncio.get_event_loop()
-        resultado = await loop.run_in_executor(
-            executor,
-            face_recognition_processor.procesar_frame,
-            img_array
-        )
 
-        if resultado['faces_found'] == 0:
-            return {
-                "status": "no_face",
-                "message": "No se detectaron rostros"
-            }
+@app.post("/api/procesar-frame/binario")
+@limiter.limit(RATE_LIMIT_PROCESS_FRAME)
+async def procesar_frame_binario(request: Request):
+    """
+    Procesa un frame enviado como bytes JPEG, sin base64 ni JSON
 
-        # Si hay coincidencias (matches)
-        if len(resultado['matches']) > 0:
-            match = resultado['matches'][0]
-            id_estudiante = match['id']
-            nombre = match['name']
-            confidence = match['confidence']
-
-            # Verificar cooldown
-            en_cooldown = db.verificar_cooldown(id_estudiante, COOLDOWN_SECONDS)
-
-            if not en_cooldown:
-                # Registrar asistencia
-                registro = db.registrar_asistencia(id_estudiante, device_id)
-
-                if registro['success']:
-                    # Enviar comando de LED verde por WebSocket
-                    await enviar_comando_websocket(device_id, {
-                        "type": "led_control",
-                        "color": "green",
-                        "duration": 2
-                    })
-
-                    logger.info(f"Asistencia registrada: {nombre} (ID: {id_estudiante})")
-
-                    return {
-                        "status": "recognized",
-                        "nombre": nombre,
-                        "id_estudiante": id_estudiante,
-                        "confidence": confidence,
-                        "registrado": True,
-                        "resultado": registro['resultado']
-                    }
-                else:
-                    logger.error(f"Error al registrar: {registro.get('error')}")
-                    return {
-                        "status": "error",
-                        "message": "Error al registrar en BD"
-                    }
-            else:
-                # Ya fue registrado recientemente
-                logger.info(f"{nombre} ya registrado (cooldown activo)")
-                return {
-                    "status": "recognized",
-                    "nombre": nombre,
-                    "id_estudiante": id_estudiante,
-                    "confidence": confidence,
-                    "registrado": False,
-                    "mensaje": "Ya registrado hoy"
-                }
-
-        # No se reconoció ningún rostro
-        await enviar_comando_websocket(device_id, {
-            "type": "led_control",
-            "color": "red",
-            "duration": 1
-        })
+    Acepta el cuerpo crudo (Content-Type: application/octet-stream o image/jpeg)
+    o multipart/form-data con el archivo en el campo 'frame'. El dispositivo se
+    identifica con el header X-Device-ID. La respuesta es la misma de
+    /api/procesar-frame.
 
-        return {
-            "status": "unknown",
-            "message": "Rostro no reconocido",
-            "faces_found": resultado['faces_found']
-        }
+    Returns:
+        JSON con resultado del procesamiento y reconocimiento
+    """
+    device_id = request.headers.get("X-Device-ID")
+    if not device_id:
+        raise HTTPException(status_code=400, detail="Falta el header X-Device-ID")
+
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            frame = form.get("frame")
+            if frame is None or isinstance(frame, str):
+                raise HTTPException(status_code=400, detail="Falta el archivo 'frame'")
+            img_data = await frame.read()
+        else:
+            img_data = await request.body()
+
+        if len(img_data) == 0:
+            raise HTTPException(status_code=400, detail="Frame vacío")
+        if len(img_data) > MAX_PHOTO_SIZE_BYTES:
+            raise HTTPException(status_code=413, detail="Frame demasiado grande")
 
+        return await procesar_imagen(img_data, device_id)
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error procesando frame: {e}")
+        logger.error(f"Error procesando frame binario: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -413,17 +476,19 @@ async def agregar_nuevo_estudiante(
     request: Request,
     nombre_completo: str = Form(...),
     rut: str = Form(None),
+    id_colegio: int = Form(None),
     foto: UploadFile = File(...)
 ):
     """
     Agrega un nuevo estudiante:
     1. Guarda la foto.
     2. Guarda en la BD.
-    3. Recarga los encodings automáticamente.
+    3. Codifica solo su foto y la agrega a la galería de su colegio (sin re-codificar al resto).
 
     Args:
         nombre_completo: Nombre completo del estudiante
         rut: RUT del estudiante (opcional)
+        id_colegio: Colegio del estudiante (opcional, sin colegio = galería global)
         foto: Archivo de foto del estudiante
 
     Returns:
@@ -440,7 +505,7 @@ async def agregar_nuevo_estudiante(
         logger.info(f"Foto guardada en: {filepath}")
 
         # Guardar el estudiante en la BD
-        nuevo_estudiante = db.crear_estudiante(nombre_completo, rut, filename)
+        nuevo_estudiante = db.crear_estudiante(nombre_completo, rut, filename, id_colegio)
 
         if not nuevo_estudiante:
             # Si falla la BD, borramos la foto que acabamos de guardar
@@ -453,11 +518,30 @@ async def agregar_nuevo_estudiante(
 
         logger.info(f"Estudiante '{nombre_completo}' guardado en BD.")
 
-        # Recargar encodings automáticamente
-        logger.info("Recargando encodings...")
-        await recargar_encodings_internal()
+        # Agregar a la galería de su colegio solo el encoding de este estudiante
+        loop = asyncio.get_event_loop()
+        procesador = await loop.run_in_executor(executor, galerias_colegios.procesador_colegio, id_colegio)
+        encoding_generado = await loop.run_in_executor(
+            executor,
+            procesador.agregar_estudiante,
+            nuevo_estudiante
+        )
+
+        # Advertir si el rostro ya está enrolado con otro nombre / RUT
+        posible_duplicado = None
+        if encoding_generado:
+            posible_duplicado = await loop.run_in_executor(
+                executor,
+                procesador.posible_duplicado,
+                nuevo_estudiante['id_estudiante']
+            )
 
-        return {"status": "ok", "estudiante": nuevo_estudiante}
+        return {
+            "status": "ok",
+            "estudiante": nuevo_estudiante,
+            "encoding_generado": encoding_generado,
+            "posible_duplicado": posible_duplicado
+        }
 
     except HTTPException:
         raise
@@ -469,6 +553,232 @@ async def agregar_nuevo_estudiante(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.put("/api/estudiantes/{id_estudiante}")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def actualizar_estudiante(
+    request: Request,
+    id_estudiante: int,
+    nombre_completo: str = Form(None),
+    rut: str = Form(None),
+    foto: UploadFile = File(None)
+):
+    """
+    Actualiza los datos y/o la foto de un estudiante
+    Si se envía una foto nueva, solo se re-codifica la foto de este estudiante;
+    una foto sin rostro se rechaza (400) sin modificar la BD ni los archivos.
+
+    Args:
+        id_estudiante: ID del estudiante a actualizar
+        nombre_completo: Nuevo nombre completo (opcional)
+        rut: Nuevo RUT (opcional)
+        foto: Nueva foto del estudiante (opcional)
+
+    Returns:
+        JSON con información del estudiante actualizado
+    """
+    estudiante = db.obtener_estudiante_por_id(id_estudiante)
+    if not estudiante:
+        raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+
+    nombre = nombre_completo or estudiante['nombre_completo']
+    filename = limpiar_filename(nombre) if foto else estudiante['path_foto_referencia']
+    filepath = os.path.join(str(PHOTOS_DIR), filename)
+    # Con el mismo nombre, filepath es la foto de referencia actual: la nueva
+    # se guarda aparte y solo la reemplaza si tiene rostro y la BD la acepta
+    temporal: Optional[str] = None
+
+    try:
+        loop = asyncio.get_event_loop()
+        procesador = await loop.run_in_executor(
+            executor, galerias_colegios.procesador_colegio, estudiante['id_colegio']
+        )
+
+        if foto:
+            descriptor, temporal = tempfile.mkstemp(suffix=".tmp", dir=str(PHOTOS_DIR))
+            with os.fdopen(descriptor, "wb") as buffer:
+                buffer.write(await foto.read())
+
+            if not await loop.run_in_executor(executor, procesador.verificar_foto, temporal):
+                raise HTTPException(status_code=400, detail="No se detectó un rostro en la foto")
+
+        actualizado = db.actualizar_estudiante(
+            id_estudiante,
+            nombre,
+            rut if rut is not None else estudiante['rut'],
+            filename
+        )
+
+        if not actualizado:
+            raise HTTPException(
+                status_code=409,
+                detail="Error al guardar en BD (posible RUT duplicado)"
+            )
+
+        encoding_generado = None
+        posible_duplicado = None
+
+        if foto:
+            os.replace(temporal, filepath)
+            temporal = None
+            logger.info(f"Foto guardada en: {filepath}")
+
+            # La foto nueva reemplaza todas las fotos de referencia del estudiante
+            anteriores = db.eliminar_fotos_estudiante(id_estudiante)
+            if estudiante['path_foto_referencia'] != filename:
+                anteriores.append(estudiante['path_foto_referencia'])
+            for path_foto in anteriores:
+                anterior = os.path.join(str(PHOTOS_DIR), path_foto)
+                if os.path.exists(anterior):
+                    os.remove(anterior)
+
+            # El encoding ya está en el cache (verificar_foto): no se vuelve a codificar
+            encoding_generado = await loop.run_in_executor(
+                executor,
+                procesador.agregar_estudiante,
+                actualizado
+            )
+            if encoding_generado:
+                posible_duplicado = await loop.run_in_executor(
+                    executor,
+                    procesador.posible_duplicado,
+                    id_estudiante
+                )
+        elif nombre != estudiante['nombre_completo']:
+            await loop.run_in_executor(
+                executor,
+                procesador.renombrar_estudiante,
+                id_estudiante,
+                nombre
+            )
+
+        logger.info(f"Estudiante ID {id_estudiante} actualizado")
+
+        return {
+            "status": "ok",
+            "estudiante": actualizado,
+            "encoding_generado": encoding_generado,
+            "posible_duplicado": posible_duplicado
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en /api/estudiantes/{id_estudiante}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if temporal is not None and os.path.exists(temporal):
+            os.remove(temporal)
+
+
+@app.post("/api/estudiantes/{id_estudiante}/fotos")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def agregar_foto_estudiante(
+    request: Request,
+    id_estudiante: int,
+    foto: UploadFile = File(...)
+):
+    """
+    Agrega una foto de referencia adicional a un estudiante
+    Solo se codifica la foto nueva; los encodings anteriores del estudiante se conservan.
+
+    Args:
+        id_estudiante: ID del estudiante
+        foto: Foto adicional (otra iluminación, ángulo, etc.)
+
+    Returns:
+        JSON con el nombre del archivo y si se generó el encoding
+    """
+    estudiante = db.obtener_estudiante_por_id(id_estudiante)
+    if not estudiante:
+        raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+
+    filename = limpiar_filename(
+        f"{estudiante['nombre_completo']} {datetime.now().strftime('%Y%m%d%H%M%S%f')}"
+    )
+    filepath = os.path.join(str(PHOTOS_DIR), filename)
+
+    try:
+        with open(filepath, "wb") as buffer:
+            buffer.write(await foto.read())
+        logger.info(f"Foto adicional guardada en: {filepath}")
+
+        loop = asyncio.get_event_loop()
+        procesador = await loop.run_in_executor(
+            executor, galerias_colegios.procesador_colegio, estudiante['id_colegio']
+        )
+        encoding_generado = await loop.run_in_executor(
+            executor,
+            procesador.agregar_foto_estudiante,
+            estudiante,
+            filename
+        )
+
+        if not encoding_generado:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            raise HTTPException(status_code=422, detail="No se detectó un rostro en la foto")
+
+        if db.agregar_foto_estudiante(id_estudiante, filename) is None:
+            raise HTTPException(status_code=500, detail="Error al guardar la foto en la BD")
+
+        return {"status": "ok", "id_estudiante": id_estudiante, "foto": filename, "encoding_generado": True}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+        logger.error(f"Error en /api/estudiantes/{id_estudiante}/fotos: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.delete("/api/estudiantes/{id_estudiante}")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def eliminar_estudiante(request: Request, id_estudiante: int):
+    """
+    Da de baja un estudiante en la BD (conserva su asistencia) y quita sus encodings de la galería
+
+    Args:
+        id_estudiante: ID del estudiante a eliminar
+
+    Returns:
+        JSON confirmando la eliminación
+    """
+    try:
+        estudiante = db.obtener_estudiante_por_id(id_estudiante)
+        if not estudiante:
+            raise HTTPException(status_code=404, detail="Estudiante no encontrado")
+
+        if not db.eliminar_estudiante(id_estudiante):
+            raise HTTPException(status_code=500, detail="Error al eliminar de la BD")
+
+        loop = asyncio.get_event_loop()
+        procesador = await loop.run_in_executor(
+            executor, galerias_colegios.procesador_colegio, estudiante['id_colegio']
+        )
+        await loop.run_in_executor(
+            executor,
+            procesador.eliminar_estudiante,
+            id_estudiante
+        )
+
+        # Eliminar las fotos si aún existen (KEEP_PHOTOS_AFTER_ENCODING=true)
+        for path_foto in [estudiante['path_foto_referencia']] + estudiante['fotos_adicionales']:
+            filepath = os.path.join(str(PHOTOS_DIR), path_foto)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+        logger.info(f"Estudiante '{estudiante['nombre_completo']}' eliminado")
+
+        return {"status": "ok", "id_estudiante": id_estudiante}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error eliminando estudiante {id_estudiante}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ====================================
 # ENDPOINTS - ASISTENCIA
 # ====================================
@@ -540,6 +850,152 @@ async def obtener_dispositivos(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _roi_respuesta(device_id: str) -> Dict:
+    """Respuesta común de los endpoints de ROI"""
+    roi = galerias_colegios.roi_por_dispositivo.get(device_id)
+    return {
+        "device_id": device_id,
+        "roi": dict(zip(("x", "y", "ancho", "alto"), roi)) if roi is not None else None
+    }
+
+
+@app.get("/api/devices/{device_id}/roi")
+@limiter.limit(RATE_LIMIT_READ)
+async def obtener_roi_dispositivo(request: Request, device_id: str):
+    """
+    Obtiene la región de interés de la cámara de un dispositivo
+
+    Returns:
+        JSON con 'roi' = {x, y, ancho, alto} como fracción del frame (null = frame completo)
+    """
+    return _roi_respuesta(device_id)
+
+
+@app.put("/api/devices/{device_id}/roi")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def actualizar_roi_dispositivo(request: Request, device_id: str, roi_request: RoiRequest):
+    """
+    Define la región de interés donde se buscan rostros en los frames del dispositivo
+
+    La detección solo recorre ese rectángulo (ej. la franja de la puerta);
+    las ubicaciones de los rostros se siguen informando en coordenadas del
+    frame completo.
+
+    Args:
+        device_id: ID del dispositivo
+        roi_request: RoiRequest con x, y, ancho, alto como fracción del frame
+
+    Returns:
+        JSON con la ROI guardada
+    """
+    roi = (roi_request.x, roi_request.y, roi_request.ancho, roi_request.alto)
+
+    if not db.actualizar_roi_dispositivo(device_id, roi):
+        raise HTTPException(status_code=500, detail="Error al guardar la ROI en BD")
+
+    galerias_colegios.actualizar_roi(device_id, roi)
+    return {"success": True, **_roi_respuesta(device_id)}
+
+
+@app.delete("/api/devices/{device_id}/roi")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def eliminar_roi_dispositivo(request: Request, device_id: str):
+    """
+    Quita la región de interés: se vuelve a detectar en el frame completo
+
+    Returns:
+        JSON con 'roi' = null
+    """
+    if not db.actualizar_roi_dispositivo(device_id, None):
+        raise HTTPException(status_code=500, detail="Error al borrar la ROI en BD")
+
+    galerias_colegios.actualizar_roi(device_id, None)
+    return {"success": True, **_roi_respuesta(device_id)}
+
+
+@app.get("/api/perfiles")
+@limiter.limit(RATE_LIMIT_READ)
+async def obtener_perfiles(request: Request):
+    """
+    Lista los perfiles de reconocimiento y el perfil asignado a cada dispositivo
+
+    El costo de detección de cada perfil aparece en GET /api/metricas como
+    deteccion_<perfil> (el encoder corre en lotes mixtos: encoding_lote).
+
+    Returns:
+        JSON con 'perfiles' (parámetros de cada uno), 'por_defecto' y 'dispositivos'
+    """
+    return {
+        "perfiles": {nombre: perfil.como_dict() for nombre, perfil in PERFILES.items()},
+        "por_defecto": PERFIL_POR_DEFECTO.nombre,
+        "dispositivos": galerias_colegios.perfil_por_dispositivo
+    }
+
+
+@app.put("/api/devices/{device_id}/perfil")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def actualizar_perfil_dispositivo(request: Request, device_id: str, perfil_request: PerfilRequest):
+    """
+    Asigna un perfil de reconocimiento (detector, upsampling, ancho, tolerancia) al dispositivo
+
+    Args:
+        device_id: ID del dispositivo
+        perfil_request: PerfilRequest con el nombre del perfil (null = perfil por defecto)
+
+    Returns:
+        JSON con el perfil aplicado y sus parámetros
+    """
+    perfil = perfil_request.perfil
+    if perfil is not None and perfil not in PERFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Perfil desconocido: {perfil}. Disponibles: {', '.join(PERFILES)}"
+        )
+
+    if not db.actualizar_perfil_dispositivo(device_id, perfil):
+        raise HTTPException(status_code=500, detail="Error al guardar el perfil en BD")
+
+    galerias_colegios.actualizar_perfil(device_id, perfil)
+    aplicado = PERFILES[perfil] if perfil is not None else PERFIL_POR_DEFECTO
+
+    return {
+        "success": True,
+        "device_id": device_id,
+        "perfil": aplicado.nombre,
+        "parametros": aplicado.como_dict()
+    }
+
+
+@app.put("/api/devices/{device_id}/peso")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def actualizar_peso_dispositivo(request: Request, device_id: str, peso_request: PesoRequest):
+    """
+    Asigna el peso del dispositivo en el reparto del reconocimiento bajo sobrecarga
+
+    Con los workers saturados, cada dispositivo recibe una fracción del
+    tiempo de reconocimiento proporcional a su peso (ver 'planificador' en
+    GET /api/metricas). Con control de admisión, el dispositivo puede tener
+    ceil(peso) frames en curso en vez de uno.
+
+    Args:
+        device_id: ID del dispositivo
+        peso_request: PesoRequest con el peso relativo (null = 1)
+
+    Returns:
+        JSON con el peso aplicado
+    """
+    if not db.actualizar_peso_dispositivo(device_id, peso_request.peso):
+        raise HTTPException(status_code=500, detail="Error al guardar el peso en BD")
+
+    galerias_colegios.actualizar_peso(device_id, peso_request.peso)
+
+    return {
+        "success": True,
+        "device_id": device_id,
+        "peso": peso_request.peso if peso_request.peso is not None else 1.0
+    }
+
+
 @app.post("/api/registrar")
 @limiter.limit(RATE_LIMIT_WRITE)
 async def registrar_manual(request: Request, registro_request: RegistroRequest):
@@ -553,7 +1009,8 @@ async def registrar_manual(request: Request, registro_request: RegistroRequest):
         JSON con información del registro
     """
     try:
-        resultado = db.registrar_asistencia(
+        resultado = await pipeline.persistir.ejecutar(
+            db.registrar_asistencia,
             registro_request.id_estudiante,
             registro_request.device_id
         )
@@ -583,7 +1040,21 @@ async def registrar_manual(request: Request, registro_request: RegistroRequest):
 async def recargar_encodings_internal():
     """Función interna para recargar encodings (sin rate limiting)"""
     estudiantes = db.obtener_estudiantes()
-    face_recognition_processor.generar_encodings_desde_fotos(estudiantes)
+    galerias_colegios.cargar_dispositivos(
+        db.obtener_colegios_dispositivos(),
+        db.obtener_rosters_dispositivos(),
+        db.obtener_roi_dispositivos(),
+        db.obtener_perfiles_dispositivos(),
+        db.obtener_pesos_dispositivos()
+    )
+
+    # La codificación usa el pool de procesos: no bloquear el event loop mientras tanto
+    loop = asyncio.get_event_loop()
+    await loop.run_in_executor(
+        executor,
+        galerias_colegios.generar_encodings_desde_fotos,
+        estudiantes
+    )
 
 
 @app.post("/api/recargar-encodings")
@@ -601,13 +1072,98 @@ async def recargar_encodings(request: Request):
 
         return {
             "success": True,
-            "message": f"Encodings recargados: {len(face_recognition_processor.known_encodings)} rostros"
+            "message": f"Encodings recargados: {len(face_recognition_processor.gallery)} rostros",
+            "progreso": face_recognition_processor.progreso_enrolamiento
         }
     except Exception as e:
         logger.error(f"Error recargando encodings: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/auditoria/duplicados")
+@limiter.limit(RATE_LIMIT_AUDIT)
+async def auditar_duplicados(
+    request: Request,
+    umbral: float = DUPLICATE_THRESHOLD,
+    id_colegio: Optional[int] = None
+):
+    """
+    Busca estudiantes enrolados más de una vez (todos los pares de la galería)
+    El cálculo se hace por bloques en el thread pool; con 50k rostros toma segundos.
+
+    Args:
+        umbral: Distancia máxima para reportar un par (por defecto DUPLICATE_THRESHOLD)
+        id_colegio: Galería a auditar (por defecto la global)
+
+    Returns:
+        JSON con los pares sospechosos ordenados por distancia
+    """
+    if not 0.0 < umbral <= 1.0:
+        raise HTTPException(status_code=400, detail="umbral debe estar entre 0.0 y 1.0")
+
+    try:
+        loop = asyncio.get_event_loop()
+        procesador = await loop.run_in_executor(executor, galerias_colegios.procesador_colegio, id_colegio)
+
+        inicio = time.perf_counter()
+        pares = await loop.run_in_executor(executor, procesador.auditar_duplicados, umbral)
+
+        return {
+            "umbral": umbral,
+            "total_rostros": len(procesador.gallery),
+            "total_pares": len(pares),
+            "segundos": round(time.perf_counter() - inicio, 2),
+            "pares": pares
+        }
+    except Exception as e:
+        logger.error(f"Error en auditoría de duplicados: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/recargar-encodings/progreso")
+@limiter.limit(RATE_LIMIT_READ)
+async def progreso_encodings(request: Request):
+    """
+    Avance de la codificación masiva de fotos en curso (o de la última)
+
+    Returns:
+        JSON con fotos procesadas, total y fotos por segundo
+    """
+    return face_recognition_processor.progreso_enrolamiento
+
+
+@app.post("/api/rosters/recargar")
+@limiter.limit(RATE_LIMIT_WRITE)
+async def recargar_rosters(request: Request):
+    """
+    Recarga desde la BD el colegio, el curso asignado, la ROI y el perfil de cada dispositivo
+    Útil después de modificar las tablas dispositivos / curso_estudiantes
+
+    Returns:
+        JSON con el tamaño de la galería de cada dispositivo sin colegio
+    """
+    try:
+        galerias_colegios.cargar_dispositivos(
+            db.obtener_colegios_dispositivos(),
+            db.obtener_rosters_dispositivos(),
+            db.obtener_roi_dispositivos(),
+            db.obtener_perfiles_dispositivos(),
+            db.obtener_pesos_dispositivos()
+        )
+
+        return {
+            "success": True,
+            "rosters": {
+                device_id: len(gallery)
+                for device_id, gallery in face_recognition_processor.rosters.items()
+            },
+            "colegios": galerias_colegios.estado()
+        }
+    except Exception as e:
+        logger.error(f"Error recargando rosters: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ====================================
 # WEBSOCKET - DISPOSITIVOS IoT
 # ====================================
@@ -750,8 +1306,8 @@ async def add_device_ip(request: Request, call_next):
     """
     response = await call_next(request)
 
-    # Si es un request de procesar-frame, cachear la IP
-    if request.url.path == "/api/procesar-frame":
+    # Si es un request de procesar-frame (JSON o binario), cachear la IP
+    if request.url.path in ("/api/procesar-frame", "/api/procesar-frame/binario"):
         try:
             device_id = request.headers.get("X-Device-ID")
             if device_id:
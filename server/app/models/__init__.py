@@ -5,6 +5,7 @@ Modelos Pydantic para validación de datos
 from .student import StudentCreate, StudentResponse
 from .attendance import AttendanceRecord, AttendanceResponse
 from .frame import FrameRequest, FrameResponse
+from .device import RoiRequest, PerfilRequest, PesoRequest
 
 __all__ = [
     "StudentCreate",
@@ -13,4 +14,7 @@ __all__ = [
     "AttendanceResponse",
     "FrameRequest",
     "FrameResponse",
+    "RoiRequest",
+    "PerfilRequest",
+    "PesoRequest",
 ]
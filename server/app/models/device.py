@@ -0,0 +1,46 @@
+"""
+Modelos Pydantic para configuración de dispositivos
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel, Field, validator
+
+
+class RoiRequest(BaseModel):
+    """Región de interés de la cámara, como fracción del frame (0-1)"""
+
+    x: float = Field(..., ge=0, lt=1, description="Borde izquierdo (fracción del ancho)")
+    y: float = Field(..., ge=0, lt=1, description="Borde superior (fracción del alto)")
+    ancho: float = Field(..., gt=0, le=1, description="Ancho (fracción del ancho del frame)")
+    alto: float = Field(..., gt=0, le=1, description="Alto (fracción del alto del frame)")
+
+    @validator("ancho")
+    def validar_ancho(cls, v, values):
+        """Valida que la región no salga del frame por la derecha"""
+        if "x" in values and values["x"] + v > 1:
+            raise ValueError("x + ancho no puede ser mayor que 1")
+        return v
+
+    @validator("alto")
+    def validar_alto(cls, v, values):
+        """Valida que la región no salga del frame por abajo"""
+        if "y" in values and values["y"] + v > 1:
+            raise ValueError("y + alto no puede ser mayor que 1")
+        return v
+
+
+class PerfilRequest(BaseModel):
+    """Perfil de reconocimiento asignado a un dispositivo"""
+
+    perfil: Optional[str] = Field(
+        None, max_length=30, description="Nombre del perfil (null = perfil por defecto)"
+    )
+
+
+class PesoRequest(BaseModel):
+    """Peso de un dispositivo en el reparto del reconocimiento bajo sobrecarga"""
+
+    peso: Optional[float] = Field(
+        None, gt=0, le=100, description="Peso relativo (null = 1; ej. 3 para la entrada principal)"
+    )
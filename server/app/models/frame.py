@@ -4,7 +4,13 @@ Modelos Pydantic para procesamiento de frames
 
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, validator
-import base64
+import re
+
+# Alfabeto base64 estándar con padding final
+BASE64_REGEX = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+
+# Saltos de línea / espacios (base64 envuelto a 76 columnas)
+ESPACIOS_REGEX = re.compile(r"\s+")
 
 
 class FrameRequest(BaseModel):
@@ -15,12 +21,19 @@ class FrameRequest(BaseModel):
 
     @validator("image")
     def validar_base64(cls, v):
-        """Valida que la imagen sea base64 válido"""
-        try:
-            base64.b64decode(v)
-        except Exception:
+        """
+        Valida que la imagen sea base64 válido
+
+        Solo revisa alfabeto y largo: el endpoint decodifica una única vez
+        (decodificar aquí duplicaría el trabajo en cada frame). Como antes,
+        se aceptan base64 con saltos de línea; además ahora se acepta sin
+        padding (antes b64decode lo rechazaba): se quitan los espacios y se
+        completa el '=' antes de decodificar.
+        """
+        v = ESPACIOS_REGEX.sub("", v)
+        if len(v) % 4 == 1 or not BASE64_REGEX.fullmatch(v):
             raise ValueError("La imagen debe estar en formato base64 válido")
-        return v
+        return v + "=" * (-len(v) % 4)
 
 
 class FaceMatch(BaseModel):
@@ -37,7 +50,7 @@ class FrameResponse(BaseModel):
 
     status: str = Field(
         ...,
-        description="Estado: 'recognized', 'unknown', 'no_face', 'error'",
+        description="Estado: 'recognized', 'unknown', 'low_quality', 'no_face', 'busy', 'error'",
     )
     nombre: Optional[str] = None
     id_estudiante: Optional[int] = None
@@ -45,3 +58,7 @@ class FrameResponse(BaseModel):
     registrado: Optional[bool] = None
     mensaje: Optional[str] = None
     faces_found: Optional[int] = None
+    retry_after: Optional[float] = Field(
+        None,
+        description="Con status 'busy': segundos sugeridos antes de enviar otro frame",
+    )
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+auditar_duplicados.py - Reporta estudiantes enrolados más de una vez
+Compara todos los pares de rostros de la galería por bloques (memoria acotada)
+y lista los pares de estudiantes distintos bajo el umbral
+
+Uso (desde la carpeta 'server/'):
+    python auditar_duplicados.py
+    python auditar_duplicados.py --umbral 0.35 --galeria data/photos/colegios/2/gallery.fgal
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+from app.config import DUPLICATE_THRESHOLD, GALLERY_FILE
+from app.core.duplicates import auditar_galeria
+from app.core.gallery_store import abrir_galeria
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Auditoría de estudiantes duplicados")
+    parser.add_argument("--galeria", type=Path, default=GALLERY_FILE, help="Archivo .fgal a auditar")
+    parser.add_argument("--umbral", type=float, default=DUPLICATE_THRESHOLD, help="Distancia máxima")
+    parser.add_argument("--bloque", type=int, default=2048, help="Filas por bloque (acota la memoria)")
+    args = parser.parse_args()
+
+    print("🔍 Auditando estudiantes duplicados...")
+    print("-" * 50)
+
+    if not os.path.exists(args.galeria):
+        print(f"❌ No existe la galería: {args.galeria}")
+        return False
+
+    gallery = abrir_galeria(args.galeria)
+    nombres = dict(zip(gallery.ids.tolist(), gallery.names))
+
+    inicio = time.perf_counter()
+    pares = auditar_galeria(gallery, args.umbral, bloque=args.bloque)
+    segundos = time.perf_counter() - inicio
+
+    print(f"   {len(gallery)} rostros comparados en {segundos:.1f} s (umbral {args.umbral})")
+
+    if not pares:
+        print("✅ No se encontraron posibles duplicados")
+        return True
+
+    print(f"⚠️  {len(pares)} pares sospechosos:\n")
+    for (id_a, id_b), distancia in sorted(pares.items(), key=lambda par: par[1]):
+        print(f"   {distancia:.3f}  {nombres[id_a]} (ID {id_a})  <->  {nombres[id_b]} (ID {id_b})")
+
+    print("\n💡 Revisa cada par y elimina el registro duplicado con DELETE /api/estudiantes/{id}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,3 @@
+"""
+Benchmarks de rendimiento del servidor
+"""
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+bench_decode.py - Decodificación JPEG completa vs reducida (modo draft de PIL)
+Mide decode_frame con distintos JPEG_DRAFT_WIDTH sobre frames de
+640x480, 1280x720 y 1920x1080 (solo la copia para detectar; la resolución
+completa, si hay rostros que codificar, cuesta lo mismo que draft=0)
+
+Uso (desde la carpeta 'server/'):
+    python -m benchmarks.bench_decode
+    python -m benchmarks.bench_decode --foto data/photos/student_photos/juan_perez.jpg
+"""
+
+import argparse
+import io
+import time
+from typing import List
+
+import numpy as np
+from PIL import Image
+
+import app.core.face_recognition as modulo
+from app.core.face_recognition import face_recognition_processor
+
+TAMANOS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def jpeg_de_prueba(foto: str, ancho: int, alto: int) -> bytes:
+    """JPEG calidad 85 (como el cliente) a partir de una foto o de un degradado sintético"""
+    if foto:
+        img = Image.open(foto).convert('RGB').resize((ancho, alto), Image.BILINEAR)
+    else:
+        x = np.linspace(0, 255, ancho, dtype=np.float32)
+        y = np.linspace(0, 255, alto, dtype=np.float32)[:, np.newaxis]
+        ruido = np.random.default_rng(0).normal(0, 8, (alto, ancho))
+        canal = np.clip((x + y) / 2 + ruido, 0, 255)
+        img = Image.fromarray(np.stack([canal, canal * 0.8, 255 - canal], axis=2).astype(np.uint8))
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def medir(datos: bytes, repeticiones: int) -> float:
+    tiempos: List[float] = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        face_recognition_processor.decode_frame(datos)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--foto", default="", help="Foto base (por defecto, imagen sintética)")
+    parser.add_argument("--anchos", default="0,960,640,480", help="Valores de JPEG_DRAFT_WIDTH a comparar")
+    parser.add_argument("--repeticiones", type=int, default=50)
+    args = parser.parse_args()
+
+    anchos = [int(valor) for valor in args.anchos.split(",")]
+
+    print(f"{'frame':>10} " + " ".join(f"{f'draft={a}':>12}" for a in anchos) + "   (ms, mediana)")
+
+    for ancho, alto in TAMANOS:
+        datos = jpeg_de_prueba(args.foto, ancho, alto)
+        columnas = []
+        for draft in anchos:
+            modulo.JPEG_DRAFT_WIDTH = draft
+            columnas.append(medir(datos, args.repeticiones))
+        print(f"{ancho:>5}x{alto:<4} " + " ".join(f"{t:>12.2f}" for t in columnas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+bench_detection.py - Latencia y recall de la detección sobre una copia reducida
+Compara HOG sobre el frame completo contra detectar_rostros (FRAME_RESIZE_WIDTH)
+en frames de 640x480, 1280x720 y 1920x1080 armados con fotos de estudiantes
+
+Uso (desde la carpeta 'server/'):
+    python -m benchmarks.bench_detection
+    python -m benchmarks.bench_detection --fotos data/photos/student_photos --ancho 480 --frames 20
+"""
+
+import argparse
+import os
+import time
+from typing import List, Tuple
+
+import face_recognition
+import numpy as np
+from PIL import Image
+
+from app.config import PHOTOS_DIR
+from app.core.detection import detectar_rostros
+
+TAMANOS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersección sobre unión de dos cajas (top, right, bottom, left)"""
+    alto = min(a[2], b[2]) - max(a[0], b[0])
+    ancho = min(a[1], b[1]) - max(a[3], b[3])
+    if alto <= 0 or ancho <= 0:
+        return 0.0
+    interseccion = alto * ancho
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return interseccion / (area_a + area_b - interseccion)
+
+
+def armar_frames(fotos: List[str], tamano: Tuple[int, int], cantidad: int, rng: np.random.Generator) -> List[np.ndarray]:
+    """Pega una foto de estudiante (~45% del alto del frame) en una posición al azar"""
+    ancho, alto = tamano
+    frames = []
+    for i in range(cantidad):
+        foto = Image.open(fotos[i % len(fotos)]).convert('RGB')
+        alto_foto = int(alto * 0.45)
+        foto = foto.resize((max(1, foto.width * alto_foto // foto.height), alto_foto), Image.BILINEAR)
+
+        frame = Image.new('RGB', (ancho, alto), (90, 90, 90))
+        x = int(rng.integers(0, max(1, ancho - foto.width)))
+        y = int(rng.integers(0, max(1, alto - foto.height)))
+        frame.paste(foto, (x, y))
+        frames.append(np.asarray(frame))
+    return frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fotos", default=str(PHOTOS_DIR), help="Carpeta con fotos de rostros")
+    parser.add_argument("--ancho", type=int, default=480, help="FRAME_RESIZE_WIDTH a evaluar")
+    parser.add_argument("--frames", type=int, default=20, help="Frames por tamaño")
+    args = parser.parse_args()
+
+    fotos = sorted(
+        os.path.join(args.fotos, nombre) for nombre in os.listdir(args.fotos)
+        if nombre.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+    if not fotos:
+        print(f"No hay fotos en {args.fotos}")
+        return
+
+    rng = np.random.default_rng(0)
+
+    print(f"Ancho de detección: {args.ancho} px | {args.frames} frames por tamaño")
+    print(f"{'tamaño':>10} {'completo (ms)':>14} {'reducido (ms)':>14} {'speedup':>8} "
+          f"{'recall':>7} {'dist. encoding':>15}")
+
+    for tamano in TAMANOS:
+        frames = armar_frames(fotos, tamano, args.frames, rng)
+        t_completo, t_reducido = [], []
+        referencia, encontrados = 0, 0
+        diferencias = []
+
+        for frame in frames:
+            inicio = time.perf_counter()
+            completas = face_recognition.face_locations(frame)
+            t_completo.append((time.perf_counter() - inicio) * 1000)
+
+            inicio = time.perf_counter()
+            reducidas = detectar_rostros(frame, args.ancho)
+            t_reducido.append((time.perf_counter() - inicio) * 1000)
+
+            # Recall: rostros del frame completo también detectados en la copia reducida
+            referencia += len(completas)
+            for caja in completas:
+                mejor = max(reducidas, key=lambda otra: iou(caja, otra), default=None)
+                if mejor is None or iou(caja, mejor) < 0.5:
+                    continue
+                encontrados += 1
+
+                # Diferencia entre encodings con la caja original y la caja escalada
+                enc_completa = face_recognition.face_encodings(frame, [caja])[0]
+                enc_reducida = face_recognition.face_encodings(frame, [mejor])[0]
+                diferencias.append(float(np.linalg.norm(enc_completa - enc_reducida)))
+
+        completo = float(np.median(t_completo))
+        reducido = float(np.median(t_reducido))
+        recall = encontrados / referencia if referencia else float('nan')
+        distancia = float(np.median(diferencias)) if diferencias else float('nan')
+
+        print(f"{tamano[0]:>5}x{tamano[1]:<4} {completo:>14.1f} {reducido:>14.1f} "
+              f"{completo / reducido:>7.1f}x {recall:>7.2%} {distancia:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+bench_matching.py - Microbenchmark del matching contra la galería
+Compara el recorrido anterior (compare_faces + face_distance por rostro)
+con la búsqueda vectorizada de Gallery.buscar
+
+Uso (desde la carpeta 'server/'):
+    python -m benchmarks.bench_matching
+    python -m benchmarks.bench_matching --tamanos 1000 10000 50000 --rostros 5
+"""
+
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+TOLERANCIA = 0.6
+
+
+def generar_encodings(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Genera encodings sintéticos con norma ~1, similar a los de dlib"""
+    datos = rng.normal(0.0, 1.0, size=(n, ENCODING_DIM))
+    return datos / np.linalg.norm(datos, axis=1, keepdims=True)
+
+
+def match_legacy(known_encodings: List[np.ndarray], queries: np.ndarray) -> List[int]:
+    """Reproduce el recorrido anterior: dos barridos de la lista por rostro"""
+    resultado = []
+    for q in queries:
+        # face_recognition.compare_faces -> face_distance(...) <= tolerance
+        matches = list(np.linalg.norm(known_encodings - q, axis=1) <= TOLERANCIA)
+        # face_recognition.face_distance
+        distancias = np.linalg.norm(known_encodings - q, axis=1)
+        mejor = int(np.argmin(distancias))
+        resultado.append(mejor if True in matches and matches[mejor] else -1)
+    return resultado
+
+
+def medir(fn: Callable[[], object], repeticiones: int) -> float:
+    """Devuelve la mediana en milisegundos de `repeticiones` ejecuciones"""
+    fn()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--rostros", type=int, default=5, help="Rostros detectados por frame")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+
+    print(f"Rostros por frame: {args.rostros} | repeticiones: {args.repeticiones}")
+    print(f"{'galería':>10} {'legacy (ms)':>12} {'vectorizado (ms)':>17} {'speedup':>8}")
+
+    for n in args.tamanos:
+        base = generar_encodings(n, rng)
+        known_encodings = [fila for fila in base]  # formato del pickle anterior
+        gallery = Gallery(base, list(range(n)), [f"estudiante_{i}" for i in range(n)])
+
+        # Rostros del frame: perturbaciones de estudiantes existentes
+        elegidos = rng.choice(n, size=args.rostros, replace=False)
+        queries = base[elegidos] + rng.normal(0.0, 0.02, size=(args.rostros, ENCODING_DIM))
+
+        indices, _ = gallery.buscar(queries)
+        if not np.array_equal(indices, elegidos):
+            print(f"⚠️  Resultado vectorizado distinto al esperado para n={n}")
+
+        t_legacy = medir(lambda: match_legacy(known_encodings, queries), args.repeticiones)
+        t_vector = medir(lambda: gallery.buscar(queries), args.repeticiones)
+
+        print(f"{n:>10} {t_legacy:>12.2f} {t_vector:>17.2f} {t_legacy / t_vector:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
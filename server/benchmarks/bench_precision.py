@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+bench_precision.py - Memoria, latencia y top-1 de la galería en float32 / float16 / int8
+El filtrado grueso recorre la matriz compacta y los mejores candidatos se
+re-rankean en float32 (GALLERY_PRECISION + RERANK_CANDIDATES)
+
+Uso (desde la carpeta 'server/'):
+    python -m benchmarks.bench_precision
+    python -m benchmarks.bench_precision --galeria data/photos/gallery.fgal
+"""
+
+import argparse
+import time
+from typing import Callable
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+from app.core.gallery_store import abrir_galeria
+from app.core.quantization import GaleriaCompacta
+
+
+def medir(fn: Callable[[], object], repeticiones: int) -> float:
+    """Devuelve la mediana en milisegundos de `repeticiones` ejecuciones"""
+    fn()  # calentamiento
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return float(np.median(tiempos))
+
+
+def galeria_sintetica(n: int, rng: np.random.Generator) -> Gallery:
+    """Encodings sintéticos con la escala típica de dlib (valores ~[-0.3, 0.3])"""
+    datos = rng.normal(0.0, 0.09, size=(n, ENCODING_DIM)).astype(np.float32)
+    return Gallery(datos, list(range(n)), [f"estudiante_{i}" for i in range(n)])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--galeria", help="Archivo .fgal real (por defecto, galería sintética)")
+    parser.add_argument("--tamano", type=int, default=50000, help="Tamaño de la galería sintética")
+    parser.add_argument("--consultas", type=int, default=500, help="Rostros consultados para medir top-1")
+    parser.add_argument("--rostros", type=int, default=5, help="Rostros por frame para medir latencia")
+    parser.add_argument("--candidatos", type=int, default=8, help="RERANK_CANDIDATES")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    gallery = abrir_galeria(args.galeria) if args.galeria else galeria_sintetica(args.tamano, rng)
+
+    # Consultas: estudiantes de la galería con ruido (nuevo frame de la misma persona)
+    filas = rng.choice(len(gallery), size=min(args.consultas, len(gallery)), replace=False)
+    consultas = gallery.encodings[filas] + rng.normal(0.0, 0.02, size=(len(filas), ENCODING_DIM)).astype(np.float32)
+    frame = consultas[:args.rostros]
+
+    exactos, _ = gallery.buscar(consultas)
+
+    print(f"Galería: {len(gallery)} rostros | candidatos re-rank: {args.candidatos}")
+    print(f"{'modo':>8} {'memoria (MB)':>13} {'latencia (ms)':>14} {'top-1 igual':>12}")
+
+    memoria = (gallery.encodings.nbytes + gallery.norms_sq.nbytes) / 1024 / 1024
+    t_exacto = medir(lambda: gallery.buscar(frame), args.repeticiones)
+    print(f"{'float32':>8} {memoria:>13.2f} {t_exacto:>14.2f} {'100.00%':>12}")
+
+    for modo in ("float16", "int8"):
+        compacta = GaleriaCompacta(gallery, modo)
+        indices, _ = compacta.buscar(gallery, consultas, args.candidatos)
+        iguales = float(np.mean(indices == exactos)) * 100
+
+        t_modo = medir(lambda: compacta.buscar(gallery, frame, args.candidatos), args.repeticiones)
+        print(f"{modo:>8} {compacta.nbytes / 1024 / 1024:>13.2f} {t_modo:>14.2f} {iguales:>11.2f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+comprimir_galeria.py - Comprime los encodings de cada estudiante a prototipos
+Recalcula GALLERY_FILE desde GALLERY_RAW_FILE (un encoding por foto) sin
+volver a codificar fotos; útil para probar otro PROTOTYPES_PER_STUDENT
+
+Uso (desde la carpeta 'server/'):
+    python comprimir_galeria.py
+    python comprimir_galeria.py --prototipos 5
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+from app.config import GALLERY_FILE, GALLERY_RAW_FILE, PROTOTYPES_PER_STUDENT
+from app.core.gallery_store import abrir_galeria, guardar_galeria
+from app.core.prototypes import comprimir_galeria
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Comprime la galería a prototipos por estudiante")
+    parser.add_argument(
+        "--prototipos", type=int, default=PROTOTYPES_PER_STUDENT or 3,
+        help="Prototipos por estudiante (por defecto PROTOTYPES_PER_STUDENT o 3)"
+    )
+    args = parser.parse_args()
+
+    print("🔧 Comprimiendo galería a prototipos por estudiante...")
+    print("-" * 50)
+
+    if args.prototipos < 1:
+        print("❌ --prototipos debe ser mayor o igual a 1")
+        return False
+
+    if not os.path.exists(GALLERY_RAW_FILE):
+        if not os.path.exists(GALLERY_FILE):
+            print(f"❌ No existe {GALLERY_FILE}. Genera primero los encodings")
+            return False
+        # Galería sin comprimir: es la fuente de los prototipos
+        shutil.copyfile(GALLERY_FILE, GALLERY_RAW_FILE)
+        print(f"📋 {GALLERY_FILE.name} copiado a {GALLERY_RAW_FILE.name} (encodings por foto)")
+
+    try:
+        gallery_fotos = abrir_galeria(GALLERY_RAW_FILE)
+        gallery = comprimir_galeria(gallery_fotos, args.prototipos)
+        guardar_galeria(gallery, GALLERY_FILE)
+    except Exception as e:
+        print(f"❌ Error al comprimir: {e}")
+        return False
+
+    estudiantes = len(set(gallery_fotos.ids.tolist()))
+    print(f"✅ {estudiantes} estudiantes: {len(gallery_fotos)} fotos -> {len(gallery)} prototipos")
+    print(f"   Tamaño: {os.path.getsize(GALLERY_FILE) / 1024:.1f} KB")
+
+    if PROTOTYPES_PER_STUDENT != args.prototipos:
+        print(f"\n💡 Configura PROTOTYPES_PER_STUDENT={args.prototipos} en .env para que el servidor")
+        print("   mantenga los prototipos al agregar o actualizar estudiantes")
+    print("💡 Reinicia el servidor para cargar la galería comprimida")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -6,13 +6,22 @@ Ejecutar después de levantar MySQL con docker-compose
 
 import sys
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 import os
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
+# Errores de re-ejecutar schema.sql sobre una base existente (tabla, columna,
+# índice o FOREIGN KEY ya creados): se ignoran para que las migraciones sean idempotentes
+ERRORES_YA_EXISTE = {
+    errorcode.ER_TABLE_EXISTS_ERROR,
+    errorcode.ER_DUP_FIELDNAME,
+    errorcode.ER_DUP_KEYNAME,
+    errorcode.ER_FK_DUP_NAME
+}
+
 def init_database():
     """Inicializa la base de datos ejecutando schema.sql"""
 
@@ -48,16 +57,19 @@ def init_database():
         with open("schema.sql", "r", encoding="utf-8") as f:
             schema_sql = f.read()
 
-        # Ejecutar cada statement (separados por ;)
+        # Ejecutar cada statement (separados por ;), sin las líneas de comentario
         statements = schema_sql.split(';')
         for statement in statements:
-            statement = statement.strip()
-            if statement and not statement.startswith('--'):
+            statement = "\n".join(
+                linea for linea in statement.splitlines()
+                if not linea.strip().startswith('--')
+            ).strip()
+            if statement:
                 try:
                     cursor.execute(statement)
                 except Error as e:
-                    # Ignorar errores de "tabla ya existe"
-                    if "already exists" not in str(e):
+                    # Ignorar errores de "tabla / columna ya existe" (migraciones ya aplicadas)
+                    if e.errno not in ERRORES_YA_EXISTE and "already exists" not in str(e):
                         print(f"⚠️  Advertencia: {e}")
 
         conn.commit()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+migrar_encodings.py - Migra encodings.pkl al formato binario de galería (.fgal)
+El servidor también migra automáticamente al iniciar si falta GALLERY_FILE;
+este script permite hacerlo manualmente o desde otra ruta
+
+Uso (desde la carpeta 'server/'):
+    python migrar_encodings.py
+    python migrar_encodings.py --origen respaldo/encodings.pkl --forzar
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from app.config import ENCODINGS_FILE, GALLERY_FILE
+from app.core.gallery_store import abrir_galeria, migrar_desde_pickle
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description="Migra encodings.pkl a gallery.fgal")
+    parser.add_argument("--origen", type=Path, default=ENCODINGS_FILE, help="Pickle de encodings")
+    parser.add_argument("--destino", type=Path, default=GALLERY_FILE, help="Archivo .fgal de salida")
+    parser.add_argument("--forzar", action="store_true", help="Sobrescribir el destino si existe")
+    args = parser.parse_args()
+
+    print("🔧 Migrando encodings al formato binario...")
+    print("-" * 50)
+
+    if not os.path.exists(args.origen):
+        print(f"❌ No existe el archivo de origen: {args.origen}")
+        return False
+
+    if os.path.exists(args.destino) and not args.forzar:
+        gallery = abrir_galeria(args.destino)
+        print(f"✅ {args.destino} ya existe ({len(gallery)} rostros). Usa --forzar para regenerarlo")
+        return True
+
+    try:
+        gallery = migrar_desde_pickle(args.origen, args.destino)
+    except Exception as e:
+        print(f"❌ Error al migrar: {e}")
+        return False
+
+    print(f"✅ {len(gallery)} rostros migrados a {args.destino}")
+    print(f"   Tamaño: {os.path.getsize(args.destino) / 1024:.1f} KB")
+    print("\n💡 El archivo encodings.pkl ya no se usa y puede eliminarse")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
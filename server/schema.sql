@@ -1,8 +1,19 @@
+CREATE TABLE colegios (
+  id_colegio INT AUTO_INCREMENT PRIMARY KEY,
+  nombre VARCHAR(100) NOT NULL UNIQUE
+);
+
 CREATE TABLE estudiantes (
   id_estudiante INT AUTO_INCREMENT PRIMARY KEY,
   nombre_completo VARCHAR(100) NOT NULL,
   rut VARCHAR(20) UNIQUE,
-  path_foto_referencia VARCHAR(255) NOT NULL
+  path_foto_referencia VARCHAR(255) NOT NULL,
+  -- Colegio al que pertenece (NULL = galería global)
+  id_colegio INT NULL,
+  -- Baja del estudiante (NULL = activo); la fila se conserva por su historial de asistencia
+  eliminado_en DATETIME NULL,
+
+  CONSTRAINT fk_estudiantes_colegio FOREIGN KEY (id_colegio) REFERENCES colegios(id_colegio)
 );
 
 CREATE TABLE asistencia (
@@ -15,4 +26,67 @@ CREATE TABLE asistencia (
   FOREIGN KEY (id_estudiante) REFERENCES estudiantes(id_estudiante),
   -- Esto evita duplicados para el mismo estudiante el mismo día
   UNIQUE KEY (id_estudiante, fecha_registro)
-);
\ No newline at end of file
+);
+
+CREATE TABLE cursos (
+  id_curso INT AUTO_INCREMENT PRIMARY KEY,
+  nombre VARCHAR(100) NOT NULL UNIQUE
+);
+
+CREATE TABLE curso_estudiantes (
+  id_curso INT NOT NULL,
+  id_estudiante INT NOT NULL,
+
+  PRIMARY KEY (id_curso, id_estudiante),
+  FOREIGN KEY (id_curso) REFERENCES cursos(id_curso),
+  FOREIGN KEY (id_estudiante) REFERENCES estudiantes(id_estudiante)
+);
+
+CREATE TABLE dispositivos (
+  device_id VARCHAR(50) PRIMARY KEY,
+  -- Curso asignado a la sala donde está la cámara (NULL = galería global)
+  id_curso INT NULL,
+  -- Colegio dueño del dispositivo; sus frames usan la galería de ese colegio
+  id_colegio INT NULL,
+  -- Región de interés de la cámara como fracción del frame (NULL = frame completo)
+  roi_x FLOAT NULL,
+  roi_y FLOAT NULL,
+  roi_ancho FLOAT NULL,
+  roi_alto FLOAT NULL,
+  -- Perfil de reconocimiento (detector, upsampling, tolerancia); NULL = DEFAULT_RECOGNITION_PROFILE
+  perfil VARCHAR(30) NULL,
+  -- Peso en el reparto del reconocimiento bajo sobrecarga (NULL = 1; ej. 3 en la entrada principal)
+  peso FLOAT NULL CHECK (peso > 0),
+
+  FOREIGN KEY (id_curso) REFERENCES cursos(id_curso),
+  CONSTRAINT fk_dispositivos_colegio FOREIGN KEY (id_colegio) REFERENCES colegios(id_colegio)
+);
+
+CREATE TABLE fotos_estudiante (
+  id_foto INT AUTO_INCREMENT PRIMARY KEY,
+  id_estudiante INT NOT NULL,
+  -- Fotos de referencia adicionales a estudiantes.path_foto_referencia
+  path_foto VARCHAR(255) NOT NULL,
+
+  FOREIGN KEY (id_estudiante) REFERENCES estudiantes(id_estudiante)
+);
+
+-- ====================================
+-- MIGRACIONES
+-- En una base existente los CREATE TABLE de arriba se omiten: las columnas
+-- agregadas después de crear cada tabla se agregan aquí. init_db.py ignora
+-- "columna / restricción ya existe", así que se puede re-ejecutar
+-- ====================================
+
+ALTER TABLE estudiantes ADD COLUMN id_colegio INT NULL;
+ALTER TABLE estudiantes ADD CONSTRAINT fk_estudiantes_colegio FOREIGN KEY (id_colegio) REFERENCES colegios(id_colegio);
+ALTER TABLE estudiantes ADD COLUMN eliminado_en DATETIME NULL;
+
+ALTER TABLE dispositivos ADD COLUMN id_colegio INT NULL;
+ALTER TABLE dispositivos ADD CONSTRAINT fk_dispositivos_colegio FOREIGN KEY (id_colegio) REFERENCES colegios(id_colegio);
+ALTER TABLE dispositivos ADD COLUMN roi_x FLOAT NULL;
+ALTER TABLE dispositivos ADD COLUMN roi_y FLOAT NULL;
+ALTER TABLE dispositivos ADD COLUMN roi_ancho FLOAT NULL;
+ALTER TABLE dispositivos ADD COLUMN roi_alto FLOAT NULL;
+ALTER TABLE dispositivos ADD COLUMN perfil VARCHAR(30) NULL;
+ALTER TABLE dispositivos ADD COLUMN peso FLOAT NULL CHECK (peso > 0);
@@ -0,0 +1,15 @@
+"""
+conftest.py - Configuración común de las pruebas (ejecutar `pytest` desde server/)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+# app.config exige estas variables al importarse; las pruebas no usan la BD
+os.environ.setdefault("SECRET_KEY", "pruebas")
+os.environ.setdefault("DB_USER", "pruebas")
+os.environ.setdefault("DB_PASS", "pruebas")
+os.environ.setdefault("DB_NAME", "pruebas")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
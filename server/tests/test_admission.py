@@ -0,0 +1,135 @@
+"""
+test_admission.py - Turnos de ControlAdmision: traspaso, reemplazo, plazo y cancelación
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.admission import ControlAdmision, DispositivoOcupado
+
+
+def _correr(corrutina):
+    return asyncio.run(corrutina())
+
+
+def test_primer_frame_pasa_y_el_siguiente_espera_el_traspaso():
+    async def escenario():
+        control = ControlAdmision(plazo_s=5.0, reintento_minimo_s=0.1)
+        await control.admitir("cam", time.monotonic())
+
+        segundo = asyncio.ensure_future(control.admitir("cam", time.monotonic()))
+        await asyncio.sleep(0)
+        assert not segundo.done()
+
+        control.liberar("cam")
+        await segundo
+        return control.estado()["cam"]
+
+    estado = _correr(escenario)
+    assert estado["en_curso"] == 1
+    assert estado["admitidos"] == 2
+    assert not estado["en_espera"]
+
+
+def test_frame_nuevo_reemplaza_al_que_esperaba():
+    async def escenario():
+        control = ControlAdmision(plazo_s=5.0, reintento_minimo_s=0.1)
+        await control.admitir("cam", time.monotonic())
+
+        viejo = asyncio.ensure_future(control.admitir("cam", time.monotonic()))
+        await asyncio.sleep(0)
+        nuevo = asyncio.ensure_future(control.admitir("cam", time.monotonic()))
+        await asyncio.sleep(0)
+
+        with pytest.raises(DispositivoOcupado) as error:
+            await viejo
+        control.liberar("cam")
+        await nuevo
+        return error.value, control.estado()["cam"]
+
+    error, estado = _correr(escenario)
+    assert error.motivo == "reemplazado"
+    assert error.reintentar_s >= 0.1
+    assert estado["reemplazados"] == 1
+
+
+def test_frame_en_espera_vence_por_plazo():
+    async def escenario():
+        control = ControlAdmision(plazo_s=0.05, reintento_minimo_s=0.1)
+        await control.admitir("cam", time.monotonic())
+        with pytest.raises(DispositivoOcupado) as error:
+            await control.admitir("cam", time.monotonic())
+        return error.value, control
+
+    error, control = _correr(escenario)
+    assert error.motivo == "vencido"
+    assert control.estado()["cam"]["vencidos"] == 1
+
+    with pytest.raises(DispositivoOcupado):
+        control.verificar_plazo("cam", time.monotonic() - 1.0)
+    control.verificar_plazo("cam", time.monotonic())
+
+
+def test_cancelar_frame_en_espera_no_deja_turno_pendiente():
+    async def escenario():
+        control = ControlAdmision(plazo_s=5.0, reintento_minimo_s=0.1)
+        await control.admitir("cam", time.monotonic())
+
+        esperando = asyncio.ensure_future(control.admitir("cam", time.monotonic()))
+        await asyncio.sleep(0)
+        esperando.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await esperando
+
+        control.liberar("cam")
+        return control.estado()["cam"]
+
+    estado = _correr(escenario)
+    assert estado["en_curso"] == 0
+    assert not estado["en_espera"]
+
+
+def test_cancelar_despues_de_recibir_el_turno_lo_devuelve():
+    async def escenario():
+        control = ControlAdmision(plazo_s=5.0, reintento_minimo_s=0.1)
+        await control.admitir("cam", time.monotonic())
+
+        esperando = asyncio.ensure_future(control.admitir("cam", time.monotonic()))
+        await asyncio.sleep(0)
+        # El turno se entrega y el cliente se desconecta antes de retomar
+        control.liberar("cam")
+        esperando.cancel()
+        try:
+            await esperando
+            # Antes de Python 3.12, wait_for entrega el turno igual: se cierra como siempre
+            control.liberar("cam")
+        except asyncio.CancelledError:
+            pass
+
+        # El turno devuelto queda libre para el siguiente frame
+        await asyncio.wait_for(control.admitir("cam", time.monotonic()), 0.5)
+        return control.estado()["cam"]
+
+    estado = _correr(escenario)
+    assert estado["en_curso"] == 1
+
+
+def test_cupo_mayor_admite_varios_frames_en_curso():
+    async def escenario():
+        control = ControlAdmision(plazo_s=5.0, reintento_minimo_s=0.1, cupo=lambda device_id: 2)
+        await control.admitir("entrada", time.monotonic())
+        await asyncio.wait_for(control.admitir("entrada", time.monotonic()), 0.5)
+
+        tercero = asyncio.ensure_future(control.admitir("entrada", time.monotonic()))
+        await asyncio.sleep(0)
+        assert not tercero.done()
+
+        control.liberar("entrada")
+        await tercero
+        return control.estado()["entrada"]
+
+    estado = _correr(escenario)
+    assert estado["en_curso"] == 2
+    assert estado["admitidos"] == 3
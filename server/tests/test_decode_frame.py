@@ -0,0 +1,50 @@
+"""
+test_decode_frame.py - Ancho de la decodificación draft según el perfil del dispositivo
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import app.core.face_recognition as modulo
+from app.core.face_recognition import FrameDraft, face_recognition_processor
+from app.core.profiles import PERFILES, PerfilReconocimiento
+
+
+def _jpeg(ancho: int, alto: int) -> bytes:
+    salida = io.BytesIO()
+    Image.fromarray(np.full((alto, ancho, 3), 128, dtype=np.uint8)).save(salida, format="JPEG")
+    return salida.getvalue()
+
+
+@pytest.fixture
+def draft_480(monkeypatch):
+    monkeypatch.setattr(modulo, "JPEG_DRAFT_WIDTH", 480)
+
+
+def test_draft_no_baja_del_ancho_de_deteccion_del_perfil(draft_480):
+    perfil = PerfilReconocimiento("ancho", ancho_deteccion=960)
+
+    frame = face_recognition_processor.decode_frame(_jpeg(1920, 1080), perfil)
+
+    assert isinstance(frame, FrameDraft)
+    assert frame.reducida.shape[1] >= 960
+    assert frame.forma == (1080, 1920, 3)
+
+
+def test_perfil_de_frame_completo_no_usa_draft(draft_480):
+    frame = face_recognition_processor.decode_frame(_jpeg(1920, 1080), PERFILES["amplio"])
+
+    assert isinstance(frame, np.ndarray)
+    assert frame.shape == (1080, 1920, 3)
+
+
+def test_sin_draft_decodifica_completo(monkeypatch):
+    monkeypatch.setattr(modulo, "JPEG_DRAFT_WIDTH", 0)
+
+    frame = face_recognition_processor.decode_frame(_jpeg(1920, 1080))
+
+    assert isinstance(frame, np.ndarray)
+    assert frame.shape == (1080, 1920, 3)
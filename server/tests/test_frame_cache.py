@@ -0,0 +1,123 @@
+"""
+test_frame_cache.py - Aciertos, vencimiento y memoria de la cache de resultados por huella
+"""
+
+import numpy as np
+import pytest
+
+import app.core.frame_cache as modulo
+from app.core.frame_cache import CacheFrames, Huella
+
+RESULTADO = {"faces": [], "processing_time_ms": 12.0}
+
+
+def _huella(bits: int, gris: int = 100) -> Huella:
+    return Huella(bits, np.full((9, 16), gris, dtype=np.int16))
+
+
+def _cache(presupuesto_bytes: int = 1 << 20, ttl_s: float = 10.0) -> CacheFrames:
+    return CacheFrames(ttl_s, presupuesto_bytes, distancia_max=2, umbral_pixel=25, fraccion_minima=0.01)
+
+
+def _memoria_entradas(cache: CacheFrames) -> int:
+    return sum(entrada.nbytes for entrada in cache._entradas.values())
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico controlado por el test"""
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def test_acierto_con_huella_cercana(reloj):
+    cache = _cache()
+    cache.guardar("cam", _huella(0b1010), RESULTADO)
+
+    resultado = cache.obtener("cam", _huella(0b1011))
+
+    assert resultado == {**RESULTADO, "en_cache": True}
+    assert cache.obtener("cam", _huella(0b0101)) is None
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_miniatura_distinta_no_es_acierto(reloj):
+    cache = _cache()
+    cache.guardar("cam", _huella(7, gris=100), RESULTADO)
+
+    # Mismo dHash, pero la miniatura cambió (ej. un rostro en un costado)
+    assert cache.obtener("cam", _huella(7, gris=200)) is None
+
+
+def test_otra_galeria_descarta_los_resultados(reloj):
+    cache = _cache()
+    cache.guardar("cam", _huella(7), RESULTADO, galeria="colegio_1")
+
+    assert cache.obtener("cam", _huella(7), galeria="colegio_2") is None
+    assert cache.estado()["entradas"] == 0
+    assert cache._memoria == 0
+
+
+def test_vence_tras_el_ttl(reloj):
+    cache = _cache(ttl_s=5.0)
+    cache.guardar("cam", _huella(7), RESULTADO)
+
+    reloj[0] += 5.0
+    assert cache.obtener("cam", _huella(7)) is not None
+
+    reloj[0] += 0.5
+    assert cache.obtener("cam", _huella(7)) is None
+    assert cache._memoria == 0
+    assert "cam" not in cache._por_dispositivo
+
+
+def test_memoria_cuadra_tras_desalojar(reloj):
+    cache = _cache()
+    cache.guardar("cam", _huella(1), RESULTADO)
+    por_entrada = cache._memoria
+    cache.presupuesto_bytes = 3 * por_entrada
+
+    for bits in range(2, 7):
+        cache.guardar("cam", _huella(bits << 8), RESULTADO)
+        cache.guardar("otra", _huella(bits << 16), RESULTADO)
+
+    assert len(cache._entradas) == 3
+    assert cache._memoria == _memoria_entradas(cache) <= cache.presupuesto_bytes
+    assert cache.estado()["memoria_kb"] == round(_memoria_entradas(cache) / 1024, 1)
+    # Los índices por dispositivo solo apuntan a entradas que siguen en la cache
+    for device_id, huellas in cache._por_dispositivo.items():
+        assert all((device_id, bits) in cache._entradas for bits in huellas)
+    # Las más antiguas se desalojaron primero
+    assert cache.obtener("cam", _huella(1)) is None
+
+
+def test_reemplazo_de_la_misma_huella_no_duplica_memoria(reloj):
+    cache = _cache()
+    cache.guardar("cam", _huella(7), RESULTADO)
+    cache.guardar("cam", _huella(7), RESULTADO)
+
+    assert len(cache._entradas) == 1
+    assert cache._memoria == _memoria_entradas(cache)
+
+
+def test_resultado_mayor_que_el_presupuesto_no_se_guarda(reloj):
+    cache = _cache(presupuesto_bytes=64)
+    cache.guardar("cam", _huella(7), RESULTADO)
+
+    assert cache.estado()["entradas"] == 0
+    assert cache._memoria == 0
+
+
+def test_limpiar_galeria_solo_afecta_a_esa_galeria(reloj):
+    cache = _cache()
+    cache.guardar("cam_a", _huella(1), RESULTADO, galeria="colegio_1")
+    cache.guardar("cam_b", _huella(2), RESULTADO, galeria="colegio_2")
+    cache.guardar("cam_c", _huella(3), RESULTADO)
+
+    cache.limpiar_galeria("colegio_1")
+
+    assert cache.obtener("cam_a", _huella(1), galeria="colegio_1") is None
+    assert cache.obtener("cam_b", _huella(2), galeria="colegio_2") is not None
+    assert cache.obtener("cam_c", _huella(3)) is not None
+    assert cache._memoria == _memoria_entradas(cache)
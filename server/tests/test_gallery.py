@@ -0,0 +1,71 @@
+"""
+test_gallery.py - Búsqueda vectorizada de Gallery contra la distancia euclidiana directa
+"""
+
+import numpy as np
+
+from app.core.gallery import ENCODING_DIM, Gallery
+
+
+def _galeria(filas: int, semilla: int = 0) -> Gallery:
+    rng = np.random.default_rng(semilla)
+    encodings = rng.normal(0, 0.1, (filas, ENCODING_DIM)).astype(np.float32)
+    return Gallery(encodings, list(range(filas)), [f"Estudiante {i}" for i in range(filas)])
+
+
+def test_buscar_coincide_con_argmin_directo():
+    gallery = _galeria(300)
+    rng = np.random.default_rng(1)
+    queries = rng.normal(0, 0.1, (25, ENCODING_DIM)).astype(np.float32)
+
+    indices, distancias = gallery.buscar(queries)
+
+    directas = np.linalg.norm(queries[:, np.newaxis, :] - gallery.encodings[np.newaxis, :, :], axis=2)
+    np.testing.assert_array_equal(indices, np.argmin(directas, axis=1))
+    np.testing.assert_allclose(distancias, directas.min(axis=1), rtol=1e-4, atol=1e-5)
+
+
+def test_buscar_rostro_identico_tiene_distancia_cero():
+    gallery = _galeria(50)
+
+    indices, distancias = gallery.buscar(gallery.encodings[[7, 31]])
+
+    assert list(indices) == [7, 31]
+    np.testing.assert_allclose(distancias, 0.0, atol=1e-3)
+
+
+def test_buscar_en_galeria_vacia():
+    indices, distancias = Gallery.vacia().buscar(np.zeros((2, ENCODING_DIM), dtype=np.float32))
+
+    assert list(indices) == [-1, -1]
+    assert np.all(np.isinf(distancias))
+
+
+def test_buscar_sin_consultas():
+    indices, distancias = _galeria(10).buscar(np.empty((0, ENCODING_DIM), dtype=np.float32))
+
+    assert len(indices) == 0 and len(distancias) == 0
+
+
+def test_con_estudiante_reemplaza_sus_filas():
+    gallery = _galeria(10)
+    nuevo = np.full((2, ENCODING_DIM), 0.5, dtype=np.float32)
+
+    actualizada = gallery.con_estudiante(3, nuevo, "Nuevo Nombre")
+
+    assert len(actualizada) == 11
+    assert list(actualizada.ids).count(3) == 2
+    indices, _ = actualizada.buscar(nuevo[:1])
+    assert actualizada.ids[indices[0]] == 3
+    assert actualizada.names[indices[0]] == "Nuevo Nombre"
+    # La galería original no cambia
+    assert len(gallery) == 10
+
+
+def test_renombrar_conserva_normas():
+    gallery = _galeria(5)
+
+    renombrada = gallery.renombrar(2, "Otro")
+
+    assert renombrada.names[2] == "Otro"
+    np.testing.assert_array_equal(renombrada.norms_sq, gallery.norms_sq)
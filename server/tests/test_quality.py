@@ -0,0 +1,107 @@
+"""
+test_quality.py - Motivos de rechazo del filtro de calidad (tamaño, nitidez y pose)
+"""
+
+import numpy as np
+import pytest
+
+import app.core.quality as quality
+from app.core.quality import UmbralesCalidad, evaluar, pose
+
+UMBRALES = UmbralesCalidad(min_px=60, min_nitidez=25.0, max_giro=0.4, max_inclinacion=30.0)
+
+# Caja (top, right, bottom, left) de 100 px de lado
+CAJA = (0, 100, 100, 0)
+
+
+def _frontal(desplazamiento_nariz: float = 0.0, caida_ojo: float = 0.0):
+    return {
+        "left_eye": [(60, 40), (70, 40 + caida_ojo)],
+        "right_eye": [(30, 40), (40, 40)],
+        "nose_tip": [(50 + desplazamiento_nariz, 60)],
+    }
+
+
+def _tablero(lado: int = 100, casilla: int = 4) -> np.ndarray:
+    """Ajedrezado blanco y negro: bordes marcados en todo el rostro"""
+    y, x = np.indices((lado, lado))
+    gris = (((y // casilla) + (x // casilla)) % 2 * 255).astype(np.uint8)
+    return np.repeat(gris[:, :, None], 3, axis=2)
+
+
+@pytest.fixture
+def landmarks(monkeypatch):
+    """Sustituye los landmarks de dlib por los puntos indicados en el test"""
+    puntos = {}
+
+    def face_landmarks(image_array, ubicaciones, model="large"):
+        puntos["llamadas"] = list(ubicaciones)
+        return [puntos["rostro"] for _ in ubicaciones]
+
+    monkeypatch.setattr(quality.face_recognition, "face_landmarks", face_landmarks)
+    return puntos
+
+
+def test_pose_de_frente():
+    giro, inclinacion = pose(_frontal())
+
+    assert giro == pytest.approx(0.0)
+    assert inclinacion == pytest.approx(0.0)
+
+
+def test_pose_girado_e_inclinado():
+    giro, _ = pose(_frontal(desplazamiento_nariz=15))
+    _, inclinacion = pose(_frontal(caida_ojo=20))
+
+    # Nariz a 15 px del punto medio con 30 px entre ojos
+    assert giro == pytest.approx(0.5)
+    assert inclinacion > 10.0
+
+
+def test_pose_ojos_superpuestos_no_divide_por_cero():
+    giro, _ = pose({"left_eye": [(50, 40)], "right_eye": [(50, 40)], "nose_tip": [(50, 60)]})
+
+    assert giro == float("inf")
+
+
+def test_rostro_pequeno_no_llega_a_landmarks(landmarks):
+    landmarks["rostro"] = _frontal()
+
+    motivos = evaluar(_tablero(), [(0, 40, 40, 0)], UMBRALES)
+
+    assert motivos == ["pequeno"]
+    assert "llamadas" not in landmarks
+
+
+def test_rostro_uniforme_es_borroso(landmarks):
+    landmarks["rostro"] = _frontal()
+    plano = np.full((100, 100, 3), 128, dtype=np.uint8)
+
+    assert evaluar(plano, [CAJA], UMBRALES) == ["borroso"]
+    assert "llamadas" not in landmarks
+
+
+def test_rostro_nitido_y_de_frente_se_acepta(landmarks):
+    landmarks["rostro"] = _frontal()
+
+    assert evaluar(_tablero(), [CAJA], UMBRALES) == [None]
+    assert landmarks["llamadas"] == [CAJA]
+
+
+def test_rostro_girado_se_rechaza(landmarks):
+    landmarks["rostro"] = _frontal(desplazamiento_nariz=15)
+
+    assert evaluar(_tablero(), [CAJA], UMBRALES) == ["girado"]
+
+
+def test_landmarks_solo_para_los_que_pasan_tamano_y_nitidez(landmarks):
+    landmarks["rostro"] = _frontal()
+    frame = np.zeros((200, 200, 3), dtype=np.uint8)
+    frame[:100, :100] = _tablero()
+    pequena = (150, 180, 180, 150)
+    plana = (100, 200, 200, 100)
+
+    motivos = evaluar(frame, [CAJA, pequena, plana], UMBRALES)
+
+    assert motivos == [None, "pequeno", "borroso"]
+    assert landmarks["llamadas"] == [CAJA]
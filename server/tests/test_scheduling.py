@@ -0,0 +1,128 @@
+"""
+test_scheduling.py - Contabilidad de déficit de PlanificadorDRR
+"""
+
+import asyncio
+
+import pytest
+
+from app.core.scheduling import PlanificadorDRR
+
+
+def _correr(corrutina):
+    return asyncio.run(corrutina())
+
+
+def test_sin_competencia_pasa_de_inmediato():
+    async def escenario():
+        planificador = PlanificadorDRR(2, 0.01, lambda device_id: 1.0)
+        await asyncio.wait_for(planificador.adquirir("a"), 0.5)
+        await asyncio.wait_for(planificador.adquirir("b"), 0.5)
+        return planificador
+
+    planificador = _correr(escenario)
+    assert planificador.en_curso == 2
+
+
+def test_liberar_corrige_el_costo_estimado_con_el_real():
+    async def escenario():
+        planificador = PlanificadorDRR(1, 0.01, lambda device_id: 1.0)
+        await planificador.adquirir("a")
+        planificador.liberar("a", 0.04)
+        cola = planificador._colas["a"]
+        primero = (cola.deficit, cola.costo_estimado)
+
+        # El segundo frame se cobra con la estimación al despachar y se corrige al liberar
+        await planificador.adquirir("a")
+        assert cola.deficit == pytest.approx(-0.08)
+        planificador.liberar("a", 0.02)
+        return primero, cola
+
+    (deficit, estimado), cola = _correr(escenario)
+    assert deficit == pytest.approx(-0.04)
+    assert estimado == pytest.approx(0.04)
+    assert cola.deficit == pytest.approx(-0.06)
+    assert cola.costo_estimado == pytest.approx(0.8 * 0.04 + 0.2 * 0.02)
+    assert cola.servicio_s == pytest.approx(0.06)
+
+
+def test_cobrar_descuenta_credito_fuera_del_turno():
+    async def escenario():
+        planificador = PlanificadorDRR(1, 0.01, lambda device_id: 1.0)
+        await planificador.adquirir("a")
+        planificador.liberar("a", 0.01)
+        planificador.cobrar("a", 0.03)
+        return planificador._colas["a"]
+
+    cola = _correr(escenario)
+    assert cola.deficit == pytest.approx(-0.04)
+    assert cola.servicio_s == pytest.approx(0.04)
+
+
+def test_turnos_proporcionales_al_peso():
+    pesos = {"a": 1.0, "b": 3.0}
+    costo_s = 0.01
+
+    async def escenario():
+        planificador = PlanificadorDRR(1, costo_s, lambda device_id: pesos[device_id])
+        atendidos = []
+
+        async def frame(device_id):
+            await planificador.adquirir(device_id)
+            atendidos.append(device_id)
+
+        # Un frame ocupa el único worker mientras ambos dispositivos encolan muchos
+        await planificador.adquirir("a")
+        tareas = [asyncio.ensure_future(frame(d)) for d in ("a", "b") for _ in range(60)]
+        await asyncio.sleep(0)
+
+        actual = "a"
+        for _ in range(80):
+            planificador.liberar(actual, costo_s)
+            await asyncio.sleep(0)
+            actual = atendidos[-1]
+
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        return atendidos
+
+    atendidos = _correr(escenario)
+    # Con todos los frames del mismo costo, b recibe 3 turnos por cada uno de a
+    assert atendidos[20:80].count("b") == pytest.approx(45, abs=3)
+
+
+def test_cancelar_en_espera_lo_saca_de_la_cola():
+    async def escenario():
+        planificador = PlanificadorDRR(1, 0.01, lambda device_id: 1.0)
+        await planificador.adquirir("a")
+
+        esperando = asyncio.ensure_future(planificador.adquirir("b"))
+        await asyncio.sleep(0)
+        esperando.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await esperando
+
+        estado = planificador.estado()["dispositivos"]["b"]
+        planificador.liberar("a", 0.01)
+        return estado, planificador
+
+    estado, planificador = _correr(escenario)
+    assert estado["en_cola"] == 0
+    assert planificador.en_curso == 0
+
+
+@pytest.mark.parametrize("peso", [0.0, -1.0, float("nan")])
+def test_peso_no_positivo_no_bloquea_el_despacho(peso):
+    async def escenario():
+        planificador = PlanificadorDRR(1, 0.01, lambda device_id: peso)
+        await planificador.adquirir("a")
+
+        esperando = asyncio.ensure_future(planificador.adquirir("b"))
+        await asyncio.sleep(0)
+        planificador.liberar("a", 0.01)
+        await asyncio.wait_for(esperando, 0.5)
+        return planificador
+
+    planificador = _correr(escenario)
+    assert planificador.en_curso == 1
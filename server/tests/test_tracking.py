@@ -0,0 +1,135 @@
+"""
+test_tracking.py - Emparejamiento por IoU y re-verificación de las pistas de rostros
+"""
+
+import pytest
+
+import app.core.tracking as modulo
+from app.core.tracking import Rastreador, iou
+
+CAJA = (100, 200, 200, 100)
+# Misma caja desplazada 10 px a la derecha (IoU ≈ 0.82)
+MOVIDA = (100, 210, 200, 110)
+LEJANA = (100, 600, 200, 500)
+
+ANA = (1, "Ana", 0.35)
+
+
+def _rastreador() -> Rastreador:
+    return Rastreador(iou_minimo=0.3, reverificar_s=2.0, perdida_s=1.0, distancia_confiable=0.45)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico controlado por el test"""
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo.time, "monotonic", lambda: ahora[0])
+    return ahora
+
+
+def test_iou():
+    assert iou(CAJA, CAJA) == pytest.approx(1.0)
+    assert iou(CAJA, MOVIDA) == pytest.approx(9000 / 11000)
+    assert iou(CAJA, LEJANA) == 0.0
+    # Cajas que solo se tocan en un borde
+    assert iou(CAJA, (100, 300, 200, 200)) == 0.0
+
+
+def test_caja_superpuesta_conserva_la_pista(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+
+    reloj[0] += 0.2
+    [misma, nueva] = rastreador.asociar("cam", [MOVIDA, LEJANA])
+
+    assert misma is pista
+    assert misma.caja == MOVIDA
+    assert nueva is not pista
+    assert nueva.identidad is None
+
+
+def test_cada_pista_se_asigna_a_una_sola_caja(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+
+    # Dos cajas superpuestas con la pista: se queda la de mayor IoU
+    [otra, misma] = rastreador.asociar("cam", [(100, 230, 200, 130), MOVIDA])
+
+    assert misma is pista
+    assert otra is not pista
+
+
+def test_pista_perdida_no_se_reutiliza(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+
+    reloj[0] += 1.5
+    [nueva] = rastreador.asociar("cam", [CAJA])
+
+    assert nueva is not pista
+
+
+def test_solo_se_conserva_una_identidad_confiable(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+
+    rastreador.verificar(pista, ANA, tolerancia=0.6)
+    assert rastreador.vigente(pista) == ANA
+
+    # Dentro de la tolerancia pero fuera de la distancia confiable
+    rastreador.verificar(pista, (1, "Ana", 0.5), tolerancia=0.6)
+    assert pista.identidad is None
+    assert rastreador.vigente(pista) is None
+
+    # Tolerancia más estricta que la distancia confiable
+    rastreador.verificar(pista, ANA, tolerancia=0.3)
+    assert pista.identidad is None
+
+
+def test_identidad_se_reverifica_tras_el_plazo(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+    rastreador.verificar(pista, ANA, tolerancia=0.6)
+
+    reloj[0] += 1.9
+    assert rastreador.vigente(pista) == ANA
+
+    reloj[0] += 0.1
+    assert rastreador.vigente(pista) is None
+
+
+def test_registro_se_reinicia_si_cambia_la_identidad(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA])
+    rastreador.verificar(pista, ANA, tolerancia=0.6)
+    rastreador.marcar_registrada("cam", 1)
+    assert rastreador.registrada("cam", 1)
+
+    # Re-verificación con la misma identidad: el registro se mantiene
+    rastreador.verificar(pista, ANA, tolerancia=0.6)
+    assert rastreador.registrada("cam", 1)
+
+    rastreador.verificar(pista, (2, "Beto", 0.3), tolerancia=0.6)
+    assert not rastreador.registrada("cam", 1)
+    assert not rastreador.registrada("cam", 2)
+
+
+def test_cambio_de_galeria_descarta_las_pistas(reloj):
+    rastreador = _rastreador()
+    [pista] = rastreador.asociar("cam", [CAJA], galeria="colegio_1")
+
+    [nueva] = rastreador.asociar("cam", [CAJA], galeria="colegio_2")
+
+    assert nueva is not pista
+
+
+def test_limpiar_galeria_solo_afecta_a_esa_galeria(reloj):
+    rastreador = _rastreador()
+    [pista_a] = rastreador.asociar("cam_a", [CAJA], galeria="colegio_1")
+    [pista_b] = rastreador.asociar("cam_b", [CAJA], galeria="colegio_2")
+
+    rastreador.limpiar_galeria("colegio_1")
+
+    assert rastreador.estado() == {"cam_b": 1}
+    assert rastreador.asociar("cam_a", [CAJA], galeria="colegio_1")[0] is not pista_a
+    assert rastreador.asociar("cam_b", [CAJA], galeria="colegio_2")[0] is pista_b